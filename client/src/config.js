@@ -1,3 +1,5 @@
+import { auth } from './firebase';
+
 // Configuration for different environments
 const config = {
   development: {
@@ -84,6 +86,95 @@ export const secureApiRequest = async (endpoint, options = {}) => {
   return fetch(url, options);
 };
 
+// Fetch several users with one request; resolves to { [userId]: user },
+// leaving out ids that could not be loaded
+export const fetchUsers = async (userIds) => {
+  const ids = [...new Set(userIds)];
+  if (ids.length === 0) return {};
+  try {
+    const response = await fetch(`${API_BASE_URL}/users/batch?ids=${ids.join(',')}`);
+    if (!response.ok) {
+      console.error(`Failed to fetch user details for ${ids.join(', ')}`);
+      return {};
+    }
+    const data = await response.json();
+    return Object.fromEntries(data.users.map(user => [user.id, user]));
+  } catch (error) {
+    console.error('Error fetching user details:', error);
+    return {};
+  }
+};
+
+// Play a turn with PATCH /games/{id}/play, as the signed-in user
+export const playTurnOverHttp = async (gameId, turn) => {
+  const token = await auth.currentUser?.getIdToken();
+  return fetch(`${API_BASE_URL}/games/${gameId}/play`, {
+    method: 'PATCH',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(turn)
+  });
+};
+
+// Play turns over an open game socket instead of one HTTP request each.
+// Every turn is sent as { type: 'turn', seq, turn } and settles when the
+// server answers with an ack or a reject for its seq. sendTurn resolves to
+// a fetch-style Response (204 on ack, 400 with { detail } on reject) so
+// callers handle both transports the same way; it falls back to HTTP while
+// the socket isn't open.
+export const createTurnSocket = (ws, gameId, timeoutMs = 10000) => {
+  let nextSeq = 0;
+  const pending = new Map(); // seq -> { resolve, timer }
+
+  const rejected = (detail) => new Response(JSON.stringify({ detail }), {
+    status: 400,
+    headers: { 'Content-Type': 'application/json' },
+  });
+
+  const settle = (seq, response) => {
+    const entry = pending.get(seq);
+    if (!entry) return;
+    pending.delete(seq);
+    clearTimeout(entry.timer);
+    entry.resolve(response);
+  };
+
+  ws.addEventListener('close', () => {
+    for (const seq of [...pending.keys()]) {
+      settle(seq, rejected('Connection lost'));
+    }
+  });
+
+  return {
+    // Settle the turn a socket message answers; false for anything else (game states)
+    handleMessage(data) {
+      if (data.type === 'ack') {
+        settle(data.seq, new Response(null, { status: 204 }));
+        return true;
+      }
+      if (data.type === 'reject') {
+        settle(data.seq, rejected(data.reason));
+        return true;
+      }
+      return false;
+    },
+
+    sendTurn(turn) {
+      if (ws.readyState !== WebSocket.OPEN) {
+        return playTurnOverHttp(gameId, turn);
+      }
+      const seq = ++nextSeq;
+      return new Promise((resolve) => {
+        const timer = setTimeout(() => settle(seq, rejected('No reply from server')), timeoutMs);
+        pending.set(seq, { resolve, timer });
+        ws.send(JSON.stringify({ type: 'turn', seq, turn }));
+      });
+    },
+  };
+};
+
 // Export environment info for debugging
 export const ENV_INFO = {
   mode: environment,
@@ -2,7 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useLocation, useOutletContext, useParams, useNavigate } from 'react-router-dom';
 import { auth } from '../firebase';
 import { onAuthStateChanged } from 'firebase/auth';
-import { API_BASE_URL, getWebSocketURL } from '../config';
+import { API_BASE_URL, getWebSocketURL, fetchUsers, createTurnSocket, playTurnOverHttp } from '../config';
 import './FishGameScreen.css';
 
 // Toast notification component
@@ -196,7 +196,8 @@ function cardClicked(cardname, selectedCards, setSelectedCards) {
     let players = [];
     users.forEach((userId, index) => {
       const isCurrentPlayer = gameState?.current_player === userId;
-      const cardCount = gameState?.owners?.[userId]?.cards?.length || 0;
+      const owner = gameState?.owners?.[userId];
+      const cardCount = owner?.card_count ?? owner?.cards?.length ?? 0;
       const isCurrentUser = userId === currentUserId;
       const playerStatus = gameState?.player_status?.[userId] || null;
       players.push(otherPlayer(userId, userDetails, isCurrentPlayer, cardCount, isCurrentUser, playerStatus, gameState.status));
@@ -561,6 +562,9 @@ function FishGameScreen() {
     const [gameId, setGameId] = useState(null);
     const [gameName, setGameName] = useState('');
     const [websocket, setWebsocket] = useState(null);
+    // Bumped to reconnect the game socket
+    const [reconnects, setReconnects] = useState(0);
+    const turnSocketRef = useRef(null); // turns are sent on the game socket
     const [gameState, setGameState] = useState(null);
     const [users, setUsers] = useState([]);
     const [userDetails, setUserDetails] = useState({});
@@ -753,6 +757,10 @@ function FishGameScreen() {
       }
     }, [gameState, isProcessingClaim, gameEnded, navigate, userDetails, users, gameId, gameName]);
 
+    // Send a turn on the game socket (HTTP until it is connected); resolves to a fetch-style Response
+    const sendTurn = (turnModel) =>
+      turnSocketRef.current ? turnSocketRef.current.sendTurn(turnModel) : playTurnOverHttp(gameId, turnModel);
+
     // Get current user's backend ID
     const getCurrentUserId = () => {
       if (backendUser && backendUser.id) {
@@ -772,93 +780,87 @@ function FishGameScreen() {
       return userCards.map(card => convertCardToString(card));
     };
 
-    // Function to fetch user details by ID
-    const fetchUserDetails = async (userId) => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/users/${userId}`);
-        if (response.ok) {
-          const userData = await response.json();
-          return userData;
-        } else {
-          console.error(`Failed to fetch user details for ${userId}`);
-          return null;
-        }
-      } catch (error) {
-        console.error(`Error fetching user details for ${userId}:`, error);
-        return null;
-      }
-    };
-    
-    // Function to fetch multiple user details
+    // Function to fetch multiple user details in one batched request
     const fetchAllUserDetails = async (userIds) => {
-      const newUserDetails = { ...userDetails };
-      
       // Only fetch details for users we don't already have
-      const usersToFetch = userIds.filter(userId => !newUserDetails[userId]);
-      
+      const usersToFetch = userIds.filter(userId => !userDetails[userId]);
       if (usersToFetch.length === 0) return;
-      
-      const fetchPromises = usersToFetch.map(async (userId) => {
-        const userData = await fetchUserDetails(userId);
-        if (userData) {
-          newUserDetails[userId] = userData;
-        }
-        return userData;
-      });
-      
-      await Promise.all(fetchPromises);
-      setUserDetails(newUserDetails);
+
+      const fetchedUsers = await fetchUsers(usersToFetch);
+      setUserDetails(prev => ({ ...prev, ...fetchedUsers }));
     };
 
     // Set up WebSocket connection for game state
     useEffect(() => {
-      if (!gameId || !currentUser) return;
-      
-      // Create WebSocket connection for Fish game
-      const wsUrl = getWebSocketURL(`/game/ws/${gameId}`);
-      console.log('Connecting to Fish game WebSocket:', wsUrl);
-      
-      const ws = new WebSocket(wsUrl);
-      
-      ws.onopen = () => {
-        console.log('Fish game WebSocket connection established');
-      };
-      
-      ws.onmessage = (event) => {
-        const data = JSON.parse(event.data);
-        /*console.log('Received Fish game state:', data);*/
-        setGameState(data);
-        
-        // Extract users from game state if available
-        if (data.owners) {
-          const playerIds = Object.keys(data.owners).filter(id => 
-            id !== 'suits_1' && 
-            id !== 'suits_2' && 
-            id !== 'options' && 
-            data.owners[id].cards
-          );
-          setUsers(playerIds);
-          fetchAllUserDetails(playerIds);
-        }
-      };
-      
-      ws.onerror = (error) => {
-        console.error('Fish game WebSocket error:', error);
-      };
-      
-      ws.onclose = () => {
-        console.log('Fish game WebSocket connection closed');
-      };
+      if (!gameId || !currentUser || !backendUser?.id) return;
       
-      setWebsocket(ws);
+      let ws = null;
+      let closed = false;
+      // The server seats the socket as the account this ID token belongs to
+      currentUser.getIdToken().then((token) => {
+        if (closed) return;
+        // Create WebSocket connection for Fish game
+        console.log('Connecting to Fish game WebSocket:', getWebSocketURL(`/game/ws/${gameId}`));
+        ws = new WebSocket(getWebSocketURL(`/game/ws/${gameId}?token=${encodeURIComponent(token)}`));
+        const turnSocket = createTurnSocket(ws, gameId);
+        turnSocketRef.current = turnSocket;
+
+        ws.onopen = () => {
+          console.log('Fish game WebSocket connection established');
+        };
+
+        ws.onmessage = (event) => {
+          const data = JSON.parse(event.data);
+          // Acks and rejects of our turns; everything else is a game state
+          if (turnSocket.handleMessage(data)) return;
+          // The server dropped the game after it sat idle; an archived game
+          // comes back when the socket reconnects
+          if (data.type === 'game_expired') {
+            if (data.archived) {
+              setReconnects(n => n + 1);
+            } else {
+              alert('This game expired after being idle for too long.');
+              navigate('/app/lobby');
+            }
+            return;
+          }
+          /*console.log('Received Fish game state:', data);*/
+          setGameState(data);
+
+          // Extract users from game state if available
+          if (data.owners) {
+            const playerIds = Object.keys(data.owners).filter(id => 
+              id !== 'suits_1' && 
+              id !== 'suits_2' && 
+              id !== 'options' && 
+              data.owners[id].cards
+            );
+            setUsers(playerIds);
+            fetchAllUserDetails(playerIds);
+          }
+        };
+
+        ws.onerror = (error) => {
+          console.error('Fish game WebSocket error:', error);
+        };
+
+        ws.onclose = () => {
+          console.log('Fish game WebSocket connection closed');
+        };
+
+        setWebsocket(ws);
+      }).catch((error) => {
+        console.error('Failed to get an ID token for the game WebSocket:', error);
+      });
       
       // Clean up the WebSocket connection when the component unmounts
       return () => {
+        closed = true;
         if (ws) {
           ws.close();
         }
       };
-    }, [gameId, currentUser]);
+    }, [gameId, currentUser, backendUser?.id, reconnects]);
    
 
     // Function to generate turn model for asking questions (turn_type = 0)
@@ -929,20 +931,13 @@ function FishGameScreen() {
         return;
       }
       
-      console.log('Sending Fish question to API:', {
-        endpoint: `${API_BASE_URL}/games/${gameId}/play`,
-        method: 'PATCH',
+      console.log('Sending Fish question:', {
+        gameId,
         data: turnModel
       });
       
       try {
-        const response = await fetch(`${API_BASE_URL}/games/${gameId}/play`, {
-          method: 'PATCH',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify(turnModel)
-        });
+        const response = await sendTurn(turnModel);
         
         if (response.ok) {
           // Clear selections on successful question
@@ -1030,20 +1025,13 @@ function FishGameScreen() {
       
       console.log('Initiating claim for half-suit:', halfSuitNames[halfSuitIndex]);
       console.log('Using example card:', exampleCard);
-      console.log('Sending claim initiation to API:', {
-        endpoint: `${API_BASE_URL}/games/${gameId}/play`,
-        method: 'PATCH',
+      console.log('Sending claim initiation:', {
+        gameId,
         data: turnModel
       });
       
       try {
-        const response = await fetch(`${API_BASE_URL}/games/${gameId}/play`, {
-          method: 'PATCH',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify(turnModel)
-        });
+        const response = await sendTurn(turnModel);
         
         console.log('Claim response status:', response.status);
         console.log('Claim response ok:', response.ok);
@@ -1093,8 +1081,7 @@ function FishGameScreen() {
             responseText,
             responseData,
             request: {
-              url: `${API_BASE_URL}/games/${gameId}/play`,
-              method: 'PATCH',
+              gameId,
               body: turnModel
             }
           });
@@ -1230,13 +1217,7 @@ function FishGameScreen() {
       setIsProcessingClaim(true);
       
       try {
-        const response = await fetch(`${API_BASE_URL}/games/${gameId}/play`, {
-          method: 'PATCH',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify(turnModel)
-        });
+        const response = await sendTurn(turnModel);
         
         console.log('Claim response status:', response.status);
         console.log('Claim response ok:', response.ok);
@@ -1286,8 +1267,7 @@ function FishGameScreen() {
             responseText,
             responseData,
             request: {
-              url: `${API_BASE_URL}/games/${gameId}/play`,
-              method: 'PATCH',
+              gameId,
               body: turnModel
             }
           });
@@ -1368,11 +1348,7 @@ function FishGameScreen() {
       console.debug("[DELEGATE] Built turnModel:", JSON.stringify(turnModel, null, 2));
     
       try {
-        const res = await fetch(`${API_BASE_URL}/games/${gameId}/play`, {
-          method: 'PATCH',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify(turnModel)
-        });
+        const res = await sendTurn(turnModel);
     
         if (!res.ok) {
           let errData = "";
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useLocation, useParams } from 'react-router-dom';
-import { API_BASE_URL } from '../config';
+import { API_BASE_URL, fetchUsers } from '../config';
 import './FishGameScreen.css';
 
 // --- Helper Components and Functions (from FishGameScreen) ---
@@ -370,35 +370,14 @@ function FishReplay() {
     return `${ranks[card.rank] || card.rank}${suits[card.suit] || card.suit}`;
   };
 
-  // Fetch user details
-  const fetchUserDetails = async (userId) => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/users/${userId}`);
-      if (response.ok) {
-        const userData = await response.json();
-        return userData;
-      } else {
-        console.error(`Failed to fetch user details for ${userId}`);
-        return null;
-      }
-    } catch (error) {
-      console.error(`Error fetching user details for ${userId}:`, error);
-      return null;
-    }
-  };
+  // Function to fetch multiple user details in one batched request
   const fetchAllUserDetails = async (userIds) => {
-    const newUserDetails = { ...userDetails };
-    const usersToFetch = userIds.filter(userId => !newUserDetails[userId]);
+    // Only fetch details for users we don't already have
+    const usersToFetch = userIds.filter(userId => !userDetails[userId]);
     if (usersToFetch.length === 0) return;
-    const fetchPromises = usersToFetch.map(async (userId) => {
-      const userData = await fetchUserDetails(userId);
-      if (userData) {
-        newUserDetails[userId] = userData;
-      }
-      return userData;
-    });
-    await Promise.all(fetchPromises);
-    setUserDetails(newUserDetails);
+
+    const fetchedUsers = await fetchUsers(usersToFetch);
+    setUserDetails(prev => ({ ...prev, ...fetchedUsers }));
   };
 
   // Fetch replay data
@@ -2,7 +2,7 @@ import React, { useState, useEffect, useCallback } from 'react';
 import { useLocation, useNavigate, useOutletContext } from 'react-router-dom';
 import { auth } from '../firebase';
 import { onAuthStateChanged } from 'firebase/auth';
-import { API_BASE_URL, getWebSocketURL } from '../config';
+import { API_BASE_URL, getWebSocketURL, fetchUsers } from '../config';
 import './Game.css';
 
 function Game() {
@@ -29,42 +29,14 @@ function Game() {
         return () => unsubscribe();
     }, []);
     
-    // Function to fetch user details by ID
-    const fetchUserDetails = async (userId) => {
-        try {
-            const response = await fetch(`${API_BASE_URL}/users/${userId}`);
-            if (response.ok) {
-                const userData = await response.json();
-                return userData;
-            } else {
-                console.error(`Failed to fetch user details for ${userId}`);
-                return null;
-            }
-        } catch (error) {
-            console.error(`Error fetching user details for ${userId}:`, error);
-            return null;
-        }
-    };
-    
-    // Function to fetch multiple user details
+    // Function to fetch multiple user details in one batched request
     const fetchAllUserDetails = async (userIds) => {
-        const newUserDetails = { ...userDetails };
-        
         // Only fetch details for users we don't already have
-        const usersToFetch = userIds.filter(userId => !newUserDetails[userId]);
-        
+        const usersToFetch = userIds.filter(userId => !userDetails[userId]);
         if (usersToFetch.length === 0) return;
-        
-        const fetchPromises = usersToFetch.map(async (userId) => {
-            const userData = await fetchUserDetails(userId);
-            if (userData) {
-                newUserDetails[userId] = userData;
-            }
-            return userData;
-        });
-        
-        await Promise.all(fetchPromises);
-        setUserDetails(newUserDetails);
+
+        const fetchedUsers = await fetchUsers(usersToFetch);
+        setUserDetails(prev => ({ ...prev, ...fetchedUsers }));
     };
     
     // Get the game ID from the URL query parameters
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './Lobby.css';
 import { Link, useNavigate, useOutletContext } from 'react-router-dom';
 import { auth } from '../firebase'; // Import Firebase auth
@@ -60,6 +60,8 @@ function GameBox({ game, onJoinGame, maxPlayers }) {
     );
 }
 
+const gameKey = (game) => game.id || game._id;
+
 // Component for pagination controls
 function PaginationControls({ pagination, onPageChange }) {
     if (!pagination || pagination.total_pages <= 1) {
@@ -99,13 +101,75 @@ function Lobby() {
     const [websocket, setWebsocket] = useState(null);
     const [connectionStatus, setConnectionStatus] = useState('Connecting...');
     const [error, setError] = useState(null);
+    // Latest page, for handling lobby events inside the socket callbacks
+    const gamesRef = useRef([]);
+    const paginationRef = useRef(null);
+
+    useEffect(() => {
+        gamesRef.current = games;
+        paginationRef.current = pagination;
+    }, [games, pagination]);
     
     const requestPage = (page) => {
         if (websocket && websocket.readyState === WebSocket.OPEN) {
-            websocket.send(JSON.stringify({
-                type: 'request_page',
-                page: page
-            }));
+            // Page through with the keyset cursors so pages don't shift as games come and go
+            const message = { type: 'request_page' };
+            if (pagination && page === pagination.current_page + 1 && pagination.next_cursor) {
+                message.after = pagination.next_cursor;
+            } else if (pagination && page === pagination.current_page - 1 && pagination.prev_cursor) {
+                message.before = pagination.prev_cursor;
+            } else {
+                message.page = page;
+            }
+            websocket.send(JSON.stringify(message));
+        }
+    };
+
+    // Refill the current page from the server's in-memory index
+    const requestCurrentPage = (ws) => {
+        const current = paginationRef.current;
+        ws.send(JSON.stringify(current?.start_after
+            ? { type: 'request_page', after: current.start_after }
+            : { type: 'request_page', page: 0 }));
+    };
+
+    // Apply a batch of lobby events; several games added or removed at once
+    // are simpler to show by fetching the page again
+    const handleLobbyEvents = (ws, data) => {
+        const moved = data.events.filter(event => event.type !== 'game_updated');
+        data.events.filter(event => event.type === 'game_updated').forEach(event => handleLobbyEvent(ws, event));
+        if (moved.length === 1) {
+            handleLobbyEvent(ws, moved[0]);
+        } else if (moved.length > 1) {
+            requestCurrentPage(ws);
+        }
+    };
+
+    // Apply an incremental lobby event to the page being shown
+    const handleLobbyEvent = (ws, data) => {
+        const current = paginationRef.current;
+        if (data.type === 'game_updated') {
+            setGames(prev => prev.map(game => gameKey(game) === gameKey(data.game) ? data.game : game));
+            return;
+        }
+        if (data.type === 'game_removed') {
+            requestCurrentPage(ws);
+            return;
+        }
+        // game_added: new games sort last, so only the last page can show it
+        const onLastPage = !current || !current.has_next;
+        const hasRoom = gamesRef.current.length < (current?.games_per_page ?? 10);
+        if (onLastPage && hasRoom) {
+            setGames(prev => [...prev, data.game]);
+        }
+        if (current) {
+            setPagination({
+                ...current,
+                total_games: data.total_games,
+                total_pages: Math.ceil(data.total_games / current.games_per_page),
+                has_next: current.has_next || (onLastPage && !hasRoom),
+                next_cursor: current.next_cursor ?? (onLastPage && !hasRoom ? gameKey(gamesRef.current[gamesRef.current.length - 1]) : null),
+            });
         }
     };
 
@@ -165,6 +229,11 @@ function Lobby() {
                 const data = JSON.parse(event.data);
                 console.log('Received lobby data:', data);
                 
+                if (data.type === 'lobby_events') {
+                    handleLobbyEvents(ws, data);
+                    return;
+                }
+
                 // Handle new paginated format
                 if (data.games && data.pagination) {
                     setGames(data.games);
@@ -244,7 +313,7 @@ function Lobby() {
                     <div className="games-list">
                         {games.map((game) => (
                             <GameBox 
-                                key={game.id || game._id || Math.random()} 
+                                key={gameKey(game) || Math.random()} 
                                 game={game} 
                                 onJoinGame={handleJoinGame}
                                 maxPlayers={MAX_PLAYERS}
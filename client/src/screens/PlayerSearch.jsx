@@ -13,6 +13,7 @@ function PlayerSearch() {
         min_claim_rate: '',
     });
     const [results, setResults] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
     const navigate = useNavigate();
@@ -22,20 +23,22 @@ function PlayerSearch() {
         setFilters((prev) => ({ ...prev, [name]: value }));
     };
 
-    const handleSearch = async (e) => {
-        e.preventDefault();
+    // Fetches one page of results; pass the previous page's cursor to append the next one
+    const fetchPage = async (cursor = null) => {
         setLoading(true);
         setError(null);
-        setResults([]);
+        if (!cursor) setResults([]);
         try {
             const params = new URLSearchParams();
             Object.entries(filters).forEach(([key, value]) => {
                 if (value !== '' && value !== null) params.append(key, value);
             });
+            if (cursor) params.append('cursor', cursor);
             const response = await fetch(`${API_BASE_URL}/users/search?${params.toString()}`);
             if (!response.ok) throw new Error(`Failed to fetch users: ${response.status}`);
             const data = await response.json();
-            setResults(data.users || []);
+            setResults((prev) => (cursor ? [...prev, ...(data.users || [])] : data.users || []));
+            setNextCursor(data.next_cursor || null);
         } catch (err) {
             setError(err.message);
         } finally {
@@ -43,6 +46,11 @@ function PlayerSearch() {
         }
     };
 
+    const handleSearch = (e) => {
+        e.preventDefault();
+        fetchPage();
+    };
+
     const handleRowClick = (user) => {
         navigate(`/app/stats/${user.id || user._id}`);
     };
@@ -56,7 +64,7 @@ function PlayerSearch() {
         <div>
             <h1>Player Search</h1>
             <form onSubmit={handleSearch} style={{ display: 'flex', flexWrap: 'wrap', gap: '1rem', marginBottom: '1rem' }}>
-                <input name="name" value={filters.name} onChange={handleChange} placeholder="Username (partial)" />
+                <input name="name" value={filters.name} onChange={handleChange} placeholder="Username (starts with)" />
                 <input name="min_fish_games" value={filters.min_fish_games} onChange={handleChange} placeholder="Min Fish Games" type="number" min="0" />
                 <input name="min_vietcong_games" value={filters.min_vietcong_games} onChange={handleChange} placeholder="Min Vietcong Games" type="number" min="0" />
                 <input name="min_fish_win_rate" value={filters.min_fish_win_rate} onChange={handleChange} placeholder="Min Fish Win Rate (0-1)" type="number" step="0.01" min="0" max="1" style={{ width: '140px' }} />
@@ -122,6 +130,9 @@ function PlayerSearch() {
                     </tbody>
                 </table>
             </div>
+            {nextCursor && (
+                <button onClick={() => fetchPage(nextCursor)} disabled={loading} style={{ marginTop: '1rem' }}>Load more</button>
+            )}
         </div>
     );
 }
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useLocation, useOutletContext, useParams, useNavigate } from 'react-router-dom';
 import { auth } from '../firebase';
-import { API_BASE_URL, getWebSocketURL } from '../config';
+import { API_BASE_URL, getWebSocketURL, fetchUsers, createTurnSocket, playTurnOverHttp } from '../config';
 
 import './Vietcong.css'
 
@@ -142,7 +142,8 @@ function getAllPlayers(users, userDetails, gameState, currentUserId) {
   let players = [];
   users.forEach((userId, index) => {
     const isCurrentPlayer = gameState?.current_player === userId;
-    const cardCount = gameState?.owners?.[userId]?.cards?.length || 0;
+    const owner = gameState?.owners?.[userId];
+    const cardCount = owner?.card_count ?? owner?.cards?.length ?? 0;
     const isCurrentUser = userId === currentUserId;
     const playerStatus = gameState?.player_status?.[userId] || null;
     players.push(otherPlayer(userId, userDetails, isCurrentPlayer, cardCount, isCurrentUser, playerStatus));
@@ -270,6 +271,9 @@ function VietcongGameScreen() {
   const [gameId, setGameId] = useState(null);
   const [gameName, setGameName] = useState('');
   const [websocket, setWebsocket] = useState(null);
+  // Bumped to reconnect the game socket
+  const [reconnects, setReconnects] = useState(0);
+  const turnSocketRef = useRef(null); // turns are sent on the game socket
   const [gameState, setGameState] = useState(null);
   const [users, setUsers] = useState([]);
   const [userDetails, setUserDetails] = useState({});
@@ -454,88 +458,86 @@ function VietcongGameScreen() {
     return userCards.map(card => convertCardToString(card));
   };
 
-  // Function to fetch user details by ID
-  const fetchUserDetails = async (userId) => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/users/${userId}`);
-      if (response.ok) {
-        const userData = await response.json();
-        return userData;
-      } else {
-        console.error(`Failed to fetch user details for ${userId}`);
-        return null;
-      }
-    } catch (error) {
-      console.error(`Error fetching user details for ${userId}:`, error);
-      return null;
-    }
-  };
-
-  // Function to fetch multiple user details
+  // Function to fetch multiple user details in one batched request
   const fetchAllUserDetails = async (userIds) => {
-    const newUserDetails = { ...userDetails };
-
     // Only fetch details for users we don't already have
-    const usersToFetch = userIds.filter(userId => !newUserDetails[userId]);
-
+    const usersToFetch = userIds.filter(userId => !userDetails[userId]);
     if (usersToFetch.length === 0) return;
 
-    const fetchPromises = usersToFetch.map(async (userId) => {
-      const userData = await fetchUserDetails(userId);
-      if (userData) {
-        newUserDetails[userId] = userData;
-      }
-      return userData;
-    });
-
-    await Promise.all(fetchPromises);
-    setUserDetails(newUserDetails);
+    const fetchedUsers = await fetchUsers(usersToFetch);
+    setUserDetails(prev => ({ ...prev, ...fetchedUsers }));
   };
 
   // Set up WebSocket connection for game state
   useEffect(() => {
-    if (!gameId || !currentUser) return;
-
-    // Create WebSocket connection
-    const wsUrl = getWebSocketURL(`/game/ws/${gameId}`);
-    console.log('Connecting to game WebSocket:', wsUrl);
-
-    const ws = new WebSocket(wsUrl);
-
-    ws.onopen = () => {
-      console.log('Game WebSocket connection established');
-    };
-
-    ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      console.log('Received game state:', data);
-      setGameState(data);
+    if (!gameId || !currentUser || !backendUser?.id) return;
+
+    let ws = null;
+    let closed = false;
+    // The server seats the socket as the account this ID token belongs to
+    currentUser.getIdToken().then((token) => {
+      if (closed) return;
+      // Create WebSocket connection
+      console.log('Connecting to game WebSocket:', getWebSocketURL(`/game/ws/${gameId}`));
+      ws = new WebSocket(getWebSocketURL(`/game/ws/${gameId}?token=${encodeURIComponent(token)}`));
+      const turnSocket = createTurnSocket(ws, gameId);
+      turnSocketRef.current = turnSocket;
+
+      ws.onopen = () => {
+        console.log('Game WebSocket connection established');
+      };
 
-      // Extract users from game state if available
-      if (data.owners) {
-        const playerIds = Object.keys(data.owners).filter(id => id !== 'pile' && data.owners[id].is_player);
-        setUsers(playerIds);
-        fetchAllUserDetails(playerIds);
-      }
-    };
+      ws.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        // Acks and rejects of our turns; everything else is a game state
+        if (turnSocket.handleMessage(data)) return;
+        // The server dropped the game after it sat idle; an archived game
+        // comes back when the socket reconnects
+        if (data.type === 'game_expired') {
+          if (data.archived) {
+            setReconnects(n => n + 1);
+          } else {
+            alert('This game expired after being idle for too long.');
+            navigate('/app/lobby');
+          }
+          return;
+        }
+        console.log('Received game state:', data);
+        setGameState(data);
+
+        // Extract users from game state if available
+        if (data.owners) {
+          const playerIds = Object.keys(data.owners).filter(id => id !== 'pile' && data.owners[id].is_player);
+          setUsers(playerIds);
+          fetchAllUserDetails(playerIds);
+        }
+      };
 
-    ws.onerror = (error) => {
-      console.error('Game WebSocket error:', error);
-    };
+      ws.onerror = (error) => {
+        console.error('Game WebSocket error:', error);
+      };
 
-    ws.onclose = () => {
-      console.log('Game WebSocket connection closed');
-    };
+      ws.onclose = () => {
+        console.log('Game WebSocket connection closed');
+      };
 
-    setWebsocket(ws);
+      setWebsocket(ws);
+    }).catch((error) => {
+      console.error('Failed to get an ID token for the game WebSocket:', error);
+    });
 
     // Clean up the WebSocket connection when the component unmounts
     return () => {
+      closed = true;
       if (ws) {
         ws.close();
       }
     };
-  }, [gameId, currentUser]);
+  }, [gameId, currentUser, backendUser?.id, reconnects]);
+
+  // Send a turn on the game socket (HTTP until it is connected); resolves to a fetch-style Response
+  const sendTurn = (turnModel) =>
+    turnSocketRef.current ? turnSocketRef.current.sendTurn(turnModel) : playTurnOverHttp(gameId, turnModel);
 
   // Get current user's backend ID
   const getCurrentUserId = () => {
@@ -571,13 +573,7 @@ function VietcongGameScreen() {
     }
 
     try {
-      const response = await fetch(`${API_BASE_URL}/games/${gameId}/play`, {
-        method: 'PATCH',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(turnModel)
-      });
+      const response = await sendTurn(turnModel);
 
       if (response.ok) {
         // Clear selected cards on successful play
@@ -614,13 +610,7 @@ function VietcongGameScreen() {
     }
 
     try {
-      const response = await fetch(`${API_BASE_URL}/games/${gameId}/play`, {
-        method: 'PATCH',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(turnModel)
-      });
+      const response = await sendTurn(turnModel);
 
       if (response.ok) {
         console.log("Passed successfully!");
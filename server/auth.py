@@ -0,0 +1,88 @@
+"""
+Firebase ID token verification, so a socket acts as the account its client
+is signed in with rather than whichever user id it claims.
+
+ID tokens are RS256 JWTs signed by Google's securetoken service account.
+They are checked with PyJWT: its PyJWKClient fetches the service account's
+public keys, caches them for JWKS_CACHE_SECONDS and fetches them again for
+a key id it hasn't seen; `jwt.decode` checks the signature and claims.
+
+FIREBASE_PROJECT_ID names the project tokens must be issued for.
+"""
+import asyncio
+import os
+import jwt
+from jwt import PyJWKClient
+from jwt.exceptions import PyJWKClientConnectionError, PyJWTError
+
+try:
+    from .user_cache import user_cache
+except ImportError:  # Allows running directly from server/
+    from user_cache import user_cache  # type: ignore
+
+JWKS_URL = "https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com"
+JWKS_CACHE_SECONDS = 3600
+CLOCK_SKEW = 60 # seconds of leeway on exp/iat
+
+class InvalidToken(ValueError):
+    pass
+
+class FirebaseTokenVerifier:
+    def __init__(self, project_id: str = None, keys_url: str = JWKS_URL):
+        self.project_id = project_id or os.environ.get("FIREBASE_PROJECT_ID", "multiplayercards-2ae3e")
+        self.keys = PyJWKClient(keys_url, cache_jwk_set=True, lifespan=JWKS_CACHE_SECONDS, timeout=10)
+        self.verified = 0
+        self.rejected = 0
+
+    async def verify(self, token: str) -> dict:
+        """
+        The claims of `token` if it is a valid, unexpired ID token for this
+        project. Raises InvalidToken otherwise.
+        """
+        try:
+            claims = await asyncio.to_thread(self._verify, token)
+        except InvalidToken:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        return claims
+
+    def _verify(self, token: str) -> dict:
+        # Blocking: PyJWKClient fetches keys with urllib
+        try:
+            key = self.keys.get_signing_key_from_jwt(token)
+            claims = jwt.decode(
+                token,
+                key.key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=f"https://securetoken.google.com/{self.project_id}",
+                leeway=CLOCK_SKEW,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except PyJWKClientConnectionError:
+            raise # Google's keys are unreachable; not the token's fault
+        except PyJWTError as e:
+            raise InvalidToken(str(e)) from e
+        if not isinstance(claims["sub"], str) or not claims["sub"]:
+            raise InvalidToken("Token has no subject")
+        return claims
+
+    def metrics(self) -> dict:
+        return {
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
+
+token_verifier = FirebaseTokenVerifier()
+
+async def authenticate(token: str) -> str:
+    """
+    The id of the user a Firebase ID token was issued to. Raises
+    InvalidToken if the token doesn't verify or belongs to no user.
+    """
+    claims = await token_verifier.verify(token)
+    user = await user_cache.get_by_firebase_uid(claims["sub"])
+    if user is None:
+        raise InvalidToken("No user for this account")
+    return str(user["_id"])
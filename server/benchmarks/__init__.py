@@ -0,0 +1,5 @@
+"""
+Standalone benchmarks for the game engine and server internals.
+
+Run from the repository root, e.g. `python -m server.benchmarks.combo_classifier`.
+"""
@@ -0,0 +1,124 @@
+"""
+Microbenchmark: cost of fanning one game state out to every socket of a
+game, per turn, and of sending the state to a newly connected socket.
+
+    before   rebuild the state model and dict, json-encode it per socket
+    cached   GameWebSocketManager.broadcast with the versioned frame cache:
+             one build per turn, one projection and encoding per view,
+             handed to each socket's send queue
+
+Sockets are stand-ins that only record what they are sent, so the numbers
+are serialization cost alone.
+
+    python -m server.benchmarks.broadcast_fanout [--spectators N] [--turns N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+# The engine imports the Mongo client module; no connection is opened.
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+
+from starlette.websockets import WebSocketState
+
+try:
+    from ..game_manager import GameTracker
+    from ..simulation import RandomPlayer
+    from ..game import NullManager
+except ImportError:  # Allows running directly from server/
+    from game_manager import GameTracker  # type: ignore
+    from simulation import RandomPlayer  # type: ignore
+    from game import NullManager  # type: ignore
+
+
+class FakeSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.sent = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent += len(text)
+
+    async def send_json(self, data: dict):
+        # What starlette does before sending
+        self.sent += len(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+async def setup(game_type: str, spectators: int, warmup: int):
+    tracker = GameTracker()
+    players = [f"{i:024x}" for i in range({"fish": 6, "vietcong": 4}[game_type])]
+    tracker.create_game("bench", "bench", game_type, players)
+    manager = tracker.games["bench"]
+    manager.update_user_stats = NullManager().update_user_stats # claims would write stats to Mongo
+
+    # Move the game off its opening state
+    policy = RandomPlayer(random.Random(0))
+    for _ in range(warmup):
+        game = manager.game
+        await game.play_turn(policy.next_turn(game, game.players[game.current_player]))
+
+    sockets = [FakeSocket() for _ in range(len(players) + spectators)]
+    for i, socket in enumerate(sockets):
+        await tracker.websocket_manager.connect("bench", socket, players[i] if i < len(players) else None)
+    return tracker, manager, sockets
+
+
+async def before_turn(manager, sockets):
+    message = manager.game.to_game_state().dict()
+    for socket in sockets:
+        await socket.send_json(message)
+
+
+async def cached_turn(tracker, manager):
+    manager.game.state_changed()
+    await tracker.broadcast("bench", manager.game.current_state())
+
+
+async def run(args):
+    tracker, manager, sockets = await setup(args.game, args.spectators, args.warmup)
+    print(f"{args.game}: {len(sockets)} sockets ({len(sockets) - args.spectators} seats, {args.spectators} spectators), {args.turns} turns")
+
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        await before_turn(manager, sockets)
+    before = (time.perf_counter() - start) / args.turns
+
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        await cached_turn(tracker, manager)
+    cached = (time.perf_counter() - start) / args.turns
+
+    print(f"  broadcast  before {before * 1e6:9.1f} us/turn   cached {cached * 1e6:9.1f} us/turn   ({before / cached:.1f}x)")
+
+    # A socket joining mid-turn: rebuild and encode vs. cached frame
+    socket = FakeSocket()
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        await socket.send_json(manager.get_game_state().dict())
+    before = (time.perf_counter() - start) / args.turns
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        await socket.send_text(manager.state_frame(None))
+    cached = (time.perf_counter() - start) / args.turns
+    print(f"  connect    before {before * 1e6:9.1f} us       cached {cached * 1e6:9.1f} us       ({before / cached:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=["fish", "vietcong"], default="fish")
+    parser.add_argument("--spectators", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=10, help="random turns played before timing")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Checkpoints of the active games, so a restart or crash doesn't lose them.
+
+A game is marked dirty when it is created and after every accepted turn; a
+background worker writes whatever is dirty every CHECKPOINT_DELAY seconds,
+each game once with its latest state, in one batch. A checkpoint holds the
+engine's compact state (see `Game.checkpoint`) and the replay log's cursor:
+its turns, appended by index so a retried write can't duplicate them, and
+its latest state. At startup every checkpoint is read back in one query and
+the games are rebuilt as they were (see `GameTracker.restore_games`).
+
+Games evicted from memory (see reaper.py) can be archived instead: their
+checkpoint is kept with an `archived_at` time, skipped at startup, and the
+game is restored from it when it is next played or viewed.
+
+Checkpoints go to Mongo by default, or to one JSON file per game in
+CHECKPOINT_DIR with CHECKPOINT_STORE=file. CHECKPOINT_STORE=off disables them.
+"""
+import asyncio
+import json
+import os
+import time
+import traceback
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+try:
+    from .core import checkpoint_collection
+except ImportError:  # Allows running directly from server/
+    from core import checkpoint_collection  # type: ignore
+
+class MongoCheckpointStore:
+    def __init__(self, collection=checkpoint_collection):
+        self.collection = collection
+
+    async def load(self) -> list[dict]:
+        return await self.collection.find({"archived_at": None}).to_list(None)
+
+    async def load_one(self, game_id: str) -> dict:
+        return await self.collection.find_one({"_id": game_id})
+
+    async def purge(self, before: float) -> int:
+        result = await self.collection.delete_many({"archived_at": {"$lt": before}})
+        return result.deleted_count
+
+    async def write(self, saves: list[tuple[dict, list[dict], int]], deletes: list[str]) -> set[str]:
+        """
+        Write each (checkpoint, turns, first new turn) and drop the
+        checkpoints of `deletes`. Returns the game ids that failed.
+        """
+        ops = []
+        game_ids = [] # game id of each op, for mapping write errors back
+        for doc, turns, saved in saves:
+            fields = {key: value for key, value in doc.items() if key != "_id"}
+            if saved == 0:
+                fields["turns"] = turns
+            else:
+                fields.update({f"turns.{i}": turns[i] for i in range(saved, len(turns))})
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}, upsert=True))
+            game_ids.append(doc["_id"])
+        ops.extend(DeleteOne({"_id": game_id}) for game_id in deletes)
+        game_ids.extend(deletes)
+        if not ops:
+            return set()
+        try:
+            await self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything but the reported ops was applied
+            print(f"Failed to write {len(e.details['writeErrors'])} checkpoints: {e.details['writeErrors'][0]['errmsg']}")
+            return {game_ids[error["index"]] for error in e.details["writeErrors"]}
+        except Exception as e:
+            print(f"Failed to write {len(ops)} checkpoints: {e}")
+            return set(game_ids)
+        return set()
+
+class FileCheckpointStore:
+    """
+    One `<game id>.json` per game, replaced atomically on every write.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, game_id: str) -> str:
+        return os.path.join(self.directory, f"{game_id}.json")
+
+    async def load(self) -> list[dict]:
+        return await asyncio.to_thread(self._load)
+
+    async def load_one(self, game_id: str) -> dict:
+        return await asyncio.to_thread(self._load_one, game_id)
+
+    async def purge(self, before: float) -> int:
+        return await asyncio.to_thread(self._purge, before)
+
+    async def write(self, saves: list[tuple[dict, list[dict], int]], deletes: list[str]) -> set[str]:
+        return await asyncio.to_thread(self._write, saves, deletes)
+
+    # The blocking file I/O, run off the event loop
+
+    def _load(self) -> list[dict]:
+        docs = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    doc = json.load(f)
+                if doc.get("archived_at") is None:
+                    docs.append(doc)
+        return docs
+
+    def _load_one(self, game_id: str) -> dict:
+        try:
+            with open(self.path(game_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _purge(self, before: float) -> int:
+        purged = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # Archived files are not written again, so only old ones can qualify
+            if not name.endswith(".json") or os.path.getmtime(path) >= before:
+                continue
+            with open(path) as f:
+                archived_at = json.load(f).get("archived_at")
+            if archived_at is not None and archived_at < before:
+                os.unlink(path)
+                purged += 1
+        return purged
+
+    def _write(self, saves: list[tuple[dict, list[dict], int]], deletes: list[str]) -> set[str]:
+        failed = set()
+        for game_id in deletes:
+            try:
+                os.unlink(self.path(game_id))
+            except FileNotFoundError:
+                pass
+        for doc, turns, _ in saves:
+            path = self.path(doc["_id"])
+            try:
+                with open(path + ".tmp", "w") as f:
+                    json.dump({**doc, "turns": turns}, f)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                print(f"Failed to write checkpoint {doc['_id']}: {e}")
+                failed.add(doc["_id"])
+        return failed
+
+class Checkpointer:
+    def __init__(self, store, delay: float = None):
+        self.store = store
+        self.delay = delay if delay is not None else float(os.environ.get("CHECKPOINT_DELAY", 0.05))
+        self.dirty: dict[str, object] = {} # game id -> GameManager with unwritten changes
+        self.writing: dict[str, object] = {} # the same, for the batch being written
+        self.deleted: set[str] = set()
+        self.archiving: set[str] = set() # games evicted from memory, written as archived
+        self.turn_docs: dict[str, list[dict]] = {} # game id -> its logged turns, serialized once
+        self.saved_turns: dict[str, int] = {} # game id -> turns already in its stored checkpoint
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.task: asyncio.Task = None
+        self.closed = False
+        self.batches = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_write_seconds = 0.0
+        self.restored = 0
+        self.restore_seconds = 0.0
+
+    def mark(self, manager):
+        """
+        Queue a checkpoint of the manager's game as it is when written.
+        """
+        if self.store is None:
+            return
+        # A game marked again after being removed keeps its new checkpoint
+        self.deleted.discard(manager.game_id)
+        self.dirty[manager.game_id] = manager
+        self._wake()
+
+    def remove(self, game_id: str):
+        """
+        Queue deleting a finished (or deleted) game's checkpoint.
+        """
+        if self.store is None:
+            return
+        self.dirty.pop(game_id, None)
+        self.archiving.discard(game_id)
+        self.deleted.add(game_id)
+        self._wake()
+
+    def archive(self, manager):
+        """
+        Queue a last checkpoint of a game leaving memory, kept as archived.
+        """
+        if self.store is None:
+            return
+        self.archiving.add(manager.game_id)
+        self.mark(manager)
+
+    @property
+    def archives(self) -> bool:
+        return self.store is not None
+
+    async def take_archived(self, game_id: str):
+        """
+        An archived game's manager if its archive is still being written,
+        or else its archived checkpoint; None if it has neither. Either way
+        the game is no longer archived once restored and marked again.
+        """
+        if self.store is None or game_id in self.deleted:
+            return None
+        if game_id in self.archiving:
+            self.archiving.discard(game_id)
+            return self.dirty.get(game_id) or self.writing.get(game_id)
+        doc = await self.store.load_one(game_id)
+        if doc is None or doc.get("archived_at") is None:
+            return None
+        return doc
+
+    async def purge_archived(self, before: float) -> int:
+        """
+        Drop the checkpoints of games archived before `before` (a time.time()).
+        """
+        if self.store is None:
+            return 0
+        return await self.store.purge(before)
+
+    def pending(self) -> int:
+        return len(self.dirty) + len(self.deleted)
+
+    def _wake(self):
+        self.idle.clear()
+        self.wakeup.set()
+        if self.task is None and not self.closed:
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        failures = 0
+        while True:
+            await self.wakeup.wait()
+            await asyncio.sleep(self.delay)
+            self.wakeup.clear()
+            try:
+                failed = await self._write_pending()
+            except Exception as e:
+                print(f"Checkpoint worker error: {e}")
+                traceback.print_exc()
+                failed = True
+            if failed:
+                # Failed games stay dirty and go out with the next batch
+                failures += 1
+                self.wakeup.set()
+                await asyncio.sleep(min(0.1 * 2 ** failures, 5))
+            else:
+                failures = 0
+            if not self.pending():
+                self.idle.set()
+
+    async def _write_pending(self) -> bool:
+        dirty, self.dirty = self.dirty, {}
+        deleted, self.deleted = self.deleted, set()
+        saves = []
+        for game_id, manager in dirty.items():
+            turns = self.turn_docs.setdefault(game_id, [])
+            turns.extend(turn if isinstance(turn, dict) else turn.dict() for turn in manager.game_log.turns[len(turns):])
+            doc = manager.checkpoint()
+            doc["archived_at"] = time.time() if game_id in self.archiving else None
+            saves.append((doc, turns, self.saved_turns.get(game_id, 0)))
+        self.writing = dirty
+        start = time.perf_counter()
+        try:
+            failed = await self.store.write(saves, list(deleted))
+        finally:
+            self.writing = {}
+        self.last_write_seconds = time.perf_counter() - start
+        self.batches += 1
+        for doc, turns, _ in saves:
+            game_id = doc["_id"]
+            if game_id in failed:
+                self.dirty.setdefault(game_id, dirty[game_id])
+            elif doc["archived_at"] is not None and game_id in self.archiving and game_id not in self.dirty:
+                # Archived and still out of memory
+                self.archiving.discard(game_id)
+                self.saved_turns.pop(game_id, None)
+                self.turn_docs.pop(game_id, None)
+            else:
+                self.saved_turns[game_id] = len(turns)
+        for game_id in deleted:
+            if game_id in failed:
+                if game_id not in self.dirty: # unless marked again meanwhile
+                    self.deleted.add(game_id)
+            else:
+                self.saved_turns.pop(game_id, None)
+                self.turn_docs.pop(game_id, None)
+        # A game that finished while its checkpoint was being written
+        for game_id in self.deleted:
+            self.dirty.pop(game_id, None)
+        self.writes += len(saves) + len(deleted) - len(failed)
+        self.failures += len(failed)
+        return bool(failed)
+
+    async def load(self) -> list[dict]:
+        if self.store is None:
+            return []
+        return await self.store.load()
+
+    async def flush(self):
+        """
+        Wait until every change marked so far has been written.
+        """
+        if self.pending():
+            self._wake()
+        await self.idle.wait()
+
+    async def close(self):
+        """
+        Flush and stop the worker; called on shutdown.
+        """
+        if self.task is not None:
+            try:
+                await asyncio.wait_for(self.flush(), 10)
+            except asyncio.TimeoutError:
+                print(f"Shutting down with {self.pending()} checkpoints unwritten")
+            self.task.cancel()
+            self.task = None
+        self.closed = True
+
+    def metrics(self) -> dict:
+        return {
+            "store": type(self.store).__name__ if self.store is not None else None,
+            "pending": self.pending(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "failures": self.failures,
+            "last_write_seconds": self.last_write_seconds,
+            "restored_games": self.restored,
+            "restore_seconds": self.restore_seconds,
+        }
+
+def checkpointer_from_env() -> Checkpointer:
+    store = os.environ.get("CHECKPOINT_STORE", "mongo")
+    if store == "off":
+        return Checkpointer(None)
+    if store == "file":
+        return Checkpointer(FileCheckpointStore(os.environ.get("CHECKPOINT_DIR", "game_checkpoints")))
+    return Checkpointer(MongoCheckpointStore())
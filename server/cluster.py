@@ -0,0 +1,304 @@
+"""
+Running the server as several worker processes.
+
+Every game id is owned by one worker, picked by a consistent-hash ring over
+the worker ids. Whatever changes a game (opening it, seating players,
+starting it, playing a turn) runs on its owner: `Cluster.call` runs the
+operation in place when this worker owns the game, and otherwise sends it
+over the bus to the owner and awaits the reply. Changes every worker needs
+to see are published to all of them as events. These include waiting room
+updates for the lobby, state frames for sockets connected to another
+worker, and stat increments for the leaderboards.
+
+The bus is pluggable: `UnixSocketBus` connects workers on one host, and
+`LocalBus` connects workers living in one process (tests, benchmarks). With
+a single worker (the default) everything is local and the bus carries
+nothing.
+
+    CLUSTER_WORKERS=4 python main.py
+"""
+import asyncio
+import fcntl
+import hashlib
+import itertools
+import os
+import traceback
+from bisect import bisect
+from bson import json_util
+
+def encode_message(message: dict) -> bytes:
+    # json_util keeps ObjectIds (game and registry documents) intact
+    return json_util.dumps(message).encode() + b"\n"
+
+def decode_message(line: bytes) -> dict:
+    return json_util.loads(line)
+
+class HashRing:
+    """
+    Consistent hashing of keys onto nodes; each node gets `replicas` points
+    on the ring so keys spread evenly and adding a node moves ~1/n of them.
+    """
+    def __init__(self, nodes: list[str], replicas: int = 100):
+        points = sorted((self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def owner(self, key: str) -> str:
+        return self.nodes[bisect(self.hashes, self._hash(key)) % len(self.nodes)]
+
+class LocalBus:
+    """
+    Bus between workers in one process. Messages still go through the wire
+    encoding, so anything that wouldn't survive a socket fails here too.
+    """
+    def __init__(self, network: dict = None):
+        self.network = network if network is not None else {} # worker id -> message handler
+
+    async def start(self, worker_id: str, on_message):
+        self.worker_id = worker_id
+        self.network[worker_id] = on_message
+
+    def send(self, worker_id: str, message: dict):
+        handler = self.network.get(worker_id)
+        if handler is not None:
+            asyncio.get_running_loop().call_soon(handler, decode_message(encode_message(message)))
+
+    async def close(self):
+        self.network.pop(self.worker_id, None)
+
+class UnixSocketBus:
+    """
+    Bus between workers on one host: each listens on `<directory>/<worker>.sock`
+    and messages are newline-delimited JSON. Each peer gets one outbound
+    connection fed by a queue, so messages to a worker arrive in order.
+    """
+    CONNECT_RETRIES = 50 # peers may still be starting up
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.server = None
+        self.peers: dict[str, tuple[asyncio.Queue, asyncio.Task]] = {}
+        self.inbound: set[asyncio.StreamWriter] = set()
+
+    def path(self, worker_id: str) -> str:
+        return os.path.join(self.directory, f"{worker_id}.sock")
+
+    async def start(self, worker_id: str, on_message):
+        self.worker_id = worker_id
+        self.on_message = on_message
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(worker_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = await asyncio.start_unix_server(self._serve, path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.inbound.add(writer)
+        try:
+            while line := await reader.readline():
+                self.on_message(decode_message(line))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.inbound.discard(writer)
+            writer.close()
+
+    def send(self, worker_id: str, message: dict):
+        if worker_id not in self.peers:
+            queue = asyncio.Queue()
+            self.peers[worker_id] = (queue, asyncio.create_task(self._write(worker_id, queue)))
+        self.peers[worker_id][0].put_nowait(encode_message(message))
+
+    async def _write(self, worker_id: str, queue: asyncio.Queue):
+        writer = None
+        try:
+            while True:
+                line = await queue.get()
+                for attempt in range(self.CONNECT_RETRIES):
+                    try:
+                        if writer is None:
+                            _, writer = await asyncio.open_unix_connection(self.path(worker_id))
+                        writer.write(line)
+                        await writer.drain()
+                        break
+                    except (ConnectionError, OSError):
+                        writer = None
+                        await asyncio.sleep(min(0.05 * 2 ** attempt, 1))
+                else:
+                    print(f"Dropping message to {worker_id}: unreachable")
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def close(self):
+        for _, task in self.peers.values():
+            task.cancel()
+        self.peers = {}
+        for writer in list(self.inbound):
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            os.unlink(self.path(self.worker_id))
+
+class RemoteError(RuntimeError):
+    """An operation failed on the worker that owns its game."""
+
+# Exceptions that keep their type when an operation fails on another worker
+FORWARDED_ERRORS = {"ValueError": ValueError, "KeyError": KeyError}
+
+class Cluster:
+    def __init__(self, workers: list[str], bus, worker_id: str = None, timeout: float = None):
+        self.workers = workers
+        self.bus = bus
+        self.worker_id = worker_id
+        self.timeout = timeout or float(os.environ.get("CLUSTER_CALL_TIMEOUT", 10))
+        self.ring = HashRing(workers)
+        self.operations = {} # name -> async function, run for calls this worker owns
+        self.listeners: dict[str, list] = {} # event type -> functions of the event
+        self.pending: dict[int, asyncio.Future] = {} # outstanding forwarded calls
+        self.call_ids = itertools.count()
+        self.lock_file = None
+        self.forwarded = 0
+        self.served = 0
+        self.events_sent = 0
+        self.events_received = 0
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.workers) > 1
+
+    async def start(self):
+        if self.worker_id is None:
+            self.worker_id = self._claim_worker_id()
+        await self.bus.start(self.worker_id, self._on_message)
+        if self.enabled:
+            print(f"Cluster worker {self.worker_id} of {len(self.workers)}")
+
+    def _claim_worker_id(self) -> str:
+        # Forked workers share an environment: each takes the first id whose lock is free
+        directory = getattr(self.bus, "directory", "/tmp")
+        os.makedirs(directory, exist_ok=True)
+        for worker_id in self.workers:
+            lock_file = open(os.path.join(directory, f"{worker_id}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            self.lock_file = lock_file
+            return worker_id
+        raise RuntimeError(f"More workers running than CLUSTER_WORKERS={len(self.workers)}")
+
+    async def close(self):
+        await self.bus.close()
+        for future in self.pending.values():
+            future.cancel()
+        if self.lock_file is not None:
+            self.lock_file.close()
+
+    def owner(self, game_id: str) -> str:
+        return self.ring.owner(game_id)
+
+    def is_local(self, game_id: str) -> bool:
+        return not self.enabled or self.owner(game_id) == self.worker_id
+
+    def register(self, name: str, operation):
+        self.operations[name] = operation
+
+    def subscribe(self, event: str, listener):
+        self.listeners.setdefault(event, []).append(listener)
+
+    async def call(self, operation: str, game_id: str, /, **kwargs):
+        """
+        Run `operation` with `game_id` and `kwargs` on the worker owning the
+        game; arguments and result must survive JSON (with ObjectIds).
+        """
+        kwargs["game_id"] = game_id
+        owner = self.owner(game_id) if self.enabled else self.worker_id
+        if owner == self.worker_id:
+            return await self.operations[operation](**kwargs)
+        call_id = next(self.call_ids)
+        future = self.pending[call_id] = asyncio.get_running_loop().create_future()
+        self.forwarded += 1
+        self.bus.send(owner, {"kind": "call", "id": call_id, "from": self.worker_id, "operation": operation, "kwargs": kwargs})
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.pending.pop(call_id, None)
+
+    def publish(self, event: str, /, **payload):
+        """
+        Hand an event to every other worker's listeners.
+        """
+        self.publish_to(self.workers, event, **payload)
+
+    def publish_to(self, worker_ids, event: str, /, **payload):
+        """
+        Hand an event to the listeners of the given workers (this one excepted).
+        """
+        if not self.enabled:
+            return
+        message = {"kind": "event", "type": event, "payload": payload}
+        for worker_id in worker_ids:
+            if worker_id != self.worker_id:
+                self.bus.send(worker_id, message)
+                self.events_sent += 1
+
+    def _on_message(self, message: dict):
+        kind = message["kind"]
+        if kind == "call":
+            asyncio.create_task(self._serve_call(message))
+        elif kind == "reply":
+            future = self.pending.get(message["id"])
+            if future is None or future.done():
+                return
+            if "error" in message:
+                error = FORWARDED_ERRORS.get(message["error"], RemoteError)
+                future.set_exception(error(message["detail"]))
+            else:
+                future.set_result(message["result"])
+        elif kind == "event":
+            self.events_received += 1
+            for listener in self.listeners.get(message["type"], ()):
+                try:
+                    listener(**message["payload"])
+                except Exception as e:
+                    print(f"Error handling cluster event {message['type']}: {e}")
+                    traceback.print_exc()
+
+    async def _serve_call(self, message: dict):
+        reply = {"kind": "reply", "id": message["id"]}
+        try:
+            reply["result"] = await self.operations[message["operation"]](**message["kwargs"])
+        except Exception as e:
+            reply["error"] = type(e).__name__
+            reply["detail"] = e.args[0] if len(e.args) == 1 else str(e)
+        self.served += 1
+        self.bus.send(message["from"], reply)
+
+    def metrics(self) -> dict:
+        return {
+            "worker": self.worker_id,
+            "workers": len(self.workers),
+            "forwarded_calls": self.forwarded,
+            "served_calls": self.served,
+            "pending_calls": len(self.pending),
+            "events_sent": self.events_sent,
+            "events_received": self.events_received,
+        }
+
+def cluster_from_env() -> Cluster:
+    """
+    CLUSTER_WORKERS worker processes (default 1), joined by a UnixSocketBus
+    with its sockets in CLUSTER_SOCKET_DIR.
+    """
+    count = int(os.environ.get("CLUSTER_WORKERS", 1))
+    workers = [f"worker-{i}" for i in range(count)]
+    if count == 1:
+        return Cluster(workers, LocalBus(), worker_id=workers[0])
+    return Cluster(workers, UnixSocketBus(os.environ.get("CLUSTER_SOCKET_DIR", "/tmp/cardgame-cluster")))
@@ -13,20 +13,40 @@ load_dotenv()
 
 PyObjectId = Annotated[str, BeforeValidator(str)]
 
-# Get MongoDB URL with error handling
-mongodb_url = os.environ.get("MONGODB_URL")
-if not mongodb_url:
-    raise ValueError("MONGODB_URL environment variable is not set")
-
-client = motor.motor_asyncio.AsyncIOMotorClient(
-    mongodb_url,
-    tls=True,
-    tlsCAFile=certifi.where()
-)
-db = client.game
-user_collection = db.get_collection("users")
-game_collection = db.get_collection("games")
-replay_collection = db.get_collection("replays")
+COLLECTIONS = {
+    "user_collection": "users",
+    "game_collection": "games",
+    "replay_collection": "replays",
+    "checkpoint_collection": "checkpoints",
+}
+
+def __getattr__(name: str):
+    """
+    Create the Mongo client and collections on first use, so modules that
+    only need the models (the rules engine, the simulator) import without
+    MONGODB_URL.
+    """
+    if name == "client":
+        # Get MongoDB URL with error handling
+        mongodb_url = os.environ.get("MONGODB_URL")
+        if not mongodb_url:
+            raise ValueError("MONGODB_URL environment variable is not set")
+        value = motor.motor_asyncio.AsyncIOMotorClient(
+            mongodb_url,
+            tls=True,
+            tlsCAFile=certifi.where()
+        )
+    elif name == "db":
+        value = _loaded("client").game
+    elif name in COLLECTIONS:
+        value = _loaded("db").get_collection(COLLECTIONS[name])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+def _loaded(name: str):
+    return globals()[name] if name in globals() else __getattr__(name)
 
 # Game Object Models
 
@@ -70,6 +90,7 @@ class VietCongStatsModel(BaseModel):
     """
     games: int = Field(default=0)
     place_finishes: Dict[str, int] = Field(default_factory=lambda: {"first": 0, "second": 0, "third": 0, "fourth": 0})
+    score_rate: float = Field(default=0.0) # derived, see user_stats.py
 
 class FishStatsModel(BaseModel):
     """
@@ -79,6 +100,8 @@ class FishStatsModel(BaseModel):
     wins: int = Field(default=0)
     claims: int = Field(default=0)
     successful_claims: int = Field(default=0)
+    win_rate: float = Field(default=0.0) # derived, see user_stats.py
+    claim_rate: float = Field(default=0.0)
 
 # Users
 
@@ -115,13 +138,16 @@ class UserSearchModel(BaseModel):
     """
     A container holding filters for user search in DB
     """
-    name: Optional[str] = Query(None, description="Filter by username (partial match)")
+    name: Optional[str] = Query(None, description="Filter by username (case-insensitive prefix)")
     min_fish_games: Optional[int] = Query(None)
     min_vietcong_games: Optional[int] = Query(None)
     min_fish_win_rate: Optional[float] = Query(None)
     min_vietcong_score_rate: Optional[float] = Query(None)
     min_claims: Optional[int] = Query(None)
     min_claim_rate: Optional[float] = Query(None)
+    sort: str = Query("name", description="One of user_stats.SEARCH_SORTS")
+    limit: int = Query(50, ge=1, le=200)
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
 
 class UserCollectionModel(BaseModel):
     """
@@ -131,6 +157,7 @@ class UserCollectionModel(BaseModel):
     """
 
     users: List[UserModel]
+    next_cursor: Optional[str] = None # set by paged searches when there are more results
 
 # Firebase Models
 
@@ -171,6 +198,7 @@ class GameCollection(BaseModel):
 class OwnerModel(BaseModel):
     cards: List[CardModel]
     is_player: bool
+    card_count: Optional[int] = None # set instead of cards when the hand is hidden from the viewer
 
 class GameStateModel(BaseModel):
     game_type: str
@@ -182,6 +210,13 @@ class GameStateModel(BaseModel):
 
 # Replays
 
+class ParticipantModel(BaseModel):
+    """
+    One player of a replay and their result, stored as an array so it can be indexed.
+    """
+    user: PyObjectId = Field(...)
+    result: int = Field(...)
+
 class ReplayModel(BaseModel):
     """
     Container for a single replay.
@@ -190,9 +225,17 @@ class ReplayModel(BaseModel):
     type: str = Field(...)
     name: str = Field(...)
     players: Dict[PyObjectId,int] = Field(default_factory=dict)
+    participants: List[ParticipantModel] = Field(default_factory=list) # players as [{user, result}]
     player_names: Dict[PyObjectId,str] = Field(default_factory=dict)
     game_states: List[GameStateModel] = Field(default_factory=list)
     timestamp: int = Field(...)
+    # "snapshots" replays store every state in game_states; "events" replays
+    # store the seed, seating and accepted turns and are re-simulated on read
+    format: str = Field(default="snapshots")
+    seed: Optional[int] = Field(default=None)
+    seats: List[PyObjectId] = Field(default_factory=list)
+    teams: Dict[PyObjectId,int] = Field(default_factory=dict)
+    turns: List[TurnModel] = Field(default_factory=list)
     model_config = ConfigDict(
         populate_by_name=True,
         arbitrary_types_allowed=True
@@ -225,3 +268,24 @@ class ReplayCollectionModel(BaseModel):
     A container holding a list of `ReplaySummaryModel` instances
     """
     replays: List[ReplaySummaryModel]
+
+# Leaderboards
+
+class LeaderboardEntryModel(BaseModel):
+    """
+    One player's place on a leaderboard.
+    """
+    rank: int
+    user_id: str
+    name: Optional[str] = None
+    score: float
+    volume: int # games (or claims) behind the score
+
+class LeaderboardModel(BaseModel):
+    """
+    A page of a leaderboard, best first.
+    """
+    board: str
+    title: str
+    total: int
+    entries: List[LeaderboardEntryModel]
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 from enum import Enum
 try:
-    from .core import CardModel, TurnModel, TransactionModel, OwnerModel, GameStateModel, user_collection
+    from .core import CardModel, TurnModel, TransactionModel, OwnerModel, GameStateModel
 except ImportError:  # Allows running directly from server/
-    from core import CardModel, TurnModel, TransactionModel, OwnerModel, GameStateModel, user_collection  # type: ignore
-from bson import ObjectId
+    from core import CardModel, TurnModel, TransactionModel, OwnerModel, GameStateModel  # type: ignore
+from itertools import combinations, product
 import random
 
 GAME_RULES = {
@@ -29,64 +29,177 @@ class Suit(Enum):
 
 # Base Card
 class Card():
-    def __init__(self, rank=0, suit=Suit.SPEC):
-        self.rank = rank
-        self.suit = suit
+    """
+    Cards are interned: `Card(rank, suit)` and `Card.from_model` return one of
+    the 54 shared, immutable deck instances, so equality is identity and the
+    per-game sort keys are computed once when the deck table is built.
+    """
+    __slots__ = ("rank", "suit", "index", "bit", "vc_value", "rank_unit", "half_suit", "fish_value", "code")
+    _by_value: dict[tuple[int, int], "Card"] = {}
+
+    def __new__(cls, rank=0, suit=Suit.SPEC):
+        try:
+            return cls._by_value[rank, suit.value]
+        except (KeyError, AttributeError):
+            raise ValueError(f"Not a card in the deck: rank={rank}, suit={suit}") from None
 
-    def __eq__(self, other):
-        return isinstance(other, Card) and self.rank == other.rank and self.suit == other.suit
-    
-    def __hash__(self):
-        return hash((self.rank, self.suit.value))
+    @classmethod
+    def _intern(cls, rank: int, suit: Suit, **keys):
+        card = object.__new__(cls)
+        for name, value in dict(rank=rank, suit=suit, **keys).items():
+            object.__setattr__(card, name, value)
+        cls._by_value[rank, suit.value] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card instances are immutable")
+
+    def __reduce__(self):
+        return (Card, (self.rank, self.suit))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
     
     def to_model(self) -> CardModel:
         return CardModel(suit=self.suit.value, rank=self.rank)
     
     def __str__(self):
-        if self.rank == 0:
-            if self.suit == Suit.CLUB:
-                return "JB"
-            elif self.suit == Suit.DIAMOND:
-                return "JR"
-        if self.rank == 0:
-            if self.suit == Suit.CLUB:
-                return "JB"
-            elif self.suit == Suit.DIAMOND:
-                return "JR"
-        if self.suit == Suit.SPEC:
-            return "JK"
-        rank_arr = ["", "A", "2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K"]
-        suit_arr = ["","C","D","H","S"]
-        return rank_arr[(self.rank)%14]+suit_arr[self.suit.value]
+        return self.code
+
+    def __repr__(self):
+        return self.code
     
     @classmethod
     def from_model(cls, model: CardModel):
-        return cls(suit=Suit(model.suit), rank=model.rank)
+        try:
+            return cls._by_value[model.rank, model.suit]
+        except KeyError:
+            raise ValueError(f"Not a card in the deck: rank={model.rank}, suit={model.suit}") from None
+
+# Cards are packed into a 54-bit mask. Regular cards are laid out in VietCong
+# order (3S 3C 3D 3H 4S ... 2H) so a mask's bit order is also its play order;
+# the two jokers take the last two bits.
+CARD_COUNT = 54
+_SUIT_ORDER = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.DIAMOND: 2, Suit.HEART: 3}
+
+def card_index(rank: int, suit: Suit) -> int:
+    if rank == 0 and suit in (Suit.CLUB, Suit.DIAMOND):
+        return 52 + suit.value - 1
+    if not 1 <= rank <= 13 or suit not in _SUIT_ORDER:
+        raise ValueError(f"Not a card in the deck: rank={rank}, suit={suit}")
+    return (rank - 3) % 13 * 4 + _SUIT_ORDER[suit]
+
+_DECK: list[Card] = [None] * CARD_COUNT # filled by _build_deck() once the game classes exist
+
+def cards_to_mask(cards) -> int:
+    mask = 0
+    for card in cards:
+        mask |= card.bit
+    return mask
+
+def cards_from_mask(mask: int) -> list[Card]:
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(_DECK[low.bit_length() - 1])
+        mask ^= low
+    return cards
 
 # Base Owner
 class Owner():
-    def __init__(self, cards: list[Card] = None, is_player: bool = True):
-        self.cards: list[Card] = cards
+    """
+    A hand (or pile) of cards stored as a card mask. `cards` is materialized
+    from the mask on demand, in deck order or by `sort_key` when given.
+    """
+    def __init__(self, cards: list[Card] = None, is_player: bool = True, sort_key=None):
+        self.mask: int = cards_to_mask(cards or [])
         self.is_player: bool = is_player
+        self.sort_key = sort_key
+        self._cards: list[Card] = None
+
+    @property
+    def cards(self) -> list[Card]:
+        if self._cards is None:
+            self._cards = cards_from_mask(self.mask)
+            if self.sort_key is not None:
+                self._cards.sort(key=self.sort_key)
+        return self._cards
 
     def is_empty(self) -> bool:
-        return len(self.cards) == 0
+        return self.mask == 0
+
+    def count(self) -> int:
+        return self.mask.bit_count()
     
     def get_cards(self) -> list[Card]:
         return self.cards
 
     def contains_card(self,card: Card):
-        return card in self.cards
+        return self.mask >> card.index & 1 == 1
+
+    def contains_mask(self, mask: int) -> bool:
+        return self.mask & mask == mask
+
+    def contains_cards(self, cards: list[Card]) -> bool:
+        return self.contains_mask(cards_to_mask(cards))
     
+    def set_mask(self, mask: int):
+        self.mask = mask
+        self._cards = None
+
     def add_card(self,card: Card):
-        self.cards.append(card)
+        self.mask |= card.bit
+        self._cards = None
     
     def remove_card(self,card: Card):
-        self.cards.remove(card)
+        if not self.contains_card(card):
+            raise ValueError(f"{card} is not held by this owner")
+        self.mask ^= card.bit
+        self._cards = None
 
     def to_model(self) -> OwnerModel:
         return OwnerModel(cards=[card.to_model() for card in self.cards], is_player=self.is_player)
 
+class OwnerTable:
+    """
+    Compact card -> owner id map, indexed by card position in the deck.
+    Supports the dict-style `table[card]` lookups `Game.belongs_to` used to.
+    """
+    _UNOWNED = 255
+
+    def __init__(self, owner_ids=()):
+        self.owner_ids: list[str] = []
+        self._slots: dict[str, int] = {}
+        self._owner_of = bytearray([self._UNOWNED]) * CARD_COUNT
+        for owner_id in owner_ids:
+            self._slot(owner_id)
+
+    def _slot(self, owner_id: str) -> int:
+        slot = self._slots.get(owner_id)
+        if slot is None:
+            slot = self._slots[owner_id] = len(self.owner_ids)
+            self.owner_ids.append(owner_id)
+        return slot
+
+    def __getitem__(self, card: Card) -> str:
+        slot = self._owner_of[card.index]
+        if slot == self._UNOWNED:
+            raise KeyError(card)
+        return self.owner_ids[slot]
+
+    def __setitem__(self, card: Card, owner_id: str):
+        self._owner_of[card.index] = self._slot(owner_id)
+
+    def __contains__(self, card: Card) -> bool:
+        return self._owner_of[card.index] != self._UNOWNED
+
+    def get(self, card: Card, default=None):
+        slot = self._owner_of[card.index]
+        return default if slot == self._UNOWNED else self.owner_ids[slot]
+
 class Transaction:
     def __init__(self, card: Card = None, from_: str = None, to_: str = None, success: bool = True):
         self.card = card
@@ -104,6 +217,15 @@ class Transaction:
     def from_model(cls, model: TransactionModel):
         return cls(Card.from_model(model.card),model.sender, model.receiver, model.success)
 
+def turn_from_dict(data: dict) -> "Turn":
+    """
+    Turn.from_model for a serialized TurnModel, skipping validation.
+    """
+    return Turn(data["player"], data["type"], [
+        Transaction(Card(trans["card"]["rank"], Suit(trans["card"]["suit"])), trans["sender"], trans["receiver"], trans["success"])
+        for trans in data["transactions"]
+    ])
+
 class Turn:
     def __init__(self, player_id: str, turn_type: int, transactions: list[Transaction]):
         self.player = player_id
@@ -121,6 +243,7 @@ class Turn:
         return cls(model.player, model.type, [Transaction.from_model(transact) for transact in model.transactions])
 
 class Game():
+    card_sort_key = None # how owners order their cards; None is deck order
 
     def __init__(self, manager, owners: dict[str, Owner], cards: list[Card], player_ids: list[str]):
         self.manager = manager
@@ -130,11 +253,13 @@ class Game():
         self.current_player: int = 0
         self.last_turn: Turn = Turn("", 0, [])
         self.player_status = {player_id:0 for player_id in player_ids}
-        self.belongs_to: dict[Card, str] = {}
+        self.belongs_to = OwnerTable(self.owners)
         self.status = 0
+        self.state_version = 0 # bumped whenever a turn changes the state
+        self._state_cache = None # (version, GameStateModel, serialized dict)
 
         for owner_id, owner in self.owners.items():
-            for c in owner.get_cards():
+            for c in cards_from_mask(owner.mask):
                 self.belongs_to[c] = owner_id
 
     # Perform transaction of card between two owners
@@ -154,21 +279,105 @@ class Game():
         return GameStateModel(game_type="", owners={owner_id: owner.to_model() for owner_id, owner in self.owners.items()}, current_player=self.players[self.current_player], last_turn=self.last_turn.to_model(), player_status=self.player_status, status=self.status)
     
     def has_cards(self, turn:Turn): # checks if the player has the cards in the transaction requested
+        required: dict[str, int] = {}
         for trans in turn.transactions:
-            if (self.belongs_to[trans.card] != trans.from_):
-                return False
-        return True
+            required[trans.from_] = required.get(trans.from_, 0) | trans.card.bit
+        return all(owner_id in self.owners and self.owners[owner_id].contains_mask(mask) for owner_id, mask in required.items())
     
+    def owner_masks(self) -> dict[str, tuple[int, bool]]:
+        """
+        (card mask, is_player) of every owner in the state, read straight off the hands.
+        """
+        return {owner_id: (owner.mask, owner.is_player) for owner_id, owner in self.owners.items()}
+
     def log_state(self):
-        self.manager.game_log.log_state(self.to_game_state())
+        if self.manager.keeps_states:
+            self.manager.game_log.log_state(self.current_state_model(), self.owner_masks())
+        else:
+            self.manager.game_log.log_state(None)
+
+    def state_changed(self):
+        self.state_version += 1
+
+    def _cached_state(self):
+        if self._state_cache is None or self._state_cache[0] != self.state_version:
+            model = self.to_game_state()
+            self._state_cache = (self.state_version, model, model.dict())
+        return self._state_cache
+
+    def current_state_model(self) -> GameStateModel:
+        """
+        The state model for the current version, built once per version.
+        """
+        return self._cached_state()[1]
+
+    def current_state(self) -> dict:
+        """
+        The serialized state for the current version. Shared, so treat it as
+        read-only.
+        """
+        return self._cached_state()[2]
+
+    def seed_rng(self, seed: int = None):
+        """
+        Give the game its own RNG so the deal, seating and teams can be
+        regenerated from the seed alone.
+        """
+        self.seed = random.randrange(2**63) if seed is None else seed
+        self.rng = random.Random(self.seed)
 
     async def broadcast_state(self):
-        await self.manager.broadcast(self.to_game_state().dict())
+        self.state_changed()
+        # A manager that keeps no states (headless simulation) isn't handed one to drop
+        await self.manager.broadcast(self.current_state() if self.manager.keeps_states else None)
+
+    # Checkpoints
+
+    def checkpoint(self) -> dict:
+        """
+        What it takes to rebuild the game mid-play, as plain JSON/BSON
+        values: the owner masks, turn pointer and status, plus whatever
+        each game type adds.
+        """
+        return {
+            "players": self.players,
+            "seed": self.seed,
+            "owners": {owner_id: [owner.mask, owner.is_player] for owner_id, owner in self.owners.items()},
+            "current_player": self.current_player,
+            "last_turn": self.last_turn.to_model().dict(),
+            "player_status": self.player_status,
+            "status": self.status,
+            "state_version": self.state_version,
+        }
+
+    @classmethod
+    def restore(cls, manager, data: dict) -> "Game":
+        """
+        Rebuild a game from its `checkpoint()`, without dealing or
+        re-validating anything.
+        """
+        game = cls.__new__(cls)
+        game.seed_rng(data["seed"])
+        game._restore(manager, data)
+        return game
+
+    def _restore(self, manager, data: dict):
+        owners = {}
+        for owner_id, (mask, is_player) in data["owners"].items():
+            owners[owner_id] = Owner(is_player=is_player, sort_key=self.card_sort_key)
+            owners[owner_id].set_mask(mask)
+        Game.__init__(self, manager, owners, cards_from_mask(sum(mask for mask, _ in data["owners"].values())), data["players"])
+        self.current_player = data["current_player"]
+        self.last_turn = turn_from_dict(data["last_turn"])
+        self.player_status = dict(data["player_status"])
+        self.status = data["status"]
+        self.state_version = data["state_version"]
 
 class SimpleGame(Game):
-    def __init__(self, manager, players):
+    def __init__(self, manager, players, seed: int = None):
         if len(players)!=2:
             raise ValueError("Too many players")
+        self.seed_rng(seed)
         
         cardsA = [Card(i + 1, Suit.CLUB) for i in range(10)]
         cardsB = [Card(i + 1, Suit.DIAMOND) for i in range(10)]
@@ -208,22 +417,29 @@ class VietCongGame(Game):
         DB_SEQ_3 = 33
         DB_SEQ_4 = 34
         DB_SEQ_5 = 35
+        DB_SEQ_6 = 36
+
+    # Rank-count vector (3 bits per VietCong rank) -> combo, filled by _build_combo_table()
+    _combo_table: dict[int, "VietCongGame.Combo"] = {}
+    TWO_INDEX = 48 # deck index of the lowest 2
+    _multiple_combos = frozenset((Combo.SINGLE, Combo.DOUBLE, Combo.TRIPLE, Combo.QUAD))
+    _opening_combos = frozenset((Combo.SINGLE, Combo.DOUBLE, Combo.TRIPLE)) | frozenset(map(Combo, range(Combo.SEQ_3.value, Combo.SEQ_12.value+1)))
 
     suit_to_value = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.DIAMOND: 2, Suit.HEART: 3}
 
     @staticmethod
     def get_card_value(card:Card)->int:
-        rank = (card.rank-3)%13
-        suit = VietCongGame.suit_to_value[card.suit]
-        return rank*10+suit
+        return card.vc_value
     
-    def __init__(self, manager, players):
+    def __init__(self, manager, players, seed: int = None):
         if len(players)!=4:
             raise ValueError("Not the right number of players (4 needed)")
+        self.seed_rng(seed)
         
         # Member Variables
         self.current_combo = [] #combo on top of deck
         self.current_combo_type = self.Combo.NONE #ID of combo
+        self.current_top = -1 # deck index of the highest card in current_combo
         self.places = [4]*4 # finishing places
         self.finished_players = 0 # number of players who finished
 
@@ -233,10 +449,10 @@ class VietCongGame(Game):
         cards.extend([Card(i + 1, Suit.DIAMOND) for i in range(13)])
         cards.extend([Card(i + 1, Suit.CLUB) for i in range(13)])
         cards.extend([Card(i + 1, Suit.SPADE) for i in range(13)])
-        random.shuffle(cards)
+        self.rng.shuffle(cards)
 
         # Initializing Owners
-        owners: dict[str, Owner] = {players[i]:Owner(sorted(cards[i*13:(i+1)*13], key=VietCongGame.get_card_value)) for i in range(4)}
+        owners: dict[str, Owner] = {players[i]:Owner(cards[i*13:(i+1)*13]) for i in range(4)} # mask order is VietCong order
         owners["pile"] = Owner([], False)
 
         super().__init__(manager, owners, cards, players)
@@ -267,25 +483,23 @@ class VietCongGame(Game):
         return len(cards)//multiple
 
     @staticmethod
-    def get_combo(cards: list[Card]):
-        # single/pair/trip/quad
-        multiple_len = VietCongGame.is_multiple(cards)
-        if multiple_len != 0:
-            return VietCongGame.Combo(multiple_len)
-        
-        # sequence by length
-        sequence_len = VietCongGame.is_multiple_sequence(cards,1)
-        if sequence_len != 0:
-            return VietCongGame.Combo(VietCongGame.Combo.SEQUENCE.value + sequence_len)
+    def classify(cards: list[Card]) -> tuple["VietCongGame.Combo", int]:
+        """
+        Resolve a play to (combo, deck index of its top card) with one table
+        lookup on its rank-count vector. Plays repeating a card are NONE.
+        """
+        key = 0
+        mask = 0
+        for card in cards:
+            key += card.rank_unit
+            mask |= card.bit
+        if mask.bit_count() != len(cards):
+            return VietCongGame.Combo.NONE, -1
+        return VietCongGame._combo_table.get(key, VietCongGame.Combo.NONE), mask.bit_length()-1
 
-        
-        # double sequence by length
-        double_sequence_len = VietCongGame.is_multiple_sequence(cards,2)
-        if double_sequence_len != 0:
-            return VietCongGame.Combo(VietCongGame.Combo.DB_SEQUENCE.value + double_sequence_len)
-        
-        # no matches
-        return VietCongGame.Combo.NONE
+    @staticmethod
+    def get_combo(cards: list[Card]):
+        return VietCongGame.classify(cards)[0]
 
     @staticmethod
     def is_greater_combo(cards: list[Card], current_combo: list[Card]) -> bool:
@@ -296,46 +510,83 @@ class VietCongGame(Game):
         return VietCongGame.get_card_value(cards[-1]) > VietCongGame.get_card_value(current_combo[-1])
 
     def valid_combo(self, cards: list[Card]):
+        combo, top = self.classify(cards)
+        if combo is self.Combo.NONE:
+            return combo
+        current = self.current_combo_type
+
         # Start of Round
-        if self.current_combo_type == self.Combo.NONE:
-            combo = self.get_combo(cards)
-            if combo != self.Combo.QUAD and combo.value < self.Combo.DB_SEQUENCE.value:
+        if current is self.Combo.NONE:
+            if combo in self._opening_combos:
                 return combo
-        
-        # Single/pair/trips/quads
-        elif self.current_combo_type.value < self.Combo.SEQUENCE.value:
-            # Matching Combo
-            multiple_len = self.is_multiple(cards)
-            if multiple_len == self.current_combo_type.value:
-                if self.is_greater_combo(cards, self.current_combo):
-                    return self.Combo(multiple_len)
-        
-            # Bomb is playable
-            elif self.current_combo[0].rank == 2:
-                # Quad is playable
-                if len(self.current_combo) < 3:
-                    if multiple_len == 4:
-                        return self.Combo.QUAD
-                    
-                # Check if double sequence playable
-                double_sequence_len = VietCongGame.is_multiple_sequence(cards,2)
-                if double_sequence_len > self.current_combo_type.value + 1:
-                    return self.Combo(self.Combo.DB_SEQUENCE.value + double_sequence_len)
-            
-        # Sequences
-        elif self.current_combo_type.value < self.Combo.DB_SEQUENCE.value:
-            sequence_len = self.is_multiple_sequence(cards, 1)
-            if sequence_len == len(self.current_combo) and self.is_greater_combo(cards, self.current_combo):
-                return self.Combo(self.Combo.SEQUENCE.value + sequence_len)
-        
-        # Double Sequences
-        else:
-            double_sequence_len = self.is_multiple_sequence(cards, 2)
-            if double_sequence_len == len(self.current_combo)//2 and self.is_greater_combo(cards, self.current_combo):
-                return self.Combo(self.Combo.DB_SEQUENCE.value + double_sequence_len)
-            
+
+        # Matching combo (singles through double sequences): higher top card wins
+        elif combo is current:
+            if top > self.current_top:
+                return combo
+
+        # Bomb against 2s
+        elif self.current_top >= self.TWO_INDEX and current in self._multiple_combos:
+            # Quad is playable on a single or pair
+            if combo is self.Combo.QUAD and (current is self.Combo.SINGLE or current is self.Combo.DOUBLE):
+                return combo
+            # Double sequence must be longer than the 2s played plus one
+            if combo.value > self.Combo.DB_SEQUENCE.value + current.value + 1:
+                return combo
+
         return self.Combo.NONE
 
+    def legal_plays(self, cards: list[Card] = None):
+        """
+        Yield every play from `cards` (default: the current player's hand)
+        that valid_combo accepts against the current table, each sorted low
+        to high. Plays are built from per-rank buckets, not hand subsets.
+        The 3 of Spades opening rule is checked separately in play_turn.
+        """
+        if cards is None:
+            cards = self.owners[self.players[self.current_player]].get_cards()
+        buckets = [[] for _ in range(13)]
+        for card in sorted(cards, key=self.get_card_value):
+            if card.index < 52:
+                buckets[card.index >> 2].append(card)
+
+        current = self.current_combo_type
+        if current is self.Combo.NONE:
+            for size in range(1, 4):
+                yield from self._multiple_plays(buckets, size, -1)
+            for length in range(3, 13):
+                yield from self._run_plays(buckets, 1, length, -1)
+        elif current in self._multiple_combos:
+            yield from self._multiple_plays(buckets, current.value, self.current_top)
+            # Bombs against 2s
+            if self.current_top >= self.TWO_INDEX:
+                if current is self.Combo.SINGLE or current is self.Combo.DOUBLE:
+                    yield from self._multiple_plays(buckets, 4, -1)
+                for length in range(current.value+2, self.Combo.DB_SEQ_6.value-self.Combo.DB_SEQUENCE.value+1):
+                    yield from self._run_plays(buckets, 2, length, -1)
+        elif current.value < self.Combo.DB_SEQUENCE.value:
+            yield from self._run_plays(buckets, 1, current.value-self.Combo.SEQUENCE.value, self.current_top)
+        else:
+            yield from self._run_plays(buckets, 2, current.value-self.Combo.DB_SEQUENCE.value, self.current_top)
+
+    @staticmethod
+    def _multiple_plays(buckets: list[list[Card]], size: int, above: int):
+        for bucket in buckets:
+            if len(bucket) >= size and bucket[-1].index > above:
+                for cards in combinations(bucket, size):
+                    if cards[-1].index > above:
+                        yield list(cards)
+
+    @staticmethod
+    def _run_plays(buckets: list[list[Card]], multiple: int, length: int, above: int):
+        # Runs stop before the 2s (rank bucket 12)
+        for start in range(12-length+1):
+            choices = [list(combinations(buckets[rank], multiple)) for rank in range(start, start+length)]
+            choices[-1] = [group for group in choices[-1] if group[-1].index > above]
+            if all(choices):
+                for groups in product(*choices):
+                    yield [card for group in groups for card in group]
+
     def get_next_player(self) -> bool:
         for i in range(1,4):
             next_player = (self.current_player+i)%4
@@ -365,6 +616,24 @@ class VietCongGame(Game):
         
         return True
 
+    def checkpoint(self) -> dict:
+        return {
+            **super().checkpoint(),
+            "current_combo": [card.index for card in self.current_combo],
+            "current_combo_type": self.current_combo_type.value,
+            "current_top": self.current_top,
+            "places": self.places,
+            "finished_players": self.finished_players,
+        }
+
+    def _restore(self, manager, data: dict):
+        super()._restore(manager, data)
+        self.current_combo = [_DECK[index] for index in data["current_combo"]]
+        self.current_combo_type = self.Combo(data["current_combo_type"])
+        self.current_top = data["current_top"]
+        self.places = list(data["places"])
+        self.finished_players = data["finished_players"]
+
     def to_game_state(self):
         game_state = super().to_game_state()
         game_state.game_type = "vietcong"
@@ -376,14 +645,11 @@ class VietCongGame(Game):
             place_mapper = ["first", "second", "third", "fourth"]
             place_str = place_mapper[place-1]
             print(f"Updating stats for {user_id}: place = {place}")
-            await user_collection.update_one(
-                {"_id": ObjectId(user_id)},
+            await self.manager.update_user_stats(
+                user_id,
                 {
-                    "$inc": 
-                    {
-                        "stats.vietcong.games": 1,
-                        f"stats.vietcong.place_finishes.{place_str}": 1
-                    }
+                    "stats.vietcong.games": 1,
+                    f"stats.vietcong.place_finishes.{place_str}": 1
                 }
             )
 
@@ -419,6 +685,7 @@ class VietCongGame(Game):
             self.last_turn = Turn(turn.player, 0, [Transaction(card, turn.player, "pile") for card in cards])
             self.current_combo = cards
             self.current_combo_type = combo
+            self.current_top = cards[-1].index
             if self.owners[turn.player].is_empty():
                 self.finished_players += 1
                 self.places[self.current_player] = self.finished_players
@@ -442,6 +709,7 @@ class VietCongGame(Game):
                 self.player_status[player] = 0
             self.current_combo = []
             self.current_combo_type = self.Combo.NONE
+            self.current_top = -1
 
             self.last_turn.transactions = []
 
@@ -471,9 +739,13 @@ class FishGame(Game):
         HIGH_SPADE = 7
         MIDDLE = 8
 
-    def __init__(self, manager, players):
+    _half_suit_cards: dict = {} # HalfSuit -> its six cards, filled by _build_deck()
+    _half_suit_mask: dict = {} # HalfSuit -> card mask of those six cards
+
+    def __init__(self, manager, players, seed: int = None):
         if len(players)!=6:
             raise ValueError("Not the right number of players (6 needed)")
+        self.seed_rng(seed)
         
         # Initializing Deck
         cards = []
@@ -485,37 +757,68 @@ class FishGame(Game):
         cards.append(Card(0,Suit.DIAMOND))
 
         # Dealing Cards
-        random.shuffle(cards)
-        owners: dict[str, Owner] = {players[i]: Owner(sorted(cards[i*9:(i+1)*9], key=self.get_card_value)) for i in range(6)}
-        owners["suits_1"] = Owner([], False)
-        owners["suits_2"] = Owner([], False)
+        self.rng.shuffle(cards)
+        owners: dict[str, Owner] = {players[i]: Owner(cards[i*9:(i+1)*9], sort_key=self.get_card_value) for i in range(6)}
+        owners["suits_1"] = Owner([], False, self.get_card_value)
+        owners["suits_2"] = Owner([], False, self.get_card_value)
 
         self.unclaimed = {self.HalfSuit(i) for i in range(9)}
         self.temp_current_player = 0
         
         super().__init__(manager, owners, cards, players)
-        self.current_player = random.randint(0,5)
-        self.owner_half_suits = {owner_id: self.cards_to_half_suit(owner.get_cards()) for owner_id, owner in self.owners.items()} # Half suits each owner has
+        self.current_player = self.rng.randint(0,5)
+
+        self._index_half_suits()
 
         # Forming Teams
         team_list = list(range(6))
-        random.shuffle(team_list)
+        self.rng.shuffle(team_list)
         for i in range(6):
             self.player_status[players[team_list[i]]] = i//3+1 
 
-        self.options_owner = Owner(self.get_question_options(),False)
+        self.options_owner = Owner([], False, self.get_card_value)
+        self.update_question_options()
 
         # self.manager.game_log.log_state(self.to_game_state())
 
+    def _index_half_suits(self):
+        # Per-owner half suit index, kept up to date by transact()
+        self.half_suit_counts = {owner_id: dict.fromkeys(self.HalfSuit, 0) for owner_id in self.owners} # cards held per half suit
+        self.owner_half_suits = {owner_id: set() for owner_id in self.owners} # Half suits each owner has
+        self.half_suit_masks = dict.fromkeys(self.owners, 0) # union of the cards in those half suits
+        for owner_id, owner in self.owners.items():
+            for half_suit, mask in self._half_suit_mask.items():
+                count = (owner.mask & mask).bit_count()
+                if count:
+                    self.half_suit_counts[owner_id][half_suit] = count
+                    self.owner_half_suits[owner_id].add(half_suit)
+                    self.half_suit_masks[owner_id] |= mask
+
+    def checkpoint(self) -> dict:
+        # Teams are the player statuses; claims are the suits_1/suits_2 owners
+        return {
+            **super().checkpoint(),
+            "temp_current_player": self.temp_current_player,
+            "options": self.options_owner.mask,
+        }
+
+    def _restore(self, manager, data: dict):
+        super()._restore(manager, data)
+        self.unclaimed = {self.HalfSuit(i) for i in range(9)}
+        self.temp_current_player = data["temp_current_player"]
+        self._index_half_suits()
+        self.options_owner = Owner([], False, self.get_card_value)
+        self.options_owner.set_mask(data["options"])
+
     @staticmethod
     def get_card_value(card: Card):
-        return card.rank + FishGame.card_to_half_suit(card).value*20
+        return card.fish_value
+
+    card_sort_key = get_card_value
 
     @staticmethod
     def card_to_half_suit(card: Card):
-        if card.rank == 0 or card.rank == 8:
-            return FishGame.HalfSuit.MIDDLE
-        return FishGame.HalfSuit((card.rank > 8 or card.rank == 1)*4+card.suit.value-1)
+        return card.half_suit
     
     @staticmethod
     def cards_to_half_suit(cards: list[Card]):
@@ -523,15 +826,22 @@ class FishGame(Game):
     
     @staticmethod
     def half_suit_cards(half_suit):
-        if half_suit == FishGame.HalfSuit.MIDDLE:
-            return [Card(8, Suit(i+1)) for i in range(4)] + [Card(0, Suit(i+1)) for i in range(2)]
-        return [Card((half_suit.value//4*7+i+1)%13+1, Suit(half_suit.value%4+1)) for i in range(6)]
+        return list(FishGame._half_suit_cards[half_suit])
     
+    def _count_card(self, owner_id: str, half_suit, delta: int):
+        counts = self.half_suit_counts[owner_id]
+        counts[half_suit] += delta
+        if delta > 0 and counts[half_suit] == 1:
+            self.owner_half_suits[owner_id].add(half_suit)
+            self.half_suit_masks[owner_id] |= self._half_suit_mask[half_suit]
+        elif delta < 0 and counts[half_suit] == 0:
+            self.owner_half_suits[owner_id].discard(half_suit)
+            self.half_suit_masks[owner_id] &= ~self._half_suit_mask[half_suit]
+
     def transact(self, trans):
         super().transact(trans)
-        self.owners[trans.to_].cards.sort(key=FishGame.get_card_value)
-        self.owner_half_suits[trans.to_].add(self.card_to_half_suit(trans.card))
-        self.owner_half_suits[trans.from_] = self.cards_to_half_suit(self.owners[trans.from_].get_cards())
+        self._count_card(trans.from_, trans.card.half_suit, -1)
+        self._count_card(trans.to_, trans.card.half_suit, 1)
     
     def is_valid_claim(self, turn: Turn):
         cards = turn.get_cards()
@@ -544,12 +854,6 @@ class FishGame(Game):
             all(trans.to_ == f"suits_{self.player_status[turn.player]}" for trans in turn.transactions)
     
     def is_valid_question(self, turn: Turn):
-        print(f"[TURN DEBUG] Type: {turn.turn_type}, Player: {turn.player}, Status: {self.status}")
-        print(f"[VALID_QUESTION] Asking: {turn.transactions[0].card} from {turn.transactions[0].from_} → {turn.transactions[0].to_}")
-        print(f"[OWNER_CARDS] {turn.transactions[0].from_}: {[str(c) for c in self.owners[turn.transactions[0].from_].get_cards()]}")
-        print(f"[OWNER_HALF_SUITS] {turn.player}: {self.owner_half_suits[turn.player]}")
-        print(f"[OPTIONS_OWNER] Cards: {[str(c) for c in self.options_owner.get_cards()]}")
-
         if len(turn.transactions) != 1:
             return False
         
@@ -560,13 +864,13 @@ class FishGame(Game):
         if half_suit not in self.owner_half_suits[player]:
             return False
         
-        if card in self.owners[player].get_cards():
+        if self.owners[player].contains_card(card):
             return False
         
         if turn.transactions[0].to_ != player:
             return False
         
-        if card not in self.options_owner.get_cards():
+        if not self.options_owner.contains_card(card):
             return False
         
         if self.player_status[turn.transactions[0].from_] == self.player_status[player]:
@@ -574,6 +878,11 @@ class FishGame(Game):
         
         return True
     
+    def owner_masks(self) -> dict[str, tuple[int, bool]]:
+        masks = super().owner_masks()
+        masks["options"] = (self.options_owner.mask, self.options_owner.is_player)
+        return masks
+
     def to_game_state(self):
         game_state = super().to_game_state()
         game_state.owners["options"] = self.options_owner.to_model()
@@ -584,11 +893,20 @@ class FishGame(Game):
     def half_suits_cards(half_suits):
         return [card for half_suit in half_suits for card in FishGame.half_suit_cards(half_suit)]
     
-    def get_question_options(self):
+    def question_options_mask(self) -> int:
         player = self.players[self.current_player]
-        cards = set(self.half_suits_cards(self.owner_half_suits[player]))
-        return list(cards.difference(set(self.owners[player].get_cards())))
+        return self.half_suit_masks[player] & ~self.owners[player].mask
+
+    def get_question_options(self):
+        return cards_from_mask(self.question_options_mask())
+
+    def update_question_options(self):
+        self.options_owner.set_mask(self.question_options_mask())
     
+    def unclaimed_half_suits(self):
+        claimed = self.owner_half_suits["suits_1"] | self.owner_half_suits["suits_2"]
+        return [half_suit for half_suit in self.HalfSuit if half_suit not in claimed]
+
     def is_unclaimed(self,card: Card):
         return self.belongs_to[card] not in ["suits_1","suits_2"]
     
@@ -604,10 +922,7 @@ class FishGame(Game):
                 inc_fields["stats.fish.wins"] = 1
 
             print(f"[GAME] Updating game stats for: {user_id}")
-            await user_collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$inc": inc_fields}
-            )
+            await self.manager.update_user_stats(user_id, inc_fields)
 
     async def update_fish_claims(self, claimer_id: str, success: bool):
         inc_fields = {
@@ -619,18 +934,10 @@ class FishGame(Game):
         print(f"[CLAIM] {claimer_id} made a claim. Success: {success}")
         print(f"Updating claim stats for {claimer_id}")
 
-        await user_collection.update_one(
-            {"_id": ObjectId(claimer_id)},
-            {"$inc": inc_fields}
-        )
+        await self.manager.update_user_stats(claimer_id, inc_fields)
     
     async def play_turn(self, turn: Turn) -> bool:
 
-        print(f"[DEBUG] play_turn: status={self.status}, turn_type={turn.turn_type}")
-        print(f"[DEBUG] turn.player={turn.player}, from_={turn.transactions[0].from_}, to_={turn.transactions[0].to_}")
-        print(f"[DEBUG] card={turn.transactions[0].card}")
-        print(f"[DEBUG] valid_question={self.is_valid_question(turn)}")
-
         # Delegation (turn_type == 2)
         if turn.turn_type == 2 and self.status == 0:
             player = self.players[self.current_player]
@@ -647,7 +954,7 @@ class FishGame(Game):
                 return False
 
             self.current_player = self.players.index(teammate)
-            self.options_owner = Owner(self.get_question_options(), False)  # ✅ add this line
+            self.update_question_options()
             await super().broadcast_state()
             print(f"[DELEGATE] {player} delegated to {teammate}")
             return True
@@ -659,7 +966,7 @@ class FishGame(Game):
                 self.current_player = self.players.index(turn.transactions[0].from_)
                 turn.transactions[0].success = False
             await super().play_turn(turn)
-            self.options_owner = Owner(self.get_question_options(),False)
+            self.update_question_options()
             self.last_turn = turn
             await super().broadcast_state()
             return True
@@ -671,7 +978,7 @@ class FishGame(Game):
                 self.status = 2
                 self.temp_current_player = self.current_player
                 self.current_player = self.players.index(turn.player)
-                self.options_owner = Owner(self.half_suits_cards([self.card_to_half_suit(turn.transactions[0].card)]), False)
+                self.options_owner.set_mask(self._half_suit_mask[turn.transactions[0].card.half_suit])
                 await super().broadcast_state()
                 return True
             
@@ -707,9 +1014,149 @@ class FishGame(Game):
                     await self.manager.end_game(results)
                 else:
                     self.current_player = self.temp_current_player
-                    self.options_owner = Owner(self.get_question_options(), False)
+                    self.update_question_options()
                     self.status = 0
                     await super().broadcast_state()
                 return True
 
         return False
+
+# Views
+
+def project_state(state: dict, viewer: str = None) -> dict:
+    """
+    The part of a serialized game state that `viewer` may see: every player
+    hand other than the viewer's own is replaced by its card count. A viewer
+    of None (a spectator) sees no hands. Fish `options` (the cards the player
+    to move may ask for, which follow from their hand) are only shown to that
+    player. Piles and claims stay public.
+    """
+    owners = {}
+    for owner_id, owner in state["owners"].items():
+        if owner["is_player"] and owner_id != viewer:
+            owner = {"cards": [], "is_player": True, "card_count": len(owner["cards"])}
+        elif owner_id == "options" and (viewer is None or viewer != state.get("current_player")):
+            owner = {**owner, "cards": []}
+        owners[owner_id] = owner
+    return {**state, "owners": owners}
+
+# Null manager
+
+class NullLog:
+    """
+    Stand-in for GameLog. Keeps logged states only when asked to.
+    """
+    def __init__(self, keep_states: bool = False):
+        self.keep_states = keep_states
+        self.game_states = []
+        self.logged = 0
+
+    def log_state(self, game_state, owners: dict = None):
+        self.logged += 1
+        if self.keep_states:
+            self.game_states.append(game_state)
+
+class NullManager:
+    """
+    Satisfies the manager interface the engine calls into (`game_log`,
+    `keeps_states`, `broadcast`, `end_game`, `update_user_stats`) without
+    any I/O. Unless it keeps states, the engine never builds them: it
+    broadcasts and logs None in their place.
+    """
+    def __init__(self, keep_states: bool = False):
+        self.keeps_states = keep_states
+        self.game_log = NullLog(keep_states)
+        self.broadcasts = 0
+        self.stat_updates = 0
+        self.results = None
+        self.end_index = None # states logged when the game ended
+
+    async def broadcast(self, message: dict):
+        self.broadcasts += 1
+        self.game_log.log_state(message)
+
+    async def end_game(self, results: dict):
+        self.results = results
+        self.end_index = self.game_log.logged
+
+    async def update_user_stats(self, user_id: str, inc_fields: dict):
+        self.stat_updates += 1
+
+GAME_TYPES = {
+    "vietcong": VietCongGame,
+    "fish": FishGame,
+    "simple": SimpleGame,
+}
+
+async def replay_game_states(game_type: str, seats: list[str], seed: int, turns: list[TurnModel], teams: dict[str, int] = None) -> list:
+    """
+    Regenerate the logged states of a game from its seed, seating and the
+    ordered accepted turns, by replaying them through the engine.
+    """
+    manager = NullManager(keep_states=True)
+    game = GAME_TYPES[game_type](manager, seats, seed)
+    if teams and any(game.player_status.get(player) != team for player, team in teams.items()):
+        raise ValueError("Seed does not reproduce the recorded teams")
+    game.log_state()
+    for i, turn in enumerate(turns):
+        if not await game.play_turn(Turn.from_model(turn)):
+            raise ValueError(f"Recorded turn {i} was rejected on replay")
+    states = manager.game_log.game_states
+    return states if manager.end_index is None else states[:manager.end_index]
+
+def _build_deck():
+    """
+    Intern the 54 deck cards with their VietCong and Fish keys precomputed.
+    """
+    rank_arr = ["", "A", "2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K"]
+    suit_arr = ["", "C", "D", "H", "S"]
+    ranks = [(rank, suit) for suit in _SUIT_ORDER for rank in range(1, 14)] + [(0, Suit.CLUB), (0, Suit.DIAMOND)]
+    for rank, suit in ranks:
+        if rank == 0 or rank == 8:
+            half_suit = FishGame.HalfSuit.MIDDLE
+        else:
+            half_suit = FishGame.HalfSuit((rank > 8 or rank == 1)*4+suit.value-1)
+        index = card_index(rank, suit)
+        _DECK[index] = Card._intern(
+            rank,
+            suit,
+            index=index,
+            bit=1 << index,
+            vc_value=(rank-3)%13*10+VietCongGame.suit_to_value[suit],
+            rank_unit=1 << 3*(index >> 2), # one count in a 3-bit-per-rank VietCong rank vector
+            half_suit=half_suit,
+            fish_value=rank+half_suit.value*20,
+            code=("JB" if suit == Suit.CLUB else "JR") if rank == 0 else rank_arr[rank]+suit_arr[suit.value],
+        )
+
+    FishGame._half_suit_cards = {
+        half_suit: tuple(Card(8, Suit(i+1)) for i in range(4)) + tuple(Card(0, Suit(i+1)) for i in range(2))
+        if half_suit == FishGame.HalfSuit.MIDDLE else
+        tuple(Card((half_suit.value//4*7+i+1)%13+1, Suit(half_suit.value%4+1)) for i in range(6))
+        for half_suit in FishGame.HalfSuit
+    }
+    FishGame._half_suit_mask = {half_suit: cards_to_mask(cards) for half_suit, cards in FishGame._half_suit_cards.items()}
+
+_build_deck()
+
+def _build_combo_table():
+    """
+    Enumerate every legal VietCong shape by rank counts: multiples of one
+    rank, runs of 3+ ranks and runs of 3+ pairs, neither ending on a 2.
+    """
+    Combo = VietCongGame.Combo
+    table = VietCongGame._combo_table
+    known = {combo.value for combo in Combo}
+    for rank in range(13):
+        for count in range(1, 5):
+            table[count << 3*rank] = Combo(count)
+    for multiple, base in ((1, Combo.SEQUENCE), (2, Combo.DB_SEQUENCE)):
+        for start in range(12):
+            key = 0
+            for rank in range(start, 12):
+                key += multiple << 3*rank
+                length = rank-start+1
+                if length >= 3 and base.value+length in known:
+                    table[key] = Combo(base.value+length)
+
+_build_combo_table()
@@ -0,0 +1,137 @@
+"""
+Runs each active game's turns one at a time.
+
+`Game.play_turn` awaits (broadcasts, stat writes, the replay at the end)
+partway through changing the game, so two turns for one game must never
+run at once. Each game has an actor: turns are queued on it and a single
+consumer task plays them in arrival order, resolving each submitter's
+future with the turn's result. Games don't wait on each other and nothing
+is locked. The consumer only exists while its game has turns queued, so
+idle games cost no task.
+
+A turn runs in the consumer, not in the request that submitted it, so a
+client disconnecting mid-turn can't leave its game half changed. A turn
+whose submitter gave up before it started is skipped.
+"""
+import asyncio
+import time
+from collections import deque
+
+class ActorStats:
+    """
+    Totals over every game's actor, including games that have ended.
+    """
+    def __init__(self):
+        self.submitted = 0
+        self.turns = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.service_seconds = 0.0
+        self.max_service_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def metrics(self, actors: list["GameActor"]) -> dict:
+        busy = [actor for actor in actors if actor.busy]
+        deepest = sorted(busy, key=GameActor.depth, reverse=True)[:10]
+        return {
+            "games": len(actors),
+            "busy_games": len(busy),
+            "queued_turns": sum(actor.depth() for actor in busy),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "turns": self.turns,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "avg_service_ms": self.service_seconds / self.turns * 1000 if self.turns else 0.0,
+            "max_service_ms": self.max_service_seconds * 1000,
+            "avg_wait_ms": self.wait_seconds / self.turns * 1000 if self.turns else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "deepest": {actor.manager.game_id: actor.depth() for actor in deepest},
+        }
+
+class GameActor:
+    def __init__(self, manager, stats: ActorStats):
+        self.manager = manager
+        self.stats = stats
+        self.queue: deque[tuple] = deque() # (turn, future, time queued)
+        self.task: asyncio.Task = None
+        self.turns = 0
+        self.max_depth = 0
+        self.service_seconds = 0.0
+        self.max_service_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    @property
+    def busy(self) -> bool:
+        return self.task is not None
+
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def submit(self, turn) -> asyncio.Future:
+        """
+        Queue a turn. The future resolves to whether it was accepted, or
+        fails with KeyError if the game ended before the turn's go.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((turn, future, time.perf_counter()))
+        self.stats.submitted += 1
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self.stats.max_depth = max(self.stats.max_depth, len(self.queue))
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        try:
+            while self.queue:
+                turn, future, queued = self.queue.popleft()
+                if future.done():
+                    self.stats.cancelled += 1
+                    continue
+                manager = self.manager
+                if manager.tracker.games.get(manager.game_id) is not manager:
+                    # Ended (or deleted) by an earlier turn
+                    future.set_exception(KeyError(manager.game_id))
+                    self.stats.rejected += 1
+                    continue
+                start = time.perf_counter()
+                try:
+                    accepted = await manager.play_turn(turn)
+                except Exception as e:
+                    self.stats.errors += 1
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(accepted)
+                self._record(start - queued, time.perf_counter() - start)
+        finally:
+            self.task = None
+
+    def _record(self, wait: float, service: float):
+        stats = self.stats
+        self.turns += 1
+        self.service_seconds += service
+        self.max_service_seconds = max(self.max_service_seconds, service)
+        self.wait_seconds += wait
+        stats.turns += 1
+        stats.service_seconds += service
+        stats.max_service_seconds = max(stats.max_service_seconds, service)
+        stats.wait_seconds += wait
+        stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "busy": self.busy,
+            "turns": self.turns,
+            "avg_service_ms": self.service_seconds / self.turns * 1000 if self.turns else 0.0,
+            "max_service_ms": self.max_service_seconds * 1000,
+            "avg_wait_ms": self.wait_seconds / self.turns * 1000 if self.turns else 0.0,
+        }
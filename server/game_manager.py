@@ -6,13 +6,21 @@ try:
         TransactionModel,
         TurnModel,
         ReplayModel,
-        replay_collection,
+        ParticipantModel,
         GameModel,
         GameCollection,
         GameStateModel,
-        user_collection,
         game_collection,
     )
+    from .websocket_hub import WebSocketHub, encode_frame
+    from .user_cache import user_cache
+    from .waiting_rooms import WaitingRoomRegistry
+    from .persistence import PersistenceQueue
+    from .leaderboard import Leaderboards
+    from .cluster import cluster_from_env
+    from .checkpoints import checkpointer_from_env
+    from .reaper import GameReaper
+    from .game_actor import ActorStats, GameActor
 except ImportError:  # Allows running directly from server/
     from game import *  # type: ignore
     import game  # type: ignore
@@ -21,40 +29,233 @@ except ImportError:  # Allows running directly from server/
         TransactionModel,
         TurnModel,
         ReplayModel,
-        replay_collection,
+        ParticipantModel,
         GameModel,
         GameCollection,
         GameStateModel,
-        user_collection,
         game_collection,
     )
+    from websocket_hub import WebSocketHub, encode_frame  # type: ignore
+    from user_cache import user_cache  # type: ignore
+    from waiting_rooms import WaitingRoomRegistry  # type: ignore
+    from persistence import PersistenceQueue  # type: ignore
+    from leaderboard import Leaderboards  # type: ignore
+    from cluster import cluster_from_env  # type: ignore
+    from checkpoints import checkpointer_from_env  # type: ignore
+    from reaper import GameReaper  # type: ignore
+    from game_actor import ActorStats, GameActor  # type: ignore
+import asyncio
+import copy
 import time
-from fastapi import WebSocket, WebSocketDisconnect
-from starlette.websockets import WebSocketState
+from collections import OrderedDict
+from fastapi import WebSocket
 from bson import ObjectId
 import traceback
-from websockets.exceptions import ConnectionClosedOK
+
+def cards_mask(cards) -> int:
+    """
+    Card mask of a list of serialized cards (CardModel or its dict form).
+    """
+    mask = 0
+    for card in cards:
+        if not isinstance(card, dict):
+            card = card.dict()
+        mask |= game.Card(card["rank"], game.Suit(card["suit"])).bit
+    return mask
 
 # This holds multiple game managers
 class GameTracker:
+    """
+    Open and active games. With several workers (see cluster.py) each game
+    lives on the worker that owns its id: the async methods below run there,
+    and `games` only holds this worker's active games.
+    """
     def __init__(self):
         self.games: dict[str, GameManager] = {}
+        self.activity: OrderedDict[str, float] = OrderedDict() # game id -> last active (monotonic), least recent first
+        self.cluster = cluster_from_env()
+        self.hub = WebSocketHub()
+        self.waiting_rooms = WaitingRoomRegistry()
+        self.persistence = PersistenceQueue()
+        self.checkpoints = checkpointer_from_env()
+        self.leaderboards = Leaderboards()
+        self.reaper = GameReaper(self)
+        self.actors = ActorStats()
         self.websocket_manager = GameWebSocketManager(self)
         self.waiting_websocket_manager = WaitingGameWebSocketManager(self)
         self.lobby_websocket_manager = LobbyWebSocketManager(self)
 
+        for name, operation in {
+            "open_game": self._open_game,
+            "add_player": self.waiting_rooms.add_player,
+            "remove_player": self.waiting_rooms.remove_player,
+            "close_game": self.waiting_rooms.remove,
+            "start_game": self._start_game,
+            "play_turn": self._play_turn,
+            "state_snapshot": self._state_snapshot,
+        }.items():
+            self.cluster.register(name, operation)
+        # Every worker keeps a copy of the open games for its lobby sockets
+        self.waiting_rooms.publishers.append(lambda event, doc: self.cluster.publish("waiting_room", event=event, doc=doc))
+        self.cluster.subscribe("waiting_room", self.waiting_rooms.apply)
+        self.cluster.subscribe("stats", self.leaderboards.apply)
+        # A user written on one worker must not be served stale from another's cache
+        user_cache.publishers.append(lambda user_id: self.cluster.publish("user_changed", user_id=str(user_id)))
+        self.cluster.subscribe("user_changed", user_cache.invalidate)
+
     def create_game(self, game_id: str, name: str, game_type: str, players: list[str]):
         self.games[game_id] = GameManager(self, game_id, name, game_type, players)
+        self.touch(game_id)
+        self.checkpoints.mark(self.games[game_id])
+
+    def touch(self, game_id: str):
+        self.activity[game_id] = time.monotonic()
+        self.activity.move_to_end(game_id)
+
+    def _restore_game(self, doc: dict):
+        game_id = doc["_id"]
+        self.games[game_id] = GameManager.restore(self, doc)
+        self.touch(game_id)
+        self.checkpoints.turn_docs[game_id] = list(doc["turns"])
+        self.checkpoints.saved_turns[game_id] = len(doc["turns"])
+
+    async def restore_games(self) -> int:
+        """
+        Rebuild this worker's games from their checkpoints (one read for
+        all of them). Called at startup, before serving requests.
+        """
+        start = time.perf_counter()
+        restored = 0
+        for doc in await self.checkpoints.load():
+            game_id = doc["_id"]
+            if game_id in self.games or not self.cluster.is_local(game_id):
+                continue
+            try:
+                self._restore_game(doc)
+            except Exception as e:
+                print(f"Could not restore game {game_id}: {e}")
+                traceback.print_exc()
+                continue
+            restored += 1
+        self.checkpoints.restored = restored
+        self.checkpoints.restore_seconds = time.perf_counter() - start
+        print(f"Restored {restored} active games in {self.checkpoints.restore_seconds:.3f}s")
+        return restored
+
+    async def revive_game(self, game_id: str) -> bool:
+        """
+        Whether this worker has the game active, bringing it back first if
+        it was evicted and archived (see reaper.py).
+        """
+        if game_id in self.games:
+            return True
+        archived = await self.checkpoints.take_archived(game_id)
+        if archived is None:
+            return False
+        if game_id not in self.games:
+            if isinstance(archived, dict):
+                self._restore_game(archived)
+            else:
+                self.games[game_id] = archived
+                self.touch(game_id)
+            self.checkpoints.mark(self.games[game_id])
+            self.reaper.revived += 1
+        return True
+
+    async def active_game(self, game_id: str) -> "GameManager":
+        """
+        This worker's game, revived if need be. Raises KeyError if there is none.
+        """
+        if not await self.revive_game(game_id):
+            raise KeyError(game_id)
+        self.touch(game_id)
+        return self.games[game_id]
+
+    async def open_game(self, name: str, game_type: str) -> dict:
+        game_id = str(ObjectId())
+        return await self.cluster.call("open_game", game_id, name=name, game_type=game_type)
+
+    async def _open_game(self, game_id: str, name: str, game_type: str) -> dict:
+        return await self.waiting_rooms.create(name, game_type, game_id)
+
+    async def add_player(self, game_id: str, user_id: str, max_players: int) -> dict:
+        return await self.cluster.call("add_player", game_id, user_id=user_id, max_players=max_players)
+
+    async def remove_player(self, game_id: str, user_id: str) -> dict:
+        return await self.cluster.call("remove_player", game_id, user_id=user_id)
+
+    async def close_game(self, game_id: str) -> bool:
+        return await self.cluster.call("close_game", game_id)
+
+    async def start_game(self, game_id: str) -> dict:
+        """
+        Turn a full open game into an active one. Raises KeyError if it is
+        not open and ValueError if it is not full.
+        """
+        return await self.cluster.call("start_game", game_id)
+
+    async def _start_game(self, game_id: str) -> dict:
+        doc = self.waiting_rooms.get(game_id)
+        if not doc:
+            raise KeyError(game_id)
+        if len(doc["players"]) != GAME_RULES[doc["type"]]["max_players"]:
+            raise ValueError("Game not full yet")
+        self.create_game(game_id, doc["name"], doc["type"], list(map(str, doc["players"])))
+        # No longer open; the registry tells the lobby
+        await self.waiting_rooms.remove(game_id)
+        return doc
 
     async def play_turn(self, game_id: str, turn: TurnModel) -> bool:
-        return await self.games[game_id].play_turn(game.Turn.from_model(turn))
+        """
+        Raises KeyError if the game is not active.
+        """
+        if self.cluster.is_local(game_id):
+            # Skip the call's JSON round trip of the turn
+            future = await self.submit_turn(game_id, game.Turn.from_model(turn))
+            return await future
+        return await self.cluster.call("play_turn", game_id, turn=turn.dict())
+
+    async def _play_turn(self, game_id: str, turn: dict) -> bool:
+        future = await self.submit_turn(game_id, game.Turn.from_model(TurnModel(**turn)))
+        return await future
+
+    async def submit_turn(self, game_id: str, turn: game.Turn) -> asyncio.Future:
+        """
+        Queue a turn on one of this worker's games (see game_actor.py) and
+        return the future of its result. Raises KeyError if the game is not active.
+        """
+        manager = await self.active_game(game_id)
+        return manager.actor.submit(turn)
+
+    async def _state_snapshot(self, game_id: str, watcher: str = None) -> dict:
+        """
+        The game's current state, for a `watcher` worker that mirrors it
+        (see RemoteGame) and is sent its "game_state" events from now on.
+        """
+        manager = await self.active_game(game_id)
+        if watcher is not None:
+            self.websocket_manager.watchers.setdefault(game_id, set()).add(watcher)
+        return {"version": manager.game.state_version, "state": manager.game.current_state()}
     
     async def broadcast(self, game_id: str, message: dict):
         await self.websocket_manager.broadcast(game_id, message)
 
+    def get_state_frame(self, game_id: str, viewer: str = None) -> str:
+        if game_id in self.websocket_manager.remote:
+            return self.websocket_manager.remote[game_id].state_frame(viewer)
+        return self.games[game_id].state_frame(viewer)
+
     def delete_game(self, game_id: str):
-        if game_id in self.games:
-            del self.games[game_id]
+        self.unload_game(game_id)
+        self.checkpoints.remove(game_id)
+
+    def unload_game(self, game_id: str) -> "GameManager":
+        """
+        Drop a game from memory, leaving its checkpoint alone.
+        """
+        self.activity.pop(game_id, None)
+        self.websocket_manager.watchers.pop(game_id, None)
+        return self.games.pop(game_id, None)
 
     def get_active_games(self):
         return list(self.games.keys())
@@ -64,272 +265,536 @@ class GameTracker:
 
 # Handles non-game logic for a single game
 class GameManager:
+    keeps_states = True # the engine builds every state, to send and log
+
     def __init__(self, tracker: GameTracker, game_id: str, name: str, game_type: str, players: list[str]):
-        mapping = {
-            "fish": game.FishGame,
-            "vietcong": game.VietCongGame,
-            "simple": game.SimpleGame,
-        }
-        game_class = mapping.get(game_type.lower())
+        game_class = game.GAME_TYPES.get(game_type.lower())
         if not game_class:
             raise ValueError(f"Unknown game type: {game_type}")
         self.tracker = tracker
         self.game_id = game_id
-        print(type(game_class))
-        #print(type(game_class(self,players)))
-        #print("grr")
         self.game = game_class(self, players)
-        self.game_log = GameLog(game_id, name, game_type, players)
+        self.game_log = GameLog(game_id, name, game_type, players, self.game.seed, self.game.player_status, self.game.card_sort_key)
         self.game.log_state()
-        #print("yoo")
+        self.actor = GameActor(self, tracker.actors)
+        self._frames: dict[str, str] = {} # viewer -> encoded state, for _frames_version
+        self._frames_version = None
+
+    @classmethod
+    def restore(cls, tracker: GameTracker, doc: dict) -> "GameManager":
+        """
+        Rebuild a manager and its game from a checkpoint (see `checkpoint`).
+        """
+        manager = cls.__new__(cls)
+        manager.tracker = tracker
+        manager.game_id = doc["_id"]
+        manager.game = game.GAME_TYPES[doc["type"]].restore(manager, doc["game"])
+        manager.game_log = GameLog(doc["_id"], doc["name"], doc["type"], doc["game"]["players"], doc["game"]["seed"], doc["teams"], manager.game.card_sort_key)
+        manager.game_log.resume(doc["timestamp"], doc["turns"], doc["log"])
+        manager.actor = GameActor(manager, tracker.actors)
+        manager._frames = {}
+        manager._frames_version = None
+        return manager
+
+    def checkpoint(self) -> dict:
+        """
+        The game's checkpoint, less the logged turns (the Checkpointer adds those).
+        """
+        return {
+            "_id": self.game_id,
+            "name": self.game_log.name,
+            "type": self.game_log.game_type,
+            "timestamp": self.game_log.timestamp,
+            "teams": self.game_log.teams,
+            "log": self.game_log.cursor(),
+            "game": self.game.checkpoint(),
+        }
 
     async def play_turn(self, turn: game.Turn):
-        return await self.game.play_turn(turn)
+        """
+        Run by the game's actor only, one turn at a time.
+        """
+        # Record the turn as submitted (the engine may rewrite it) before it is
+        # applied, since the game-ending turn saves the replay mid-turn
+        self.game_log.log_turn(turn.to_model())
+        version = self.game.state_version
+        accepted = False
+        try:
+            accepted = await self.game.play_turn(turn)
+        finally:
+            if not accepted:
+                self.game_log.discard_turn()
+            elif self.game.state_version == version:
+                # Broadcasting bumps the version; a turn that changed the
+                # state without broadcasting it still needs a new one
+                self.game.state_changed()
+        if accepted and self.game_id in self.tracker.games:
+            self.tracker.checkpoints.mark(self)
+        return accepted
     
     async def broadcast(self,message: dict):
-        self.game_log.log_state(message)
+        self.game_log.log_state(message, self.game.owner_masks() if message is self.game.current_state() else None)
         await self.tracker.broadcast(self.game_id, message)
 
     async def end_game(self, results: dict):
-        await self.game_log.save_replay(results)
+        self.tracker.persistence.insert_replay(self.game_log.replay_document(results))
         self.tracker.delete_game(self.game_id)
 
+    async def update_user_stats(self, user_id: str, inc_fields: dict):
+        # Written behind; the cached user is invalidated once it lands
+        self.tracker.persistence.inc_user_stats(user_id, inc_fields)
+        self.tracker.leaderboards.apply(user_id, inc_fields)
+        self.tracker.cluster.publish("stats", user_id=user_id, inc_fields=inc_fields)
+
     def get_game_state(self):
-        return self.game.to_game_state()
+        return self.game.current_state_model()
+
+    def state_frame(self, viewer: str = None) -> str:
+        """
+        The current state as seen by `viewer`, JSON-encoded once per state
+        version and view.
+        """
+        if self._frames_version != self.game.state_version:
+            self._frames = {}
+            self._frames_version = self.game.state_version
+        if viewer not in self._frames:
+            self._frames[viewer] = encode_frame(project_state(self.game.current_state(), viewer))
+        return self._frames[viewer]
 
 # Handles logging turns for replay
 class GameLog:
-    def __init__(self, game_id: str, name: str, game_type: str, players):
+    """
+    Live log of a game's broadcast states. States are kept as owner masks:
+    one keyframe every KEYFRAME_INTERVAL states and, for every state after
+    the first, a delta holding the owners whose cards moved and the scalar
+    fields that changed. Full states are only built by `get_state`/`states`.
+    """
+    KEYFRAME_INTERVAL = 32
+    SCALAR_FIELDS = ("game_type", "current_player", "last_turn", "player_status", "status")
+
+    def __init__(self, game_id: str, name: str, game_type: str, players, seed: int = None, teams: dict = None, sort_key=None):
         self.timestamp = int(time.time())
         self.name = name
         self.game_id = game_id
         self.game_type = game_type
         self.players = players
-        self.game_states = []
+        self.seed = seed
+        self.teams = dict(teams or {})
+        self.sort_key = sort_key # card order of materialized owners, as in Game.card_sort_key
+        self.turns: list[TurnModel] = [] # accepted turns, in order (dicts for those restored from a checkpoint)
+        self.state_count = 0
+        self.first_state = 0 # states before this one were logged before a restart
+        self._keyframes: list[dict] = [] # compact states 0, N, 2N, ...
+        self._deltas: list[dict] = [] # _deltas[i-1] turns state i-1 into state i
+        self._last: dict = None # compact form of the latest state
+
+
+    def log_state(self, game_state, owners: dict[str, tuple[int, bool]] = None):
+        """
+        Log a state. `owners` is the live game's `owner_masks()`, when the
+        state is the game's current one; otherwise they are read from the state.
+        """
+        state = self._compact(game_state, owners)
+        if self._last is not None:
+            self._deltas.append(self._diff(self._last, state))
+        if (self.state_count - self.first_state) % self.KEYFRAME_INTERVAL == 0:
+            self._keyframes.append(state)
+        self._last = state
+        self.state_count += 1
+
+    def cursor(self) -> dict:
+        """
+        Where the log is: its state count and latest (compact) state.
+        """
+        return {"state_count": self.state_count, "state": self._last}
 
+    def resume(self, timestamp: int, turns: list, cursor: dict):
+        """
+        Continue a log from a checkpoint's `cursor()`. States before the
+        latest are not kept, but the turns still rebuild them.
+        """
+        self.timestamp = timestamp
+        self.turns = list(turns)
+        state = dict(cursor["state"])
+        state["owners"] = {owner_id: tuple(owner) for owner_id, owner in state["owners"].items()}
+        self._keyframes = [state]
+        self._deltas = []
+        self._last = state
+        self.state_count = cursor["state_count"]
+        self.first_state = self.state_count - 1
+
+    def get_state(self, index: int) -> dict:
+        """
+        Materialize logged state `index` from the nearest keyframe before it.
+        """
+        if not 0 <= index < self.state_count:
+            raise IndexError(f"No logged state {index}")
+        if index < self.first_state:
+            raise IndexError(f"State {index} was logged before the game was restored")
+        offset = index - self.first_state
+        start = offset - offset % self.KEYFRAME_INTERVAL
+        state = self._keyframes[start // self.KEYFRAME_INTERVAL]
+        for delta in self._deltas[start:offset]:
+            state = self._apply(state, delta)
+        return self._expand(state)
+
+    def states(self) -> list[dict]:
+        """
+        Materialize every logged state, in order.
+        """
+        if self._last is None:
+            return []
+        state = self._keyframes[0]
+        states = [self._expand(state)]
+        for delta in self._deltas:
+            state = self._apply(state, delta)
+            states.append(self._expand(state))
+        return states
+
+    @classmethod
+    def _compact(cls, game_state, owners: dict = None) -> dict:
+        if not isinstance(game_state, dict):
+            game_state = game_state.dict()
+        state = {field: game_state[field] for field in cls.SCALAR_FIELDS}
+        if owners is None:
+            owners = {
+                owner_id: (cards_mask(owner["cards"]), owner["is_player"])
+                for owner_id, owner in game_state["owners"].items()
+            }
+        state["owners"] = owners
+        return state
+
+    @classmethod
+    def _diff(cls, old: dict, new: dict) -> dict:
+        delta = {field: new[field] for field in cls.SCALAR_FIELDS if new[field] != old[field]}
+        owners = {owner_id: owner for owner_id, owner in new["owners"].items() if old["owners"].get(owner_id) != owner}
+        owners.update({owner_id: None for owner_id in old["owners"] if owner_id not in new["owners"]})
+        if owners:
+            delta["owners"] = owners
+        return delta
+
+    @staticmethod
+    def _apply(state: dict, delta: dict) -> dict:
+        owners = state["owners"]
+        if "owners" in delta:
+            owners = dict(owners)
+            for owner_id, owner in delta["owners"].items():
+                if owner is None:
+                    del owners[owner_id]
+                else:
+                    owners[owner_id] = owner
+        return {**state, **delta, "owners": owners}
+
+    def _expand(self, state: dict) -> dict:
+        owners = {}
+        for owner_id, (mask, is_player) in state["owners"].items():
+            cards = game.cards_from_mask(mask)
+            if self.sort_key is not None:
+                cards.sort(key=self.sort_key)
+            owners[owner_id] = {"cards": [{"rank": card.rank, "suit": card.suit.value} for card in cards], "is_player": is_player, "card_count": None}
+        return {
+            "game_type": state["game_type"],
+            "owners": owners,
+            "current_player": state["current_player"],
+            "last_turn": copy.deepcopy(state["last_turn"]),
+            "player_status": dict(state["player_status"]),
+            "status": state["status"],
+        }
 
-    def log_state(self, game_state):
-        self.game_states.append(game_state)
+    def log_turn(self, turn: TurnModel):
+        self.turns.append(turn)
 
-    async def save_replay(self, results: dict):
+    def discard_turn(self):
+        self.turns.pop()
+
+    def replay_document(self, results: dict) -> dict:
         """
-        Save the game replay to MongoDB.
+        The replay to save to MongoDB. `player_names` is left empty; the
+        persistence worker fills it in before the insert.
         """
         player_obj_ids = {ObjectId(pid): score for pid, score in results.items()}
-
-        # Look up player names by their ObjectId
-        player_names = {}
-        for pid, score in results.items():
-            user = await user_collection.find_one({"_id": ObjectId(pid)})
-            if user and user.get("name"):
-                player_names[ObjectId(pid)] = user["name"]
-            else:
-                player_names[ObjectId(pid)] = str(pid)  # fallback to pid if name not found
-
-        replay = ReplayModel(
-            type=self.game_type,
-            name=self.name,
-            players=player_obj_ids,
-            player_names=player_names,
-            game_states=self.game_states,
-            timestamp=self.timestamp,
-        )
-
-        await replay_collection.insert_one(replay.model_dump(by_alias=True, exclude={"id"}))
-
-async def safe_send_json(websocket: WebSocket, data: dict) -> bool:
-    """Safely send JSON data to websocket with proper error handling."""
-    try:
-        # Check if websocket is still connected
-        if websocket.client_state != WebSocketState.CONNECTED:
+        participants = [ParticipantModel(user=pid, result=score) for pid, score in results.items()]
+
+        if self.seed is None:
+            # Unseeded games can't be re-simulated, so keep every state
+            replay = ReplayModel(
+                type=self.game_type,
+                name=self.name,
+                players=player_obj_ids,
+                participants=participants,
+                game_states=self.states(),
+                timestamp=self.timestamp,
+            )
+        else:
+            replay = ReplayModel(
+                type=self.game_type,
+                name=self.name,
+                players=player_obj_ids,
+                participants=participants,
+                timestamp=self.timestamp,
+                format="events",
+                seed=self.seed,
+                seats=self.players,
+                teams=self.teams,
+                turns=self.turns,
+            )
+
+        return replay.model_dump(by_alias=True, exclude={"id"})
+
+class RemoteGame:
+    """
+    The latest state of a game owned by another worker, kept while sockets
+    on this one watch it. Frames are cached per view like `GameManager.state_frame`.
+    """
+    def __init__(self, version: int, state: dict):
+        self.version = version
+        self.state = state
+        self.frames: dict[str, str] = {}
+
+    def update(self, version: int, state: dict) -> bool:
+        if version <= self.version:
             return False
-        await websocket.send_json(data)
+        self.version = version
+        self.state = state
+        self.frames = {}
         return True
-    except (WebSocketDisconnect, ConnectionClosedOK, Exception) as e:
-        print(f"Error sending websocket message: {e}")
-        return False
+
+    def state_frame(self, viewer: str = None) -> str:
+        if viewer not in self.frames:
+            self.frames[viewer] = encode_frame(project_state(self.state, viewer))
+        return self.frames[viewer]
 
 # Handles WebSocket for all games
 class GameWebSocketManager:
+    """
+    Game sockets get the state projected for their seat: a player sees their
+    own hand, spectators (no user id, or one not seated) see none. Each view
+    is projected and JSON-encoded once per state version and the same text is
+    queued for every socket sharing it, on broadcast and on connect.
+
+    Sockets for a game another worker owns are served from a RemoteGame,
+    kept current by the owner's "game_state" events. The owner only sends
+    those to the workers mirroring the game (`watchers`).
+
+    Players also send their turns on their socket (see `handle_message`)
+    rather than one HTTP request each; PATCH /games/{id}/play still works.
+    """
     def __init__(self, tracker: GameTracker):
-        self.games: dict[str, list[WebSocket]] = {}
         self.tracker = tracker
-
-    async def connect(self, game_id: str, websocket: WebSocket):
+        self.hub = tracker.hub
+        self.remote: dict[str, RemoteGame] = {}
+        self.watchers: dict[str, set[str]] = {} # game id -> workers mirroring this worker's game
+        tracker.cluster.subscribe("game_state", self.apply_remote_state)
+        tracker.cluster.subscribe("game_unwatched", self.remove_watcher)
+        tracker.cluster.subscribe("game_expired", self.close_sockets)
+
+    @staticmethod
+    def topic(game_id: str) -> str:
+        return f"game:{game_id}"
+
+    def viewer_for(self, game_id: str, user_id: str = None):
+        manager = self.tracker.games.get(game_id)
+        if manager is not None:
+            seated = manager.game.player_status
+        else:
+            seated = self.remote[game_id].state["player_status"] if game_id in self.remote else ()
+        return user_id if user_id in seated else None
+
+    async def connect(self, game_id: str, websocket: WebSocket, user_id: str = None):
+        """
+        `user_id` is the user the socket authenticated as (see auth.py); the
+        socket views the game as that player if seated, otherwise it spectates.
+        """
         try:
-            await websocket.accept()
-            self.games.setdefault(game_id, []).append(websocket)
-            
-            # Send initial game state with safety check
-            game_state = self.tracker.get_game_state(game_id)
-            success = await safe_send_json(websocket, game_state.dict())
-            
-            if not success:
-                # Remove the websocket if sending fails
-                if websocket in self.games.get(game_id, []):
-                    self.games[game_id].remove(websocket)
-                    
+            if not self.tracker.cluster.is_local(game_id):
+                if game_id not in self.remote:
+                    self.remote[game_id] = RemoteGame(**await self.tracker.cluster.call("state_snapshot", game_id, watcher=self.tracker.cluster.worker_id))
+            elif await self.tracker.revive_game(game_id):
+                self.tracker.touch(game_id)
+            viewer = self.viewer_for(game_id, user_id)
+            await self.hub.connect(websocket, self.topic(game_id), viewer=viewer)
+            # Queue the initial game state
+            self.hub.send(websocket, self.tracker.get_state_frame(game_id, viewer))
         except Exception as e:
             print(f"Error in GameWebSocketManager.connect: {e}")
             print(f"Traceback: {traceback.format_exc()}")
-            # Remove the websocket if anything fails
-            if game_id in self.games and websocket in self.games.get(game_id, []):
-                self.games[game_id].remove(websocket)
+            self.disconnect(game_id, websocket)
+
+    async def handle_message(self, game_id: str, websocket: WebSocket, message: dict):
+        """
+        Play a turn sent as {"type": "turn", "seq": n, "turn": TurnModel} by
+        the player the socket is authenticated and seated as. The socket is answered with
+        {"type": "ack", "seq": n}, queued after the state the turn led to, or
+        {"type": "reject", "seq": n, "reason": ...}.
+        """
+        if not isinstance(message, dict) or message.get("type") != "turn":
+            return
+        seq = message.get("seq")
+        connection = self.hub.connections.get(websocket)
+        try:
+            turn = TurnModel(**message["turn"])
+        except (KeyError, TypeError, ValueError):
+            reason = "Invalid turn"
+        else:
+            if connection is None or turn.player != connection.data["viewer"]:
+                reason = "Not seated as this player"
+            else:
+                try:
+                    reason = None if await self.tracker.play_turn(game_id, turn) else "Invalid turn or game state"
+                except KeyError:
+                    reason = "Game not started or no active manager"
+                except Exception as e:
+                    print(f"Error playing turn from websocket: {e}")
+                    traceback.print_exc()
+                    reason = "Server error"
+        reply = {"type": "ack", "seq": seq} if reason is None else {"type": "reject", "seq": seq, "reason": reason}
+        self.hub.send(websocket, encode_frame(reply), droppable=False)
 
     def disconnect(self, game_id: str, websocket: WebSocket):
-        if game_id in self.games and websocket in self.games[game_id]:
-            self.games[game_id].remove(websocket)
-            if not self.games[game_id]:
-                del self.games[game_id]
+        self.hub.disconnect(websocket)
+        if game_id in self.remote and not self.hub.topics.get(self.topic(game_id)):
+            self.drop_remote(game_id)
+
+    def drop_remote(self, game_id: str):
+        """Stop mirroring another worker's game and tell its owner"""
+        if self.remote.pop(game_id, None) is not None:
+            cluster = self.tracker.cluster
+            cluster.publish_to([cluster.owner(game_id)], "game_unwatched", game_id=game_id, worker_id=cluster.worker_id)
+
+    def remove_watcher(self, game_id: str, worker_id: str):
+        watchers = self.watchers.get(game_id)
+        if watchers is not None:
+            watchers.discard(worker_id)
+            if not watchers:
+                del self.watchers[game_id]
 
     async def broadcast(self, game_id: str, message: dict):
-        if game_id not in self.games:
-            return
-            
-        # Create a copy of the websockets list to avoid modification during iteration
-        websockets_to_remove = []
-        for ws in self.games[game_id][:]:  # Create a copy of the list
-            success = await safe_send_json(ws, message)
-            if not success:
-                websockets_to_remove.append(ws)
-        
-        # Remove failed websockets
-        for ws in websockets_to_remove:
-            if ws in self.games[game_id]:
-                self.games[game_id].remove(ws)
-        
-        # Clean up empty game entries
-        if game_id in self.games and not self.games[game_id]:
-            del self.games[game_id]
+        # The current state's frames are cached per view by its GameManager
+        manager = self.tracker.games.get(game_id)
+        if manager is not None and message is manager.game.current_state():
+            frame = manager.state_frame
+            if game_id in self.watchers:
+                self.tracker.cluster.publish_to(self.watchers[game_id], "game_state", game_id=game_id, version=manager.game.state_version, state=message)
+        else:
+            frame = lambda viewer: encode_frame(project_state(message, viewer))
+        self.hub.publish(self.topic(game_id), lambda connection: frame(connection.data["viewer"]))
+
+    def expire(self, game_id: str, archived: bool = False):
+        """
+        Called by the reaper before it drops a game: tell every socket
+        watching it, on any worker, and close them. An `archived` game comes
+        back when it is next viewed, so its clients can reconnect.
+        """
+        self.close_sockets(game_id, archived)
+        self.tracker.cluster.publish_to(self.watchers.get(game_id, ()), "game_expired", game_id=game_id, archived=archived)
+
+    def close_sockets(self, game_id: str, archived: bool = False):
+        # A reconnect to a revived game mirrors it afresh
+        self.remote.pop(game_id, None)
+        frame = encode_frame({"type": "game_expired", "game_id": game_id, "archived": archived})
+        for connection in self.hub.subscribers(self.topic(game_id)):
+            self.hub.send(connection.websocket, frame, droppable=False)
+            self.hub.close(connection.websocket)
+
+    def apply_remote_state(self, game_id: str, version: int, state: dict):
+        remote = self.remote.get(game_id)
+        if remote is not None and remote.update(version, state):
+            self.hub.publish(self.topic(game_id), lambda connection: remote.state_frame(connection.data["viewer"]))
+
+    def metrics(self) -> dict:
+        return self.hub.metrics()
 
 # Handles WebSocket for waiting room
 class WaitingGameWebSocketManager:
     def __init__(self, tracker: GameTracker):
-        self.games: dict[str, list[WebSocket]] = {}
         self.tracker = tracker
+        self.hub = tracker.hub
+        tracker.cluster.subscribe("waiting_frame", self.hub.publish)
+
+    @staticmethod
+    def topic(game_id: str) -> str:
+        return f"waiting:{game_id}"
 
     async def connect(self, game_id: str, websocket: WebSocket):
         try:
-            await websocket.accept()
-            self.games.setdefault(game_id, []).append(websocket)
+            await self.hub.connect(websocket, self.topic(game_id))
             
             # Send initial data to the newly connected websocket only
-            game = await game_collection.find_one({"_id": ObjectId(game_id)})
+            game = self.tracker.waiting_rooms.get(game_id)
             if game:
-                game_model = GameModel(**game)
-                success = await safe_send_json(websocket, game_model.model_dump(by_alias=True))
-                
-                if not success:
-                    # Remove the websocket if sending fails
-                    if websocket in self.games.get(game_id, []):
-                        self.games[game_id].remove(websocket)
+                self.hub.send(websocket, encode_frame(self.tracker.waiting_rooms.serialize(game)))
                         
         except Exception as e:
             print(f"Error in WaitingGameWebSocketManager.connect: {e}")
             print(f"Traceback: {traceback.format_exc()}")
-            # Remove the websocket if anything fails
-            if game_id in self.games and websocket in self.games.get(game_id, []):
-                self.games[game_id].remove(websocket)
+            self.disconnect(game_id, websocket)
 
     def disconnect(self, game_id: str, websocket: WebSocket):
-        if game_id in self.games and websocket in self.games[game_id]:
-            self.games[game_id].remove(websocket)
-            if not self.games[game_id]:
-                del self.games[game_id]
+        self.hub.disconnect(websocket)
 
     async def broadcast(self, game_id: str, message: dict):
-        if game_id not in self.games:
-            return
-            
-        # Create a copy of the websockets list to avoid modification during iteration
-        websockets_to_remove = []
-        for ws in self.games[game_id][:]:  # Create a copy of the list
-            success = await safe_send_json(ws, message)
-            if not success:
-                websockets_to_remove.append(ws)
-        
-        # Remove failed websockets
-        for ws in websockets_to_remove:
-            if ws in self.games[game_id]:
-                self.games[game_id].remove(ws)
-        
-        # Clean up empty game entries
-        if game_id in self.games and not self.games[game_id]:
-            del self.games[game_id]
+        frame = encode_frame(message)
+        self.hub.publish(self.topic(game_id), frame)
+        # Sockets in this waiting room may be connected to other workers
+        self.tracker.cluster.publish("waiting_frame", topic=self.topic(game_id), frame=frame)
 
 # Handles WebSocket for lobby
 class LobbyWebSocketManager:
+    """
+    Lobby sockets get one page of open games on connect or request, served
+    from the in-memory registry, then incremental events: game_added,
+    game_removed and game_updated (player counts). Changes are coalesced for
+    DEBOUNCE_SECONDS, so a burst of joins to one game goes out as a single
+    event with its latest state. Each event is encoded once and shared by
+    every lobby socket. A socket that falls behind and has events dropped is
+    sent its current page again instead.
+    """
+    GAMES_PER_PAGE = 10
+    DEBOUNCE_SECONDS = 0.1
+    PAGE_FRAMES_KEPT = 64 # distinct page requests cached between changes
+
     def __init__(self, tracker: GameTracker):
-        self.games: dict[str, list[WebSocket]] = {}
         self.tracker = tracker
+        self.hub = tracker.hub
+        self.page_frames: OrderedDict[tuple, str] = OrderedDict() # encoded pages by request, least recent first, valid until the next change
+        self.pending_events: dict[str, tuple[str, dict]] = {} # game id -> (event, doc), coalesced until flushed
+        self.flush_handle: asyncio.TimerHandle = None
+        tracker.waiting_rooms.listeners.append(self.publish_event)
+
+    @staticmethod
+    def topic(game_id: str) -> str:
+        return game_id # the lobby is a single topic, "lobby"
 
     async def connect(self, game_id: str, websocket: WebSocket):
         try:
-            await websocket.accept()
-            self.games.setdefault(game_id, []).append(websocket)
+            await self.hub.connect(websocket, self.topic(game_id), resync=self.resync_frame, page=(None, None, None))
             
-            # Send initial page (page 0) to the newly connected websocket
-            await self.send_games_page(websocket, 0)
+            # Send the first page to the newly connected websocket
+            self.send_games_page(websocket)
                     
         except Exception as e:
             print(f"Error in LobbyWebSocketManager.connect: {e}")
             print(f"Traceback: {traceback.format_exc()}")
-            # Remove the websocket if anything fails
-            if game_id in self.games and websocket in self.games.get(game_id, []):
-                self.games[game_id].remove(websocket)
-
-    async def send_games_page(self, websocket: WebSocket, page: int):
-        """Send a specific page of games (10 games per page) to a websocket"""
+            self.disconnect(game_id, websocket)
+
+    def page_frame(self, after: str = None, before: str = None, page: int = None) -> str:
+        key = (after, before, page)
+        if key in self.page_frames:
+            self.page_frames.move_to_end(key)
+        else:
+            self.page_frames[key] = encode_frame(self.tracker.waiting_rooms.page(self.GAMES_PER_PAGE, after, before, page))
+            if len(self.page_frames) > self.PAGE_FRAMES_KEPT:
+                self.page_frames.popitem(last=False)
+        return self.page_frames[key]
+
+    def send_games_page(self, websocket: WebSocket, after: str = None, before: str = None, page: int = None):
+        """Queue a page of games for a websocket"""
         try:
-            # Check if websocket is still connected before trying to send
-            if websocket.client_state != WebSocketState.CONNECTED:
-                print("WebSocket not connected, skipping send_games_page")
-                return False
-                
-            # Calculate pagination
-            games_per_page = 10
-            skip = page * games_per_page
-            
-            # Get total count and games for this page
-            total_games = await game_collection.count_documents({})
-            games_cursor = game_collection.find().skip(skip).limit(games_per_page)
-            games_page = await games_cursor.to_list(games_per_page)
-            
-            # Convert raw MongoDB documents to GameModel instances for proper serialization
-            games_serialized = []
-            for game_doc in games_page:
-                game_model = GameModel(**game_doc)
-                games_serialized.append(game_model.model_dump(by_alias=True))
-            
-            # Calculate pagination info
-            total_pages = (total_games + games_per_page - 1) // games_per_page  # Ceiling division
-            has_next = page < total_pages - 1
-            has_previous = page > 0
-            
-            # Create response with pagination info
-            response = {
-                "games": games_serialized,
-                "pagination": {
-                    "current_page": page,
-                    "total_pages": total_pages,
-                    "total_games": total_games,
-                    "games_per_page": games_per_page,
-                    "has_next": has_next,
-                    "has_previous": has_previous
-                }
-            }
-            
-            success = await safe_send_json(websocket, response)
-            
-            if not success:
-                # Remove the websocket if sending fails
-                for game_id, ws_list in self.games.items():
-                    if websocket in ws_list:
-                        ws_list.remove(websocket)
-                        break
-                        
-            return success
-                        
+            connection = self.hub.connections.get(websocket)
+            if connection is not None:
+                connection.data["page"] = (after, before, page) # the page its events apply to
+            self.hub.send(websocket, self.page_frame(after, before, page))
+            return True
         except Exception as e:
             print(f"Error sending games page: {e}")
             print(f"Traceback: {traceback.format_exc()}")
@@ -339,28 +804,56 @@ class LobbyWebSocketManager:
         """Handle pagination requests from clients"""
         try:
             if message.get("type") == "request_page":
-                page = message.get("page", 0)
-                await self.send_games_page(websocket, page)
+                page = message.get("page")
+                self.send_games_page(websocket, message.get("after"), message.get("before"), None if page is None else int(page))
         except Exception as e:
             print(f"Error handling pagination request: {e}")
 
-    def disconnect(self, game_id: str, websocket: WebSocket):
-        if game_id in self.games and websocket in self.games[game_id]:
-            self.games[game_id].remove(websocket)
-            if not self.games[game_id]:
-                del self.games[game_id]
+    def resync_frame(self, connection) -> str:
+        """The page a lobby socket is on, sent after some of its events were dropped"""
+        return self.page_frame(*connection.data["page"])
 
-    async def broadcast(self, game_id: str, message: dict):
-        if game_id not in self.games:
-            return
-            
-        # For broadcasts, send the first page to all connected clients
-        # This ensures everyone sees updates when games are created/deleted
-        websockets_to_remove = []
-        for ws in self.games[game_id][:]:  # Create a copy of the list
-            await self.send_games_page(ws, 0)
-        
-        # Note: send_games_page already handles websocket removal on failure
+    def disconnect(self, game_id: str, websocket: WebSocket):
+        self.hub.disconnect(websocket)
+
+    def publish_event(self, event: str, doc: dict):
+        """Registry listener: queue a change for every lobby socket"""
+        self.page_frames.clear()
+        game_id = str(doc["_id"])
+        previous = self.pending_events.get(game_id, (None, None))[0]
+        if previous == "game_added":
+            if event == "game_removed":
+                # Gone before anyone was told about it
+                del self.pending_events[game_id]
+                return
+            event = "game_added"
+        elif previous == "game_removed" and event == "game_added":
+            event = "game_updated"
+        self.pending_events[game_id] = (event, doc)
+        if self.flush_handle is None:
+            try:
+                self.flush_handle = asyncio.get_running_loop().call_later(self.DEBOUNCE_SECONDS, self.flush_events)
+            except RuntimeError: # no event loop to wait on
+                self.flush_events()
+
+    def flush_events(self):
+        """
+        Fan the queued changes out to every lobby socket as one lobby_events
+        frame, each with the game's latest state. One frame, so a socket
+        resynced on overflow gets a page that includes all of them.
+        """
+        self.flush_handle = None
+        events, self.pending_events = self.pending_events, {}
+        total_games = len(self.tracker.waiting_rooms)
+        messages = []
+        for game_id, (event, doc) in events.items():
+            message = {"type": event, "total_games": total_games}
+            if event == "game_removed":
+                message["id"] = game_id
+            else:
+                message["game"] = self.tracker.waiting_rooms.serialize(doc)
+            messages.append(message)
+        self.hub.publish(self.topic("lobby"), encode_frame({"type": "lobby_events", "total_games": total_games, "events": messages}))
 
 tracker = GameTracker()
 
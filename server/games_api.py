@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Depends
-from typing import List, Dict
-from bson import ObjectId
 
 try:
     from .core import GameModel, GameCreateModel
-    from .game_manager import get_tracker
+    from .game import GAME_RULES
+    from .game_manager import GameTracker, get_tracker
 except ImportError:  # Allows running directly from server/
     from core import GameModel, GameCreateModel  # type: ignore
-    from game_manager import get_tracker  # type: ignore
+    from game import GAME_RULES  # type: ignore
+    from game_manager import GameTracker, get_tracker  # type: ignore
 
 # Create router
 router = APIRouter(
@@ -15,144 +15,76 @@ router = APIRouter(
     tags=["games"],
 )
 
-# Active game connections - maps game_id to a list of user_ids
-active_game_users: Dict[str, List[str]] = {}
-# Active WebSocket connections - maps connection_id to websocket and game_id
-active_connections: Dict[str, Dict] = {}
+# Players come from the tracker (open games from its waiting room registry),
+# so these routes answer the same on every worker
+
+def game_users(tracker: GameTracker, game_id: str) -> list[str]:
+    """
+    The players of an open or active game. Raises KeyError if there is neither.
+    """
+    doc = tracker.waiting_rooms.get(game_id)
+    if doc is not None:
+        return [str(user) for user in doc["players"]]
+    if game_id in tracker.websocket_manager.remote:
+        return list(tracker.websocket_manager.remote[game_id].state["player_status"])
+    if game_id in tracker.games:
+        return list(tracker.games[game_id].game.player_status)
+    raise KeyError(game_id)
 
 @router.post("/", response_model=GameModel)
-async def create_game(game_data: GameCreateModel):
+async def create_game(game_data: GameCreateModel, tracker: GameTracker = Depends(get_tracker)):
     """
     Create a new game
     """
-    # Generate a unique game ID
-    game_id = str(ObjectId())
-    
-    # Initialize the list of players
-    players = []
-    print("creating new game...")
-    # Create the game in the tracker
-    try:
-        # Store in the active_game_users dictionary
-        active_game_users[game_id] = []
-        print(active_game_users)
-        # Create the game in the tracker with empty players list
-        get_tracker().create_game(game_id, game_data.name, game_data.type, players)
-        
-        # Return the game model
-        return {
-            "_id": game_id,
-            "name": game_data.name,
-            "type": game_data.type,
-            "players": players
-        }
-    except (ValueError, TypeError) as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    if game_data.type not in GAME_RULES:
+        raise HTTPException(status_code=400, detail=f"Unknown game type {game_data.type}")
+    new_game = await tracker.open_game(game_data.name, game_data.type)
+    return tracker.waiting_rooms.serialize(new_game)
 
 @router.post("/{game_id}/users/{user_id}")
-async def add_user_to_game(game_id: str, user_id: str):
+async def add_user_to_game(game_id: str, user_id: str, tracker: GameTracker = Depends(get_tracker)):
     """
     Add a user to an existing game
     """
-    #print(active_game_users)
-    #if game_id not in active_game_users:
-    #    raise HTTPException(status_code=404, detail="Game not found")
-    
-    # Check if game is at capacity based on the game type
-    game_managers = get_tracker().game_managers
-    print(game_managers)
-    if game_id not in game_managers:
-        raise HTTPException(status_code=404, detail="Game not found in tracker")
-    
-    game_manager = game_managers[game_id]
-    game_type = game_manager.game_log.game_type
-    
-    # Get the max players for this game type
-    try:
-        from .game import GAME_RULES
-    except ImportError:  # pragma: no cover - fallback for script execution
-        from game import GAME_RULES  # type: ignore
-    max_players = GAME_RULES.get(game_type, {}).get("max_players", 4)
-    
-    # Check if the game is already full
-    if len(active_game_users[game_id]) >= max_players:
-        raise HTTPException(status_code=400, detail="Game is already full")
-    
-    # Check if user is already in the game
-    if user_id in active_game_users[game_id]:
+    game = tracker.waiting_rooms.get(game_id)
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if user_id in game_users(tracker, game_id):
         return {"message": "User already in game"}
-    
-    # Add user to the game
-    active_game_users[game_id].append(user_id)
-    
-    # Update the game in the tracker with the new player list
+
     try:
-        # We need to modify the players list in the game manager
-        # For now, we'll just update our tracking dictionary
-        return {"message": "User added to game"}
+        await tracker.add_player(game_id, user_id, GAME_RULES[game["type"]]["max_players"])
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Game not found")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "User added to game"}
 
 @router.websocket("/ws/{game_id}/users")
-async def list_users_websocket(websocket: WebSocket, game_id: str):
+async def list_users_websocket(websocket: WebSocket, game_id: str, tracker: GameTracker = Depends(get_tracker)):
     """
-    WebSocket endpoint that monitors the active list of users in a specific game
+    WebSocket endpoint that sends the list of users in a specific game
     """
-    connection_id = str(ObjectId())
-    
-    # Accept the connection
     await websocket.accept()
-    
-    # Store the connection
-    active_connections[connection_id] = {
-        "websocket": websocket,
-        "game_id": game_id
-    }
-    
     try:
-        # Send initial list of users
-        if game_id in active_game_users:
-            await websocket.send_json({"users": active_game_users[game_id]})
-        else:
-            await websocket.send_json({"users": []})
-        
-        # Keep the connection open and listen for messages
+        try:
+            users = game_users(tracker, game_id)
+        except KeyError:
+            users = []
+        await websocket.send_json({"users": users})
+
+        # Keep the connection open; live updates are on the waiting room socket
         while True:
-            # This will just keep the connection open
-            # We'll broadcast updates when users join/leave
-            data = await websocket.receive_text()
-            # We could process messages here if needed
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        # Remove the connection when disconnected
-        if connection_id in active_connections:
-            del active_connections[connection_id]
+        pass
 
-# Helper function to broadcast user updates to all connections for a game
-async def broadcast_user_update(game_id: str):
-    """
-    Broadcast updated user list to all connections for a specific game
-    """
-    if game_id not in active_game_users:
-        return
-    
-    users = active_game_users[game_id]
-    
-    # Find all connections for this game
-    for conn_id, conn_info in active_connections.items():
-        if conn_info["game_id"] == game_id:
-            try:
-                await conn_info["websocket"].send_json({"users": users})
-            except:
-                # Handle any exceptions (connection might be closed)
-                pass
-
-# Update broadcast_user_update when adding users to games
 @router.get("/{game_id}/users")
-async def get_game_users(game_id: str):
+async def get_game_users(game_id: str, tracker: GameTracker = Depends(get_tracker)):
     """
     Get the list of users in a game
     """
-    if game_id not in active_game_users:
+    try:
+        return {"users": game_users(tracker, game_id)}
+    except KeyError:
         raise HTTPException(status_code=404, detail="Game not found")
-    
-    return {"users": active_game_users[game_id]}
@@ -0,0 +1,149 @@
+"""
+In-memory leaderboards, kept sorted as stats change so top-K and "rank of
+user X" never touch Mongo.
+
+Boards are loaded at startup from the users that have played (an indexed
+query on the game counters) and then follow every stat increment the games
+queue (see `GameManager.update_user_stats`), so they move in step with the
+write-behind stats. Each board is a sorted list of keys, so a rank is one
+bisect and a top-K page is one slice.
+"""
+import os
+from bisect import bisect_left, insort
+
+try:
+    from .core import user_collection
+    from .user_stats import VIETCONG_PLACE_WEIGHTS
+except ImportError:  # Allows running directly from server/
+    from core import user_collection  # type: ignore
+    from user_stats import VIETCONG_PLACE_WEIGHTS  # type: ignore
+
+# Stat counters the boards are computed from
+COUNTERS = [
+    "stats.fish.games",
+    "stats.fish.wins",
+    "stats.fish.claims",
+    "stats.fish.successful_claims",
+    "stats.vietcong.games",
+    *(f"stats.vietcong.place_finishes.{place}" for place in VIETCONG_PLACE_WEIGHTS),
+]
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator else 0.0
+
+class Leaderboard:
+    """
+    One ranking. `score` and `volume` (games or claims behind the score, the
+    tiebreak) are functions of a user's counters; users with a volume under
+    `min_volume` are left off the board.
+    """
+    def __init__(self, title: str, score, volume, min_volume: int):
+        self.title = title
+        self.score = score
+        self.volume = volume
+        self.min_volume = min_volume
+        self.keys: list[tuple] = [] # (-score, -volume, user id), best first
+        self.key_of: dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, user_id: str, counters: dict):
+        old = self.key_of.pop(user_id, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, old)]
+        volume = self.volume(counters)
+        if volume >= self.min_volume:
+            key = self.key_of[user_id] = (-self.score(counters), -volume, user_id)
+            insort(self.keys, key)
+
+    def rank_of_key(self, key: tuple) -> int:
+        # Equal scores share a rank
+        return bisect_left(self.keys, (key[0],)) + 1
+
+    def entry(self, key: tuple) -> dict:
+        return {"rank": self.rank_of_key(key), "user_id": key[2], "score": -key[0], "volume": -key[1]}
+
+    def top(self, limit: int, offset: int = 0) -> list[dict]:
+        return [self.entry(key) for key in self.keys[offset:offset + limit]]
+
+    def rank(self, user_id: str) -> dict:
+        """
+        The user's entry, or None if they are not on the board.
+        """
+        key = self.key_of.get(user_id)
+        return None if key is None else self.entry(key)
+
+def _vietcong_score(counters: dict) -> float:
+    points = sum(counters[f"stats.vietcong.place_finishes.{place}"] * weight for place, weight in VIETCONG_PLACE_WEIGHTS.items())
+    return _ratio(points, counters["stats.vietcong.games"])
+
+class Leaderboards:
+    def __init__(self, collection=user_collection, min_games: int = None):
+        self.collection = collection
+        # Rate boards only rank users with this many games (or claims), so one lucky game doesn't top them
+        self.min_games = min_games if min_games is not None else int(os.environ.get("LEADERBOARD_MIN_GAMES", 5))
+        self.counters: dict[str, dict[str, int]] = {} # user id -> COUNTERS
+        self.boards = {
+            "fish_wins": Leaderboard(
+                "Fish wins",
+                lambda c: c["stats.fish.wins"],
+                lambda c: c["stats.fish.games"],
+                1,
+            ),
+            "fish_win_rate": Leaderboard(
+                "Fish win rate",
+                lambda c: _ratio(c["stats.fish.wins"], c["stats.fish.games"]),
+                lambda c: c["stats.fish.games"],
+                self.min_games,
+            ),
+            "fish_claim_accuracy": Leaderboard(
+                "Fish claim accuracy",
+                lambda c: _ratio(c["stats.fish.successful_claims"], c["stats.fish.claims"]),
+                lambda c: c["stats.fish.claims"],
+                self.min_games,
+            ),
+            "vietcong_score_rate": Leaderboard(
+                "VietCong score rate",
+                _vietcong_score,
+                lambda c: c["stats.vietcong.games"],
+                self.min_games,
+            ),
+        }
+
+    async def load(self):
+        """
+        Rebuild every board from the users stored in Mongo that have played a game.
+        """
+        query = {"$or": [{"stats.fish.games": {"$gt": 0}}, {"stats.vietcong.games": {"$gt": 0}}]}
+        docs = await self.collection.find(query, {field: 1 for field in COUNTERS}).to_list(None)
+        self.counters = {}
+        for board in self.boards.values():
+            board.keys, board.key_of = [], {}
+        for doc in docs:
+            counters = {}
+            for field in COUNTERS:
+                value = doc
+                for key in field.split("."):
+                    value = value.get(key, 0) if isinstance(value, dict) else 0
+                counters[field] = value
+            self._set(str(doc["_id"]), counters)
+        print(f"Loaded leaderboards for {len(self.counters)} players")
+
+    def _set(self, user_id: str, counters: dict):
+        self.counters[user_id] = counters
+        for board in self.boards.values():
+            board.update(user_id, counters)
+
+    def apply(self, user_id: str, inc_fields: dict):
+        """
+        Follow a stat increment (same fields as the `$inc` written for it).
+        """
+        counters = self.counters.get(user_id) or dict.fromkeys(COUNTERS, 0)
+        for field, amount in inc_fields.items():
+            if field in counters:
+                counters[field] += amount
+        self._set(user_id, counters)
+
+    def get(self, board: str) -> Leaderboard:
+        return self.boards.get(board)
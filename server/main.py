@@ -4,14 +4,39 @@ from fastapi.responses import Response
 try:
     from .users_api import router as users_router
     from .games_api import router as games_router
+    from .game_manager import get_tracker
+    from .migrations import run_migrations
 except ImportError:  # Allows running as a script inside server/
     from users_api import router as users_router  # type: ignore
     from games_api import router as games_router  # type: ignore
+    from game_manager import get_tracker  # type: ignore
+    from migrations import run_migrations  # type: ignore
+from contextlib import asynccontextmanager
 import uvicorn
 import os
 
 
-app = FastAPI(title="Card Game API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tracker = get_tracker()
+    # Join the other workers first: games are routed by worker id
+    await tracker.cluster.start()
+    await run_migrations()
+    # Open games live in memory; load the ones persisted by earlier runs
+    await tracker.waiting_rooms.load()
+    await tracker.leaderboards.load()
+    # Games in progress when the last process stopped
+    await tracker.restore_games()
+    # Expires idle games and keeps the rest within the memory budget
+    tracker.reaper.start()
+    yield
+    await tracker.reaper.close()
+    # Stats, replays and checkpoints are written behind; don't lose the last batch
+    await tracker.persistence.close()
+    await tracker.checkpoints.close()
+    await tracker.cluster.close()
+
+app = FastAPI(title="Card Game API", lifespan=lifespan)
 
 # CORS configuration - more permissive for CloudFront
 app.add_middleware(
@@ -109,4 +134,12 @@ async def options_handler(request: Request):
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port, reload=False)
+    workers = int(os.environ.get("CLUSTER_WORKERS", 1))
+    if workers > 1:
+        # Worker processes import the app themselves (see cluster.py), by the
+        # module path this process was started with: "main" from inside
+        # server/, "server.main" with python -m from the repo root
+        module = __spec__.name if __spec__ is not None else os.path.splitext(os.path.basename(__file__))[0]
+        uvicorn.run(os.environ.get("APP_IMPORT_STRING", f"{module}:app"), host="0.0.0.0", port=port, workers=workers, reload=False)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port, reload=False)
@@ -0,0 +1,96 @@
+"""
+Indexes and data migrations, run at startup (see `main.lifespan`) or by hand:
+
+    python -m server.migrations [--batch-size N]
+
+Both are idempotent: `create_indexes` is a no-op for indexes that already
+exist and migrations only touch documents that still need them.
+"""
+import argparse
+import asyncio
+import os
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+
+try:
+    from .core import replay_collection, user_collection
+    from .user_stats import SEARCH_SORTS, RATE_FIELDS, rebuild_pipeline
+except ImportError:  # Allows running directly from server/
+    from core import replay_collection, user_collection  # type: ignore
+    from user_stats import SEARCH_SORTS, RATE_FIELDS, rebuild_pipeline  # type: ignore
+
+REPLAY_INDEXES = [
+    # A player's games, newest first (multikey over the participants array)
+    IndexModel([("participants.user", ASCENDING), ("timestamp", DESCENDING)], name="participants_user_timestamp"),
+    IndexModel([("type", ASCENDING), ("timestamp", DESCENDING)], name="type_timestamp"),
+    IndexModel([("name", ASCENDING)], name="name"),
+    IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+]
+
+# One per search sort, with the `_id` tiebreak its keyset cursor pages on
+USER_INDEXES = [
+    IndexModel([(field, direction), ("_id", direction)], name=f"search_{sort}")
+    for sort, (field, direction) in SEARCH_SORTS.items()
+]
+
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", 500))
+
+async def ensure_indexes(replays=replay_collection, users=user_collection):
+    await replays.create_indexes(REPLAY_INDEXES)
+    await users.create_indexes(USER_INDEXES)
+
+async def migrate_replay_participants(replays=replay_collection, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Give replays saved before the participants array one, built from their
+    `players` map. Works through the collection in `_id` order, one
+    `bulk_write` per batch. Returns the number of replays migrated.
+    """
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"participants": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await replays.find(query, {"players": 1}).sort("_id", ASCENDING).limit(batch_size).to_list(None)
+        if not docs:
+            break
+        await replays.bulk_write([
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"participants": [{"user": user, "result": result} for user, result in doc.get("players", {}).items()]}},
+            )
+            for doc in docs
+        ], ordered=False)
+        migrated += len(docs)
+        last_id = docs[-1]["_id"]
+    if migrated:
+        print(f"Migrated {migrated} replays to the participants array")
+    return migrated
+
+async def rebuild_user_stats(users=user_collection, everyone: bool = False) -> int:
+    """
+    Recompute the derived rates and `name_lower` (see user_stats.py) of users
+    missing them, or of every user. Returns the number of users updated.
+    """
+    query = {} if everyone else {"$or": [
+        *({field: {"$exists": False}} for field in RATE_FIELDS),
+        {"name": {"$type": "string"}, "name_lower": {"$exists": False}},
+    ]}
+    result = await users.update_many(query, rebuild_pipeline())
+    if result.modified_count:
+        print(f"Rebuilt derived stats of {result.modified_count} users")
+    return result.modified_count
+
+async def run_migrations(batch_size: int = MIGRATION_BATCH_SIZE, rebuild_stats: bool = False):
+    await ensure_indexes()
+    await migrate_replay_participants(batch_size=batch_size)
+    await rebuild_user_stats(everyone=rebuild_stats)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--rebuild-user-stats", action="store_true", help="recompute derived stats for every user, not just those missing them")
+    args = parser.parse_args()
+    asyncio.run(run_migrations(args.batch_size, args.rebuild_user_stats))
+
+if __name__ == "__main__":
+    main()
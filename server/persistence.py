@@ -0,0 +1,195 @@
+"""
+Write-behind queue for the writes a finished game makes: user stat
+increments and replay documents. The turn path only enqueues; a background
+worker coalesces whatever has queued up into one `bulk_write` of stat
+increments (one per user, summed, with the derived rates recomputed in the
+same update) and one `insert_many` of replays, retrying failed batches
+with backoff. Both are safe to retry after an error that leaves unknown what
+was applied: each stat batch records its id on the users it updates and
+skips users that have it, and replays are given their `_id` when queued. Replays are queued without player names; the worker looks
+them up for the whole batch at once.
+"""
+import asyncio
+import os
+import traceback
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+try:
+    from .core import user_collection, replay_collection
+    from .user_cache import user_cache
+    from .user_stats import inc_stats_pipeline
+except ImportError:  # Allows running directly from server/
+    from core import user_collection, replay_collection  # type: ignore
+    from user_cache import user_cache  # type: ignore
+    from user_stats import inc_stats_pipeline  # type: ignore
+
+DUPLICATE_KEY = 11000
+
+class PersistenceQueue:
+    def __init__(self, users=user_collection, replays=replay_collection, delay: float = None, max_retries: int = None):
+        self.users = users
+        self.replays = replays
+        # How long the worker lets writes pile up before sending a batch
+        self.delay = delay if delay is not None else float(os.environ.get("PERSISTENCE_BATCH_DELAY", 0.05))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("PERSISTENCE_MAX_RETRIES", 5))
+        self.stats: dict[ObjectId, dict[str, int]] = {} # user id -> summed $inc fields
+        self.replay_docs: list[dict] = []
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.task: asyncio.Task = None
+        self.closed = False
+        self.batches = 0
+        self.writes = 0
+        self.retries = 0
+        self.failures = 0
+
+    def inc_user_stats(self, user_id: str, inc_fields: dict):
+        """
+        Queue `$inc` of `inc_fields` on a user.
+        """
+        fields = self.stats.setdefault(ObjectId(user_id), {})
+        for field, amount in inc_fields.items():
+            fields[field] = fields.get(field, 0) + amount
+        self._wake()
+
+    def insert_replay(self, doc: dict):
+        """
+        Queue a replay document. It is given its `_id` now, so a retried insert can't duplicate it.
+        An empty `player_names` is filled in by the worker.
+        """
+        doc.setdefault("_id", ObjectId())
+        self.replay_docs.append(doc)
+        self._wake()
+
+    def pending(self) -> int:
+        return len(self.stats) + len(self.replay_docs)
+
+    def _wake(self):
+        self.idle.clear()
+        self.wakeup.set()
+        if self.task is None and not self.closed:
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            await asyncio.sleep(self.delay)
+            self.wakeup.clear()
+            try:
+                await self._write_pending()
+            except Exception as e:
+                print(f"Persistence worker error: {e}")
+                traceback.print_exc()
+            if not self.pending():
+                self.idle.set()
+
+    async def _write_pending(self):
+        stats, self.stats = self.stats, {}
+        replay_docs, self.replay_docs = self.replay_docs, []
+        self.batches += 1
+        await asyncio.gather(self._write_stats(stats), self._write_replays(replay_docs))
+
+    async def _write_stats(self, stats: dict[ObjectId, dict[str, int]]):
+        batch_id = ObjectId()
+        ops = [
+            UpdateOne({"_id": user_id, "stat_batches": {"$ne": batch_id}}, inc_stats_pipeline(fields, batch_id))
+            for user_id, fields in stats.items()
+        ]
+        for attempt in range(self.max_retries + 1):
+            if not ops:
+                break
+            try:
+                await self.users.bulk_write(ops, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                # Unordered: everything but the reported ops was applied
+                failed = [ops[error["index"]] for error in e.details["writeErrors"]]
+                print(f"Failed to write stats for {len(failed)} users: {e.details['writeErrors'][0]['errmsg']}")
+            except Exception as e:
+                # Some may have been applied; the batch id keeps them from applying twice
+                failed = ops
+                print(f"Failed to write stats for {len(failed)} users: {e}")
+            self.writes += len(ops) - len(failed)
+            ops = failed
+            if ops and attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5))
+        for op in ops:
+            self.failures += 1
+            print(f"Dropping stats update after {self.max_retries} retries: {op}")
+        for user_id in stats:
+            user_cache.invalidate(user_id, publish=True)
+
+    async def _name_players(self, docs: list[dict]):
+        """
+        Fill in `player_names` on replays queued without it, with one user
+        lookup for the whole batch (usually cached). A player whose name
+        can't be found is listed by id.
+        """
+        user_ids = list({pid for doc in docs if not doc.get("player_names") for pid in doc["players"]})
+        if not user_ids:
+            return
+        try:
+            users = await user_cache.get_many(user_ids)
+        except Exception as e:
+            print(f"Failed to look up player names for {len(docs)} replays: {e}")
+            users = [None] * len(user_ids)
+        names = {pid: user["name"] for pid, user in zip(user_ids, users) if user and user.get("name")}
+        for doc in docs:
+            if not doc.get("player_names"):
+                doc["player_names"] = {pid: names.get(pid, str(pid)) for pid in doc["players"]}
+
+    async def _write_replays(self, docs: list[dict]):
+        await self._name_players(docs)
+        for attempt in range(self.max_retries + 1):
+            if not docs:
+                break
+            try:
+                await self.replays.insert_many(docs, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                # A duplicate key means an earlier attempt already inserted it
+                failed = [docs[error["index"]] for error in e.details["writeErrors"] if error["code"] != DUPLICATE_KEY]
+                if failed:
+                    print(f"Failed to save {len(failed)} replays: {e.details['writeErrors'][0]['errmsg']}")
+            except Exception as e:
+                failed = docs
+                print(f"Failed to save {len(failed)} replays: {e}")
+            self.writes += len(docs) - len(failed)
+            docs = failed
+            if docs and attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5))
+        for doc in docs:
+            self.failures += 1
+            print(f"Dropping replay {doc['_id']} after {self.max_retries} retries")
+
+    async def flush(self):
+        """
+        Wait until everything queued so far has been written (or dropped).
+        """
+        if self.pending():
+            self._wake()
+        await self.idle.wait()
+
+    async def close(self):
+        """
+        Flush and stop the worker; called on shutdown.
+        """
+        if self.task is not None:
+            await self.flush()
+            self.task.cancel()
+            self.task = None
+        self.closed = True
+
+    def metrics(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
@@ -0,0 +1,135 @@
+"""
+Keeps a process's active games from growing without bound.
+
+The tracker records when each game was last active (created, restored,
+played or viewed; see `GameTracker.touch`), least recently active first.
+One scheduler task sweeps every REAPER_INTERVAL seconds:
+
+- games idle for longer than GAME_IDLE_TTL are expired: dropped along with
+  their checkpoint, as if deleted;
+- while more than GAME_MAX_ACTIVE games remain, or they hold more than
+  GAME_TURN_BUDGET logged turns between them, the least recently active
+  game is evicted. Either limit is off at 0. These are counts, not bytes:
+  a game's memory is mostly its log, which grows with its turns, but
+  nothing here measures the process. With GAME_ARCHIVE_EVICTED (on by
+  default, needs checkpoints) its checkpoint is archived first, and the
+  game comes back when it is next played or viewed. Archives older than
+  GAME_ARCHIVE_TTL are purged.
+
+Sockets still watching a game that is dropped either way are sent a
+"game_expired" frame and closed first (`GameWebSocketManager.expire`).
+"""
+import asyncio
+import os
+import time
+import traceback
+
+def logged_turns(manager) -> int:
+    return len(manager.game_log.turns)
+
+class GameReaper:
+    def __init__(self, tracker, interval: float = None, idle_ttl: float = None, max_games: int = None, turn_budget: int = None, archive: bool = None, archive_ttl: float = None):
+        self.tracker = tracker
+        self.interval = interval if interval is not None else float(os.environ.get("REAPER_INTERVAL", 60))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.environ.get("GAME_IDLE_TTL", 2 * 60 * 60))
+        self.max_games = max_games if max_games is not None else int(os.environ.get("GAME_MAX_ACTIVE", 3000))
+        self.turn_budget = turn_budget if turn_budget is not None else int(os.environ.get("GAME_TURN_BUDGET", 100_000))
+        self.archive = archive if archive is not None else os.environ.get("GAME_ARCHIVE_EVICTED", "1") == "1"
+        self.archive_ttl = archive_ttl if archive_ttl is not None else float(os.environ.get("GAME_ARCHIVE_TTL", 7 * 24 * 60 * 60))
+        self.task: asyncio.Task = None
+        self.sweeps = 0
+        self.expired = 0
+        self.evicted = 0
+        self.archived = 0
+        self.revived = 0
+        self.purged = 0
+        self.logged_turns = 0
+        self.last_sweep_seconds = 0.0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Game reaper error: {e}")
+                traceback.print_exc()
+
+    async def sweep(self, now: float = None):
+        start = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        tracker = self.tracker
+
+        # Least recently active first, so stop at the first game still in use.
+        # Games with turns queued or running are never dropped
+        expired = []
+        for game_id, last_active in tracker.activity.items():
+            if now - last_active < self.idle_ttl:
+                break
+            if not tracker.games[game_id].actor.busy:
+                expired.append(game_id)
+        for game_id in expired:
+            tracker.websocket_manager.expire(game_id)
+            tracker.delete_game(game_id)
+        self.expired += len(expired)
+
+        games = len(tracker.games)
+        turns = sum(logged_turns(manager) for manager in tracker.games.values())
+        evicted = 0
+        candidates = [game_id for game_id in tracker.activity if not tracker.games[game_id].actor.busy]
+        for game_id in candidates:
+            if not (self.max_games and games > self.max_games) and not (self.turn_budget and turns > self.turn_budget):
+                break
+            archive = self.archive and tracker.checkpoints.archives
+            tracker.websocket_manager.expire(game_id, archived=bool(archive))
+            manager = tracker.unload_game(game_id)
+            games -= 1
+            turns -= logged_turns(manager)
+            if archive:
+                tracker.checkpoints.archive(manager)
+                self.archived += 1
+            else:
+                tracker.checkpoints.remove(game_id)
+            evicted += 1
+        self.evicted += evicted
+        self.logged_turns = turns
+
+        if self.archive:
+            self.purged += await tracker.checkpoints.purge_archived(time.time() - self.archive_ttl)
+        if expired or evicted:
+            print(f"Reaper expired {len(expired)} idle games and evicted {evicted} ({len(tracker.games)} active)")
+        self.sweeps += 1
+        self.last_sweep_seconds = time.perf_counter() - start
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        # Idle: no activity for a sweep interval or more, not yet expired
+        idle = 0
+        for last_active in self.tracker.activity.values():
+            if now - last_active < self.interval:
+                break
+            idle += 1
+        return {
+            "active": len(self.tracker.games),
+            "idle": idle,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "archived": self.archived,
+            "revived": self.revived,
+            "purged_archives": self.purged,
+            "logged_turns": self.logged_turns,
+            "max_games": self.max_games,
+            "turn_budget": self.turn_budget,
+            "idle_ttl": self.idle_ttl,
+            "sweeps": self.sweeps,
+            "last_sweep_ms": self.last_sweep_seconds * 1000,
+        }
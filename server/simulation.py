@@ -0,0 +1,215 @@
+"""
+Headless game simulation: plays complete games against the rules engine with
+no websocket, Mongo or GameManager involved, and spreads batches of games
+across a process pool.
+
+    python -m server.simulation --game vietcong --games 2000
+    python -m server.simulation --game fish --games 2000 --workers 4
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .game import Card, Suit, Transaction, Turn, VietCongGame, FishGame, NullManager, GAME_RULES, GAME_TYPES
+    from .core import TurnModel
+except ImportError:  # Allows running directly from server/
+    from game import Card, Suit, Transaction, Turn, VietCongGame, FishGame, NullManager, GAME_RULES, GAME_TYPES  # type: ignore
+    from core import TurnModel  # type: ignore
+
+# Games the random policy can play to an end; SimpleGame has no end condition
+SIMULATED_GAMES = {"vietcong": VietCongGame, "fish": FishGame}
+
+# Players
+
+class RandomPlayer:
+    """
+    Picks uniformly among the moves it knows to be legal for the seat.
+    """
+    def __init__(self, rng: random.Random, claim_accuracy: float = 0.8):
+        self.rng = rng
+        self.claim_accuracy = claim_accuracy
+
+    def next_turn(self, game, player_id: str) -> Turn:
+        if isinstance(game, VietCongGame):
+            return self._vietcong_turn(game, player_id)
+        if isinstance(game, FishGame):
+            return self._fish_turn(game, player_id)
+        raise TypeError(f"no random policy for {type(game).__name__}")
+
+    def _vietcong_turn(self, game: VietCongGame, player_id: str) -> Turn:
+        plays = list(game.legal_plays())
+        three_of_spades = Card(3, Suit.SPADE)
+        if game.belongs_to[three_of_spades] != "pile":
+            plays = [cards for cards in plays if three_of_spades in cards]
+        can_pass = game.current_combo_type != VietCongGame.Combo.NONE
+        choice = self.rng.randrange(len(plays) + can_pass)
+        if choice == len(plays):
+            return Turn(player_id, 1, [])
+        return Turn(player_id, 0, [Transaction(card, player_id, "pile") for card in plays[choice]])
+
+    def _fish_turn(self, game: FishGame, player_id: str) -> Turn:
+        team = game.player_status[player_id]
+        teammates = [player for player in game.players if game.player_status[player] == team]
+
+        # Finish a claim in progress
+        if game.status == 2:
+            transactions = []
+            for card in game.options_owner.get_cards():
+                holder = game.belongs_to[card]
+                if holder not in teammates or self.rng.random() > self.claim_accuracy:
+                    holder = self.rng.choice(teammates)
+                transactions.append(Transaction(card, holder, f"suits_{team}"))
+            return Turn(player_id, 1, transactions)
+
+        # Claim a half suit the team holds in full
+        for half_suit in game.unclaimed_half_suits():
+            if all(game.belongs_to[card] in teammates for card in game.half_suit_cards(half_suit)):
+                return self._claim(game, player_id, half_suit)
+
+        if game.owners[player_id].is_empty():
+            holders = [player for player in teammates if not game.owners[player].is_empty()]
+            if holders:
+                return Turn(player_id, 2, [Transaction(game.owners[holders[0]].get_cards()[0], self.rng.choice(holders), player_id)])
+            return self._claim(game, player_id, self.rng.choice(game.unclaimed_half_suits()))
+
+        options = game.options_owner.get_cards()
+        opponents = [player for player in game.players if game.player_status[player] != team and not game.owners[player].is_empty()]
+        if not options or not opponents:
+            return self._claim(game, player_id, self.rng.choice(sorted(game.owner_half_suits[player_id], key=lambda half_suit: half_suit.value)))
+        return Turn(player_id, 0, [Transaction(self.rng.choice(options), self.rng.choice(opponents), player_id)])
+
+    def _claim(self, game: FishGame, player_id: str, half_suit) -> Turn:
+        card = game.half_suit_cards(half_suit)[0]
+        return Turn(player_id, 1, [Transaction(card, player_id, player_id)])
+
+class ScriptedPlayer:
+    """
+    Replays a fixed sequence of turns, regardless of seat. Share one instance
+    across seats to replay a whole game.
+    """
+    def __init__(self, turns):
+        self.turns = iter(turns)
+
+    def next_turn(self, game, player_id: str) -> Turn:
+        turn = next(self.turns, None)
+        if turn is None:
+            return None
+        if isinstance(turn, TurnModel):
+            return Turn.from_model(turn)
+        return turn
+
+# Driver
+
+class GameStats:
+    def __init__(self):
+        self.games = 0
+        self.finished = 0
+        self.turns = 0
+        self.rejected = 0
+        self.phases = {"setup": 0.0, "decide": 0.0, "apply": 0.0}
+
+    def merge(self, other: "GameStats"):
+        self.games += other.games
+        self.finished += other.finished
+        self.turns += other.turns
+        self.rejected += other.rejected
+        for phase, seconds in other.phases.items():
+            self.phases[phase] += seconds
+
+async def play_game(game_type: str, players: list[str], seats: list, manager: NullManager = None, max_turns: int = 5000, stats: GameStats = None, seed: int = None):
+    """
+    Play one game to completion. `seats` holds one player policy per seat
+    (anything with `next_turn(game, player_id)`). Returns the game.
+    """
+    stats = stats or GameStats()
+    manager = manager or NullManager()
+    policies = dict(zip(players, seats))
+
+    start = time.perf_counter()
+    game = GAME_TYPES[game_type](manager, players, seed)
+    game.log_state()
+    decided = time.perf_counter()
+    stats.phases["setup"] += decided - start
+
+    for _ in range(max_turns):
+        if game.status == 1 or manager.results is not None:
+            break
+        player_id = game.players[game.current_player]
+        turn = policies[player_id].next_turn(game, player_id)
+        applied = time.perf_counter()
+        stats.phases["decide"] += applied - decided
+        if turn is None:
+            break
+        accepted = await game.play_turn(turn)
+        decided = time.perf_counter()
+        stats.phases["apply"] += decided - applied
+        stats.turns += 1
+        stats.rejected += not accepted
+
+    stats.games += 1
+    stats.finished += manager.results is not None
+    return game
+
+def _run_batch(game_type: str, games: int, seed: int, max_turns: int, quiet: bool) -> GameStats:
+    stats = GameStats()
+    players = [f"{i:024x}" for i in range(GAME_RULES[game_type]["max_players"])]
+
+    async def run():
+        for game_seed in range(seed, seed + games):
+            rng = random.Random(game_seed)
+            await play_game(game_type, players, [RandomPlayer(rng)]*len(players), max_turns=max_turns, stats=stats, seed=game_seed)
+
+    if quiet:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            asyncio.run(run())
+    else:
+        asyncio.run(run())
+    return stats
+
+def run_simulation(game_type: str, games: int, workers: int = None, seed: int = 0, max_turns: int = 5000, quiet: bool = True):
+    """
+    Play `games` random games split across `workers` processes. Returns
+    (GameStats, wall seconds).
+    """
+    if game_type not in SIMULATED_GAMES:
+        raise ValueError(f"can't simulate {game_type!r} games; choose from {sorted(SIMULATED_GAMES)}")
+    workers = workers or os.cpu_count() or 1
+    batch_sizes = [games // workers + (i < games % workers) for i in range(workers)]
+    starts = [seed + sum(batch_sizes[:i]) for i in range(workers)]
+
+    start = time.perf_counter()
+    total = GameStats()
+    if workers == 1:
+        total.merge(_run_batch(game_type, games, seed, max_turns, quiet))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_batch, game_type, size, batch_seed, max_turns, quiet) for size, batch_seed in zip(batch_sizes, starts) if size]
+            for future in futures:
+                total.merge(future.result())
+    return total, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(SIMULATED_GAMES), default="vietcong")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=5000, help="turn cap per game")
+    parser.add_argument("--verbose", action="store_true", help="keep the engine's prints")
+    args = parser.parse_args()
+
+    stats, wall = run_simulation(args.game, args.games, args.workers, args.seed, args.max_turns, not args.verbose)
+    print(f"{stats.games} {args.game} games ({stats.finished} finished) in {wall:.2f}s")
+    print(f"  {stats.games / wall:10.1f} games/sec")
+    print(f"  {stats.turns / wall:10.1f} turns/sec ({stats.turns} turns, {stats.rejected} rejected)")
+    cpu = sum(stats.phases.values())
+    for phase, seconds in stats.phases.items():
+        print(f"  {phase:>8} {seconds:8.2f}s cpu  {seconds / cpu * 100:5.1f}%")
+
+if __name__ == "__main__":
+    main()
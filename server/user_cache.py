@@ -0,0 +1,170 @@
+"""
+In-process cache of user documents, looked up by `_id`, `name` or
+`firebase_uid`. Entries expire after a TTL and the least recently used are
+evicted past `max_size`; every writer of a user document invalidates it,
+here and (through `publishers`) in every other worker's cache.
+
+Misses by `_id` are coalesced DataLoader-style: every id requested in the
+same event-loop tick is fetched with one `$in` query, and a request for an
+id that is already being fetched waits on that fetch instead.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from bson import ObjectId
+
+try:
+    from .core import user_collection
+except ImportError:  # Allows running directly from server/
+    from core import user_collection  # type: ignore
+
+class UserCache:
+    def __init__(self, collection=user_collection, max_size: int = None, ttl: float = None):
+        self.collection = collection
+        self.max_size = max_size or int(os.environ.get("USER_CACHE_SIZE", 10000))
+        self.ttl = ttl or float(os.environ.get("USER_CACHE_TTL", 60))
+        self.entries: OrderedDict[ObjectId, tuple[float, dict]] = OrderedDict() # id -> (expiry, document), LRU first
+        self.by_name: dict[str, ObjectId] = {}
+        self.by_firebase_uid: dict[str, ObjectId] = {}
+        self.in_flight: dict[ObjectId, asyncio.Future] = {} # ids being fetched or queued for the next batch
+        self.queued: dict[ObjectId, asyncio.Future] = {}
+        self.publishers = [] # called with the id of each user written by this process
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.batches = 0
+
+    def _cached(self, user_id: ObjectId) -> dict:
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        expires, doc = entry
+        if expires < time.monotonic():
+            self.invalidate(user_id)
+            return None
+        self.entries.move_to_end(user_id)
+        return doc
+
+    def _lookup(self, user_id: ObjectId) -> dict:
+        doc = None if user_id is None else self._cached(user_id)
+        if doc is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return doc
+
+    async def get(self, user_id) -> dict:
+        """
+        The user document with this `_id`, or None.
+        """
+        user_id = ObjectId(user_id)
+        doc = self._lookup(user_id)
+        if doc is None:
+            # Shielded: the fetch is shared, so one caller giving up must not cancel it for the rest
+            doc = await asyncio.shield(self._load(user_id))
+        return doc
+
+    async def get_many(self, user_ids) -> list[dict]:
+        """
+        The user documents for these ids, in order; None where there is no such user.
+        """
+        return await asyncio.gather(*(self.get(user_id) for user_id in user_ids))
+
+    async def get_by_name(self, name: str) -> dict:
+        doc = self._lookup(self.by_name.get(name))
+        if doc is None:
+            doc = self.put(await self.collection.find_one({"name": name}))
+        return doc
+
+    async def get_by_firebase_uid(self, firebase_uid: str) -> dict:
+        doc = self._lookup(self.by_firebase_uid.get(firebase_uid))
+        if doc is None:
+            doc = self.put(await self.collection.find_one({"firebase_uid": firebase_uid}))
+        return doc
+
+    def _load(self, user_id: ObjectId) -> asyncio.Future:
+        future = self.in_flight.get(user_id)
+        if future is None:
+            future = self.in_flight[user_id] = asyncio.get_running_loop().create_future()
+            if not self.queued:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            self.queued[user_id] = future
+        return future
+
+    def _dispatch(self):
+        batch, self.queued = self.queued, {}
+        asyncio.create_task(self._fetch(batch))
+
+    async def _fetch(self, batch: dict[ObjectId, asyncio.Future]):
+        self.batches += 1
+        try:
+            docs = await self.collection.find({"_id": {"$in": list(batch)}}).to_list(None)
+        except Exception as e:
+            for user_id, future in batch.items():
+                if self.in_flight.get(user_id) is future:
+                    del self.in_flight[user_id]
+                future.set_exception(e)
+            return
+        found = {doc["_id"]: doc for doc in docs}
+        for user_id, future in batch.items():
+            doc = found.get(user_id)
+            # Invalidated mid-fetch: hand the result to the waiters but don't cache it
+            if self.in_flight.get(user_id) is future:
+                del self.in_flight[user_id]
+                self.put(doc)
+            future.set_result(doc)
+
+    def put(self, doc: dict, publish: bool = False) -> dict:
+        """
+        Cache a freshly read or written user document. Returns it. `publish`
+        after writing it, so other workers drop their copies.
+        """
+        if doc is None:
+            return None
+        user_id = doc["_id"]
+        self.invalidate(user_id, publish)
+        self.entries[user_id] = (time.monotonic() + self.ttl, doc)
+        if doc.get("name"):
+            self.by_name[doc["name"]] = user_id
+        if doc.get("firebase_uid"):
+            self.by_firebase_uid[doc["firebase_uid"]] = user_id
+        while len(self.entries) > self.max_size:
+            self.invalidate(next(iter(self.entries)))
+            self.evictions += 1
+        return doc
+
+    def invalidate(self, user_id, publish: bool = False):
+        """
+        Forget a user, e.g. after their document changed. With `publish`
+        (the change was written here) other workers forget it too.
+        """
+        user_id = ObjectId(user_id)
+        if publish:
+            for publisher in self.publishers:
+                publisher(user_id)
+        self.in_flight.pop(user_id, None)
+        entry = self.entries.pop(user_id, None)
+        if entry is None:
+            return
+        doc = entry[1]
+        if self.by_name.get(doc.get("name")) == doc["_id"]:
+            del self.by_name[doc["name"]]
+        if self.by_firebase_uid.get(doc.get("firebase_uid")) == doc["_id"]:
+            del self.by_firebase_uid[doc["firebase_uid"]]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "batches": self.batches,
+            "in_flight": len(self.in_flight),
+        }
+
+user_cache = UserCache()
@@ -0,0 +1,62 @@
+"""
+Rates derived from a user's stat counters (fish win and claim rate, VietCong
+score rate), stored on the user document so searches can filter and sort on
+them with an index. Counters are only ever changed through
+`inc_stats_pipeline`, which recomputes the rates in the same atomic update.
+"""
+
+VIETCONG_PLACE_WEIGHTS = {"first": 1.0, "second": 0.6, "third": 0.3}
+STAT_BATCHES_KEPT = 16 # ids of the latest stat batches kept on a user, see inc_stats_pipeline
+
+def _value(path: str) -> dict:
+    return {"$ifNull": [f"${path}", 0]}
+
+def _ratio(numerator, denominator) -> dict:
+    return {"$cond": [{"$gt": [denominator, 0]}, {"$divide": [numerator, denominator]}, 0]}
+
+# Aggregation expressions for every derived field, by path
+RATE_FIELDS = {
+    "stats.fish.win_rate": _ratio(_value("stats.fish.wins"), _value("stats.fish.games")),
+    "stats.fish.claim_rate": _ratio(_value("stats.fish.successful_claims"), _value("stats.fish.claims")),
+    "stats.vietcong.score_rate": _ratio(
+        {"$add": [{"$multiply": [_value(f"stats.vietcong.place_finishes.{place}"), weight]} for place, weight in VIETCONG_PLACE_WEIGHTS.items()]},
+        _value("stats.vietcong.games"),
+    ),
+}
+
+# Sorts offered by the user search: name -> (field, direction). Each is paired
+# with `_id` as a tiebreak for keyset paging and has an index to match.
+SEARCH_SORTS = {
+    "name": ("name_lower", 1),
+    "fish_games": ("stats.fish.games", -1),
+    "fish_win_rate": ("stats.fish.win_rate", -1),
+    "claims": ("stats.fish.claims", -1),
+    "claim_rate": ("stats.fish.claim_rate", -1),
+    "vietcong_games": ("stats.vietcong.games", -1),
+    "vietcong_score_rate": ("stats.vietcong.score_rate", -1),
+}
+
+# Lowercased name for case-insensitive, index-backed prefix search; unset while the user has no name
+NAME_LOWER = {"$cond": [{"$eq": [{"$type": "$name"}, "string"]}, {"$toLower": "$name"}, "$$REMOVE"]}
+
+def inc_stats_pipeline(inc_fields: dict, batch_id=None) -> list[dict]:
+    """
+    Update pipeline that `$inc`s `inc_fields` and then recomputes the rates.
+    A `batch_id` is also recorded in the user's `stat_batches` (the latest
+    STAT_BATCHES_KEPT of them), so an update filtered on
+    `{"stat_batches": {"$ne": batch_id}}` applies at most once however often
+    it is retried.
+    """
+    fields = {field: {"$add": [_value(field), amount]} for field, amount in inc_fields.items()}
+    if batch_id is not None:
+        fields["stat_batches"] = {"$slice": [{"$concatArrays": [{"$ifNull": ["$stat_batches", []]}, [batch_id]]}, -STAT_BATCHES_KEPT]}
+    return [
+        {"$set": fields},
+        {"$set": RATE_FIELDS},
+    ]
+
+def rebuild_pipeline() -> list[dict]:
+    """
+    Update pipeline that recomputes every derived field from the counters.
+    """
+    return [{"$set": {**RATE_FIELDS, "name_lower": NAME_LOWER}}]
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Body, HTTPException, status, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, Body, HTTPException, status, WebSocket, WebSocketDisconnect, Depends, Query, Header
 from bson import ObjectId
 import re
+import json
+import base64
 from pymongo import ReturnDocument
 import time
 import asyncio
-from typing import List
+from typing import List, Optional
 from starlette.websockets import WebSocketState
 
 try:
     from .game_manager import GameTracker, get_tracker
+    from .user_cache import user_cache
+    from .auth import InvalidToken, authenticate, token_verifier
+    from .user_stats import SEARCH_SORTS
     from .core import (
         user_collection,
         game_collection,
@@ -28,10 +33,16 @@ try:
         ReplayModel,
         ReplayCollectionModel,
         UserSearchModel,
+        GameStateModel,
+        LeaderboardModel,
+        LeaderboardEntryModel,
     )
-    from .game import Card, Transaction, Turn, GAME_RULES
+    from .game import Card, Transaction, Turn, GAME_RULES, replay_game_states
 except ImportError:  # Allows running directly from server/
     from game_manager import GameTracker, get_tracker  # type: ignore
+    from user_cache import user_cache  # type: ignore
+    from auth import InvalidToken, authenticate, token_verifier  # type: ignore
+    from user_stats import SEARCH_SORTS  # type: ignore
     from core import (  # type: ignore
         user_collection,
         game_collection,
@@ -51,8 +62,11 @@ except ImportError:  # Allows running directly from server/
         ReplayModel,
         ReplayCollectionModel,
         UserSearchModel,
+        GameStateModel,
+        LeaderboardModel,
+        LeaderboardEntryModel,
     )
-    from game import Card, Transaction, Turn, GAME_RULES  # type: ignore
+    from game import Card, Transaction, Turn, GAME_RULES, replay_game_states  # type: ignore
 
 router = APIRouter()
 
@@ -66,7 +80,7 @@ router = APIRouter()
     response_model_by_alias=False,
 )
 async def initialize_user(payload: FirebaseUserRegistrationRequest = Body(...)):
-    existing_user = await user_collection.find_one({"firebase_uid": payload.firebase_uid})
+    existing_user = await user_cache.get_by_firebase_uid(payload.firebase_uid)
     if existing_user:
         return UserModel(**existing_user)
 
@@ -76,7 +90,7 @@ async def initialize_user(payload: FirebaseUserRegistrationRequest = Body(...)):
 
 
     insert_result = await user_collection.insert_one(new_user_data)
-    created_user = await user_collection.find_one({"_id": insert_result.inserted_id})
+    created_user = await user_cache.get(insert_result.inserted_id)
     if not created_user:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create user.")
     
@@ -95,7 +109,7 @@ async def check_username_availability(username: str):
     if not re.match(r"^[a-zA-Z0-9_]{3,20}$", username):
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username format invalid. Must be 3-20 alphanumeric characters or underscores.")
 
-    existing_user = await user_collection.find_one({"name": username})
+    existing_user = await user_cache.get_by_name(username)
     if existing_user:
         return CheckUsernameResponse(is_available=False)
     return CheckUsernameResponse(is_available=True)
@@ -126,6 +140,7 @@ async def complete_registration(payload: CompleteRegistrationRequest = Body(...)
         
     updated_user_data = {
         "name": payload.username,
+        "name_lower": payload.username.lower(),
         "username_set": True
     }
     
@@ -138,7 +153,7 @@ async def complete_registration(payload: CompleteRegistrationRequest = Body(...)
     if not result:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update user.")
     
-    return result
+    return user_cache.put(result, publish=True)
 
 @router.post(
     "/users/",
@@ -164,11 +179,11 @@ async def create_user(user: UserModel = Body(...)):
         user.username_set = False
 
     new_user_doc_data = user.model_dump(by_alias=True, exclude={"id"})
+    if user.name:
+        new_user_doc_data["name_lower"] = user.name.lower()
 
     insert_result = await user_collection.insert_one(new_user_doc_data)
-    created_user = await user_collection.find_one(
-        {"_id": insert_result.inserted_id}
-    )
+    created_user = await user_cache.get(insert_result.inserted_id)
     if not created_user:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create and retrieve user.")
     return created_user
@@ -198,7 +213,7 @@ async def get_user_name(name: str):
     Get the record for a specific user, looked up by 'name'
     """
     if(
-        user := await user_collection.find_one({"name": name})
+        user := await user_cache.get_by_name(name)
     ) is not None:
         return user
     
@@ -223,7 +238,7 @@ async def update_user(id: str, user_update_payload: UpdateUserModel = Body(...))
 
     if not update_data:
         # No actual updates provided, try to return existing user or 404
-        existing_user = await user_collection.find_one({"_id": ObjectId(id)})
+        existing_user = await user_cache.get(id)
         if existing_user:
             return existing_user
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {id} not found.")
@@ -240,6 +255,7 @@ async def update_user(id: str, user_update_payload: UpdateUserModel = Body(...))
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Username '{new_name}' already taken.")
         # If name is being set/updated, imply username_set is true for this user.
         update_data["username_set"] = True 
+        update_data["name_lower"] = new_name.lower()
 
     updated_user_doc = await user_collection.find_one_and_update(
         {"_id": ObjectId(id)},
@@ -248,7 +264,7 @@ async def update_user(id: str, user_update_payload: UpdateUserModel = Body(...))
     )
     
     if updated_user_doc is not None:
-        return updated_user_doc
+        return user_cache.put(updated_user_doc, publish=True)
     else:
         # If find_one_and_update returns None, it means the document with 'id' was not found
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {id} not found during update attempt.")
@@ -263,10 +279,21 @@ async def delete_user(id: str):
     Delete a single user. 
     """
     delete_result = await user_collection.delete_one({"_id": ObjectId(id)})
+    user_cache.invalidate(id, publish=True)
 
     if delete_result.deleted_count == 0:
         raise HTTPException(status_code=404, detail=f"User {id} not found")
 
+@router.get(
+    "/users/cache/stats",
+    response_description="Get user cache statistics",
+)
+async def get_user_cache_stats():
+    """
+    Size, hit/miss counts and evictions of the in-process user cache.
+    """
+    return user_cache.stats()
+
 # Games
 
 @router.get(
@@ -275,16 +302,11 @@ async def delete_user(id: str):
     response_model=GameCollection,
     response_model_by_alias=False,
 )
-async def list_games():
+async def list_games(tracker: GameTracker = Depends(get_tracker)):
     """
-    List all games in the database (max 1000).
+    List all open games (max 1000).
     """
-    games_docs = await game_collection.find().to_list(1000)
-    # Convert raw MongoDB documents to GameModel instances for proper serialization
-    games_models = []
-    for game_doc in games_docs:
-        game_model = GameModel(**game_doc)
-        games_models.append(game_model)
+    games_models = [GameModel(**game_doc) for game_doc in tracker.waiting_rooms.list(1000)]
     return GameCollection(games=games_models)
 
 @router.post(
@@ -297,35 +319,23 @@ async def create_game(game: GameCreateModel, tracker: GameTracker = Depends(get_
     """
     Create a new game.
     """
-    game_dict = game.dict()
-    game_dict["players"] = []
-    
-    result = await game_collection.insert_one(game_dict)
-    new_game = await game_collection.find_one({"_id": result.inserted_id})
-    # Convert to GameModel to ensure proper ObjectId serialization
-    game_model = GameModel(**new_game)
-    
-    # Broadcast to lobby that a new game was created
-    await tracker.lobby_websocket_manager.broadcast("lobby", {})
-    
-    return game_model.model_dump(by_alias=True)
+    # The registry notifies the lobby
+    new_game = await tracker.open_game(game.name, game.type)
+    return tracker.waiting_rooms.serialize(new_game)
 
 @router.get("/games/{game_id}/get_game",
              response_description="Get game by ID",
     response_model=GameModel,
     response_model_by_alias=False,
 )
-async def get_game_by_id(game_id: str):
+async def get_game_by_id(game_id: str, tracker: GameTracker = Depends(get_tracker)):
     """
-    Get a game by its ID.
+    Get an open game by its ID.
     """
-    game = await game_collection.find_one({"_id": ObjectId(game_id)})
-    print(game)
+    game = tracker.waiting_rooms.get(game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    # Convert to GameModel to ensure proper ObjectId serialization
-    game_model = GameModel(**game)
-    return game_model.model_dump(by_alias=True)
+    return tracker.waiting_rooms.serialize(game)
 
 @router.patch(
     "/games/{game_id}/add_user/{user_id}",
@@ -337,31 +347,23 @@ async def add_user_to_game(game_id: str, user_id: str, tracker: GameTracker = De
     """
     Add a user to the game's players list.
     """
-    game = await game_collection.find_one({"_id": ObjectId(game_id)})
+    game = tracker.waiting_rooms.get(game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    
-    if ObjectId(user_id) in game["players"]:
-        raise HTTPException(status_code=400, detail="User already in game")
-    
-    if len(game["players"]) >= GAME_RULES[game["type"]]["max_players"]:
-        raise HTTPException(status_code=400, detail="Game is already full")
 
-    await game_collection.update_one(
-        {"_id": ObjectId(game_id)},
-        {"$addToSet": {"players": ObjectId(user_id)}}
-    )
-    updated_game = await game_collection.find_one({"_id": ObjectId(game_id)})
-    # Convert to GameModel to ensure proper ObjectId serialization
-    game_model = GameModel(**updated_game)
+    try:
+        updated_game = await tracker.add_player(game_id, user_id, GAME_RULES[game["type"]]["max_players"])
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Game not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    game_data = tracker.waiting_rooms.serialize(updated_game)
     
     # Broadcast the updated game data to all waiting room clients for this game
-    await tracker.waiting_websocket_manager.broadcast(game_id, game_model.model_dump(by_alias=True))
-    
-    # Also broadcast to lobby to update player counts
-    await tracker.lobby_websocket_manager.broadcast("lobby", {})
+    # (the registry updates the lobby's player counts)
+    await tracker.waiting_websocket_manager.broadcast(game_id, game_data)
     
-    return game_model.model_dump(by_alias=True)
+    return game_data
 
 
 @router.patch(
@@ -374,28 +376,23 @@ async def remove_user_from_game(game_id: str, user_id: str, tracker: GameTracker
     """
     Remove a user from the game's players list.
     """
-    game = await game_collection.find_one({"_id": ObjectId(game_id)})
+    game = tracker.waiting_rooms.get(game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
 
-    if ObjectId(user_id) not in game["players"]:
-        raise HTTPException(status_code=400, detail="User not in game")
-
-    await game_collection.update_one(
-        {"_id": ObjectId(game_id)},
-        {"$pull": {"players": ObjectId(user_id)}}
-    )
-    updated_game = await game_collection.find_one({"_id": ObjectId(game_id)})
-    # Convert to GameModel to ensure proper ObjectId serialization
-    game_model = GameModel(**updated_game)
+    try:
+        updated_game = await tracker.remove_player(game_id, user_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Game not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    game_data = tracker.waiting_rooms.serialize(updated_game)
     
     # Broadcast the updated game data to all waiting room clients for this game
-    await tracker.waiting_websocket_manager.broadcast(game_id, game_model.model_dump(by_alias=True))
+    # (the registry updates the lobby's player counts)
+    await tracker.waiting_websocket_manager.broadcast(game_id, game_data)
     
-    # Also broadcast to lobby to update player counts
-    await tracker.lobby_websocket_manager.broadcast("lobby", {})
-    
-    return game_model.model_dump(by_alias=True)
+    return game_data
 
 @router.patch(
     "/games/{game_id}/start",
@@ -406,12 +403,12 @@ async def start_game(game_id: str, tracker: GameTracker = Depends(get_tracker)):
     """
     Start game by ID
     """
-    game = await game_collection.find_one({"_id": ObjectId(game_id)})
-    if not game:
+    try:
+        game = await tracker.start_game(game_id)
+    except KeyError:
         raise HTTPException(status_code=404, detail="Game not found")
-
-    if len(game["players"]) != GAME_RULES[game["type"]]["max_players"]:
-        raise HTTPException(status_code=400, detail="Game not full yet")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Notify all waiting room users that the game is starting
     game_started_message = {
@@ -421,28 +418,30 @@ async def start_game(game_id: str, tracker: GameTracker = Depends(get_tracker)):
         "name": game["name"]
     }
     await tracker.waiting_websocket_manager.broadcast(game_id, game_started_message)
-    
-    tracker.create_game(game_id, game["name"], game["type"], list(map(str,game["players"])))
-
-    await game_collection.delete_one({"_id": ObjectId(game_id)})
-    
-    # Broadcast to lobby that a game was started (removed from available games)
-    await tracker.lobby_websocket_manager.broadcast("lobby", {})
 
 @router.patch(
     "/games/{game_id}/play",
     response_description="Play turn",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-async def play_turn(game_id: str, turn: TurnModel = Body(...), tracker: GameTracker = Depends(get_tracker)):
+async def play_turn(game_id: str, turn: TurnModel = Body(...), authorization: Optional[str] = Header(None), tracker: GameTracker = Depends(get_tracker)):
     """
-    Play a turn in an ongoing game by ID
+    Play a turn in an ongoing game by ID, as the user whose Firebase ID
+    token is sent as `Authorization: Bearer <token>`
     """
-
-    if game_id not in tracker.get_active_games():
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        user_id = await authenticate(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    if turn.player != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not seated as this player")
+    try:
+        success = await tracker.play_turn(game_id, turn)
+    except KeyError:
         raise HTTPException(status_code=400, detail="Game not started or no active manager")
-    
-    success = await tracker.play_turn(game_id, turn)
     if not success:
         raise HTTPException(status_code=400, detail="Invalid turn or game state")
     
@@ -456,14 +455,9 @@ async def delete_all_games(tracker: GameTracker = Depends(get_tracker)):
     Delete all games from both the database and active games in memory.
     """
     try:
-        # Get all games from the database first
-        all_games = await game_collection.find().to_list(1000)
-        print(f"Found {len(all_games)} games in database")
-        
-        # Delete each game individually from the database
-        for game in all_games:
-            await game_collection.delete_one({"_id": game["_id"]})
-        print(f"Deleted {len(all_games)} games from database")
+        # Delete every open game from the registry and the database
+        deleted = await tracker.waiting_rooms.clear()
+        print(f"Deleted {deleted} games from database")
         
         # Delete all active games from the tracker
         active_game_ids = list(tracker.games.keys())
@@ -485,13 +479,9 @@ async def delete_all_games(tracker: GameTracker = Depends(get_tracker)):
 )
 async def delete_game(game_id: str, tracker: GameTracker = Depends(get_tracker)):
     """
-    Delete a game from the database.
+    Delete an open game.
     """
-    delete_result = await game_collection.delete_one({"_id": ObjectId(game_id)})
-
-    if delete_result.deleted_count == 1:
-        # Broadcast to lobby that a game was deleted
-        await tracker.lobby_websocket_manager.broadcast("lobby", {})
+    if await tracker.close_game(game_id):
         return {}
 
     raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
@@ -499,12 +489,35 @@ async def delete_game(game_id: str, tracker: GameTracker = Depends(get_tracker))
 # WebSocket
 
 @router.websocket("/game/ws/{game_id}")
-async def game_ws(websocket: WebSocket, game_id: str,tracker: GameTracker = Depends(get_tracker)):
-    await tracker.websocket_manager.connect(game_id, websocket)
+async def game_ws(websocket: WebSocket, game_id: str, token: Optional[str] = None, tracker: GameTracker = Depends(get_tracker)):
+    # Players pass their Firebase ID token to see their own hand and play
+    # their turns; everyone else spectates. A token that doesn't verify is
+    # refused rather than quietly seated as a spectator
+    user_id = None
+    if token:
+        try:
+            user_id = await authenticate(token)
+        except InvalidToken as e:
+            print(f"Refusing game websocket: {e}")
+            await websocket.close(code=1008)
+            return
+        except Exception as e:
+            print(f"Error verifying game websocket token: {e}")
+            await websocket.close(code=1013)
+            return
+    await tracker.websocket_manager.connect(game_id, websocket, user_id)
     try:
-        while True:
-            await asyncio.sleep(60)
+        # The server closes sockets it gives up on (see SocketSender.close)
+        while websocket.client_state == WebSocketState.CONNECTED and websocket.application_state == WebSocketState.CONNECTED:
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError):
+                # Not JSON (or a binary frame)
+                continue
+            await tracker.websocket_manager.handle_message(game_id, websocket, message)
     except WebSocketDisconnect:
+        pass
+    finally:
         tracker.websocket_manager.disconnect(game_id, websocket)
 
 # For waiting room
@@ -530,7 +543,7 @@ async def lobby_ws(websocket: WebSocket, tracker: GameTracker = Depends(get_trac
             # Listen for incoming messages for pagination requests
             try:
                 # Check if websocket is still connected before trying to receive
-                if websocket.client_state != WebSocketState.CONNECTED:
+                if websocket.client_state != WebSocketState.CONNECTED or websocket.application_state != WebSocketState.CONNECTED:
                     break
                     
                 message = await websocket.receive_json()
@@ -563,6 +576,79 @@ async def get_active_games(tracker: GameTracker = Depends(get_tracker)):
     """
     return tracker.get_active_games()
 
+@router.get(
+    "/games/sockets/metrics",
+    response_description="Get websocket send queue metrics",
+)
+async def get_game_socket_metrics(tracker: GameTracker = Depends(get_tracker)):
+    """
+    Queue depth, drops and send latency of the game, waiting room and lobby
+    sockets, and how many game socket tokens were verified or refused
+    """
+    return {**tracker.hub.metrics(), "auth": token_verifier.metrics()}
+
+@router.get(
+    "/games/persistence/metrics",
+    response_description="Get write-behind persistence metrics",
+)
+async def get_persistence_metrics(tracker: GameTracker = Depends(get_tracker)):
+    """
+    Pending writes, batches, retries and dropped writes of the stats/replay queue
+    """
+    return tracker.persistence.metrics()
+
+@router.get(
+    "/games/checkpoints/metrics",
+    response_description="Get active game checkpoint metrics",
+)
+async def get_checkpoint_metrics(tracker: GameTracker = Depends(get_tracker)):
+    """
+    Pending and written checkpoints, and how many games the last startup restored
+    """
+    return tracker.checkpoints.metrics()
+
+@router.get(
+    "/games/reaper/metrics",
+    response_description="Get active game lifecycle metrics",
+)
+async def get_reaper_metrics(tracker: GameTracker = Depends(get_tracker)):
+    """
+    Active and idle games, and how many have been expired, evicted, archived and revived
+    """
+    return tracker.reaper.metrics()
+
+@router.get(
+    "/games/actors/metrics",
+    response_description="Get turn queue metrics",
+)
+async def get_actor_metrics(tracker: GameTracker = Depends(get_tracker)):
+    """
+    Queued turns, and turn wait and service times, over this worker's games
+    """
+    return tracker.actors.metrics([manager.actor for manager in tracker.games.values()])
+
+@router.get(
+    "/games/active/{game_id}/actor",
+    response_description="Get an active game's turn queue metrics",
+)
+async def get_game_actor_metrics(game_id: str, tracker: GameTracker = Depends(get_tracker)):
+    """
+    Queue depth and turn service times of one of this worker's games
+    """
+    if game_id not in tracker.games:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return tracker.games[game_id].actor.metrics()
+
+@router.get(
+    "/games/cluster/metrics",
+    response_description="Get cluster metrics",
+)
+async def get_cluster_metrics(tracker: GameTracker = Depends(get_tracker)):
+    """
+    This worker's id and the calls and events it has exchanged with the others
+    """
+    return tracker.cluster.metrics()
+
 @router.get(
     "/games/active/{game_id}/debug",
     response_description="Get active game owners",
@@ -580,6 +666,22 @@ async def get_active_game_debug(game_id: str, tracker: GameTracker = Depends(get
             result.append(f"{owner_name}: {card}")
     return result
 
+@router.get(
+    "/games/active/{game_id}/states/{index}",
+    response_description="Get a logged state of an active game",
+    response_model=GameStateModel,
+)
+async def get_active_game_state(game_id: str, index: int, tracker: GameTracker = Depends(get_tracker)):
+    """
+    Materialize one logged state of an active game from its live log
+    """
+    if game_id not in tracker.games:
+        raise HTTPException(status_code=404, detail="Game not found")
+    try:
+        return tracker.games[game_id].game_log.get_state(index)
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 
 # async def get_active_game_debug(game_id: str, tracker: GameTracker = Depends(get_tracker)):
 #     """
@@ -587,6 +689,46 @@ async def get_active_game_debug(game_id: str, tracker: GameTracker = Depends(get
 #     """
 #     return [str(card) for card in list(tracker.game_managers[game_id].game.owners.values())[0].cards]
 
+# Leaderboards
+
+@router.get(
+    "/leaderboards/{board}",
+    response_model=LeaderboardModel,
+    response_description="Get the top players of a leaderboard",
+)
+async def get_leaderboard(board: str, limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0), tracker: GameTracker = Depends(get_tracker)):
+    """
+    A page of `board` (fish_wins, fish_win_rate, fish_claim_accuracy or vietcong_score_rate), best first.
+    """
+    leaderboard = tracker.leaderboards.get(board)
+    if leaderboard is None:
+        raise HTTPException(status_code=404, detail=f"Leaderboard {board} not found")
+
+    entries = leaderboard.top(limit, offset)
+    users = await user_cache.get_many([entry["user_id"] for entry in entries])
+    return LeaderboardModel(
+        board=board,
+        title=leaderboard.title,
+        total=len(leaderboard),
+        entries=[LeaderboardEntryModel(**entry, name=user and user.get("name")) for entry, user in zip(entries, users)],
+    )
+
+@router.get(
+    "/leaderboards/{board}/users/{user_id}",
+    response_model=LeaderboardEntryModel,
+    response_description="Get a player's rank on a leaderboard",
+)
+async def get_leaderboard_rank(board: str, user_id: str, tracker: GameTracker = Depends(get_tracker)):
+    leaderboard = tracker.leaderboards.get(board)
+    if leaderboard is None:
+        raise HTTPException(status_code=404, detail=f"Leaderboard {board} not found")
+
+    entry = leaderboard.rank(user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"User {user_id} is not ranked on {board}")
+    user = await user_cache.get(user_id)
+    return LeaderboardEntryModel(**entry, name=user and user.get("name"))
+
 # DB Query 
 
 @router.get(
@@ -597,11 +739,12 @@ async def get_active_game_debug(game_id: str, tracker: GameTracker = Depends(get
 async def search_replays(filters: ReplaySearchModel = Depends()):
     query = {}
 
+    # Served by the participants_user_timestamp index (see migrations.py)
     if filters.player_id:
         if filters.result_codes:
-            query[f"players.{filters.player_id}"] = {"$in": filters.result_codes}
+            query["participants"] = {"$elemMatch": {"user": filters.player_id, "result": {"$in": filters.result_codes}}}
         else:
-            query[f"players.{filters.player_id}"] = {"$exists": True}
+            query["participants.user"] = filters.player_id
 
     if filters.start_time or filters.end_time:
         query["timestamp"] = {}
@@ -616,8 +759,6 @@ async def search_replays(filters: ReplaySearchModel = Depends()):
     if filters.name:
         query["name"] = filters.name
 
-    results = await replay_collection.find(query).to_list(1000)
-
     projection = {
         "_id": 1,
         "type": 1,
@@ -627,7 +768,7 @@ async def search_replays(filters: ReplaySearchModel = Depends()):
         "timestamp": 1,
     }
 
-    cursor = replay_collection.find(query, projection)
+    cursor = replay_collection.find(query, projection).sort("timestamp", 1)
     results = await cursor.to_list(length=1000)
 
     return ReplayCollectionModel(replays=[ReplaySummaryModel(**doc) for doc in results])
@@ -650,8 +791,49 @@ async def get_replay_by_id(replay_id: str):
     if not replay:
         raise HTTPException(status_code=404, detail="Replay not found.")
 
+    if replay.get("format") == "events":
+        replay["game_states"] = await rebuild_replay_states(replay)
+
     return replay
 
+@router.get(
+    "/replays/{replay_id}/states/{index}",
+    response_model=GameStateModel,
+    response_description="Get a single state of a replay"
+)
+async def get_replay_state(replay_id: str, index: int):
+    """
+    Retrieves one game state of a replay, regenerating it for event replays.
+    """
+    try:
+        obj_id = ObjectId(replay_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid replay ID format.")
+
+    replay = await replay_collection.find_one({"_id": obj_id}, {"players": 0, "player_names": 0})
+    if not replay:
+        raise HTTPException(status_code=404, detail="Replay not found.")
+
+    states = await rebuild_replay_states(replay) if replay.get("format") == "events" else replay.get("game_states", [])
+    if not 0 <= index < len(states):
+        raise HTTPException(status_code=404, detail="Replay state not found.")
+    return states[index]
+
+async def rebuild_replay_states(replay: dict) -> list:
+    """
+    Re-simulate an event replay document into its list of game states.
+    """
+    try:
+        return await replay_game_states(
+            replay["type"],
+            replay["seats"],
+            replay["seed"],
+            [TurnModel(**turn) for turn in replay["turns"]],
+            replay.get("teams"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Replay could not be reconstructed: {e}")
+
 @router.get(
     "/users/search",
     response_model=UserCollectionModel,
@@ -659,61 +841,89 @@ async def get_replay_by_id(replay_id: str):
     summary="Search for users by game statistics and filters",
 )
 async def search_users(filters: UserSearchModel = Depends()):
-    query = {}
+    """
+    Filter and sort on the stored counters and derived rates (see user_stats.py),
+    one page at a time; pass `next_cursor` back as `cursor` for the next page.
+    """
+    if filters.sort not in SEARCH_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SEARCH_SORTS)}")
+    sort_field, direction = SEARCH_SORTS[filters.sort]
+
+    clauses = []
 
     if filters.name:
-        query["name"] = {"$regex": filters.name, "$options": "i"}
+        clauses.append({"name_lower": {"$regex": "^" + re.escape(filters.name.lower())}})
 
     # Filters for fish games
     if filters.min_fish_games is not None:
-        query["stats.fish.games"] = {"$gte": filters.min_fish_games}
+        clauses.append({"stats.fish.games": {"$gte": filters.min_fish_games}})
 
     if filters.min_claims is not None:
-        query["stats.fish.claims"] = {"$gte": filters.min_claims}
+        clauses.append({"stats.fish.claims": {"$gte": filters.min_claims}})
+
+    if filters.min_fish_win_rate is not None:
+        clauses.append({"stats.fish.win_rate": {"$gte": filters.min_fish_win_rate}, "stats.fish.games": {"$gt": 0}})
+
+    if filters.min_claim_rate is not None:
+        clauses.append({"stats.fish.claim_rate": {"$gte": filters.min_claim_rate}, "stats.fish.claims": {"$gt": 0}})
 
     # Filters for vietcong games
     if filters.min_vietcong_games is not None:
-        query["stats.vietcong.games"] = {"$gte": filters.min_vietcong_games}
-
-    users_raw = await user_collection.find(query).to_list(1000)
+        clauses.append({"stats.vietcong.games": {"$gte": filters.min_vietcong_games}})
+
+    if filters.min_vietcong_score_rate is not None:
+        clauses.append({"stats.vietcong.score_rate": {"$gte": filters.min_vietcong_score_rate}})
+
+    if filters.cursor:
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(filters.cursor))
+            last_id = ObjectId(last_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = "$gt" if direction == 1 else "$lt"
+        # Users without the field (null or missing) sort before everyone
+        # else, so they come first ascending and last descending
+        if value is None:
+            later = [{sort_field: {"$ne": None}}] if direction == 1 else []
+        else:
+            later = [{sort_field: {after: value}}] + ([{sort_field: None}] if direction == -1 else [])
+        clauses.append({"$or": [*later, {sort_field: value, "_id": {after: last_id}}]})
 
-    results = []
-    for doc in users_raw:
-        stats = doc.get("stats", {})
-        fish = stats.get("fish", {})
-        viet = stats.get("vietcong", {})
+    cursor = user_collection.find({"$and": clauses} if clauses else {}).sort([(sort_field, direction), ("_id", direction)])
+    docs = await cursor.limit(filters.limit + 1).to_list(filters.limit + 1)
 
-        # Handle fish win rate
-        if filters.min_fish_win_rate is not None:
-            games = fish.get("games", 0)
-            wins = fish.get("wins", 0)
-            if games == 0 or (wins / games) < filters.min_fish_win_rate:
-                continue
+    next_cursor = None
+    if len(docs) > filters.limit:
+        docs = docs[:filters.limit]
+        last = docs[-1]
+        value = last
+        for key in sort_field.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        next_cursor = base64.urlsafe_b64encode(json.dumps([value, str(last["_id"])]).encode()).decode()
 
-        # Handle fish claim rate
-        if filters.min_claim_rate is not None:
-            claims = fish.get("claims", 0)
-            successful = fish.get("successful_claims", 0)
-            if claims == 0 or (successful / claims) < filters.min_claim_rate:
-                continue
+    return UserCollectionModel(users=[UserModel(**doc) for doc in docs], next_cursor=next_cursor)
 
-        # Handle vietcong scoring rate
-        if filters.min_vietcong_score_rate is not None:
-            vc_games = viet.get("games", 0)
-            finishes = viet.get("place_finishes", {})
-            score = (
-                finishes.get("first", 0) * 1.0
-                + finishes.get("second", 0) * 0.6
-                + finishes.get("third", 0) * 0.3
-            )
-            rate = score / vc_games if vc_games else 0
-            if rate < filters.min_vietcong_score_rate:
-                continue
+MAX_BATCH_USERS = 100
 
-        # Convert to UserModel
-        results.append(UserModel(**doc))
+@router.get(
+    "/users/batch",
+    response_description="Get several users by id",
+    response_model=UserCollectionModel,
+    response_model_by_alias=False,
+)
+async def show_users(ids: str):
+    """
+    Get the records for a comma-separated list of user `ids` in one request.
+    Unknown ids are left out; duplicates are returned once.
+    """
+    user_ids = list(dict.fromkeys(user_id for user_id in ids.split(",") if user_id))
+    if len(user_ids) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_USERS} ids per request")
+    if not all(ObjectId.is_valid(user_id) for user_id in user_ids):
+        raise HTTPException(status_code=400, detail="Invalid user id")
 
-    return UserCollectionModel(users=results)
+    users = await user_cache.get_many(user_ids)
+    return UserCollectionModel(users=[user for user in users if user is not None])
 
 @router.get(
     "/users/{id}",
@@ -726,7 +936,7 @@ async def show_user(id: str):
     Get the record for a specific user, looked up by `id`.
     """
     if (
-        user := await user_collection.find_one({"_id": ObjectId(id)})
+        user := await user_cache.get(id)
     ) is not None:
         return user
 
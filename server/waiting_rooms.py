@@ -0,0 +1,174 @@
+"""
+In-process index of the open (not yet started) games shown in the lobby.
+
+The registry is authoritative while the server runs: changes are applied in
+memory first and written through to `game_collection`, which is only read at
+startup. Games are ordered by id, i.e. by creation time, so the lobby pages
+with keyset cursors that stay stable as games come and go.
+"""
+from bisect import bisect_left, bisect_right, insort
+from bson import ObjectId
+
+try:
+    from .core import GameModel, game_collection
+except ImportError:  # Allows running directly from server/
+    from core import GameModel, game_collection  # type: ignore
+
+class WaitingRoomRegistry:
+    def __init__(self, collection=game_collection):
+        self.collection = collection
+        self.games: dict[ObjectId, dict] = {} # id -> game document, as stored in Mongo
+        self.order: list[ObjectId] = [] # ids in creation order
+        self.listeners = [] # called with (event, game document) after every change
+        self.publishers = [] # same, but only for changes made by this process (not `apply`)
+
+    async def load(self):
+        """
+        Replace the registry with the open games stored in Mongo.
+        """
+        docs = await self.collection.find().sort("_id", 1).to_list(None)
+        self.games = {doc["_id"]: doc for doc in docs}
+        self.order = sorted(self.games)
+        print(f"Loaded {len(self.order)} open games")
+
+    def _emit(self, event: str, doc: dict):
+        for listener in self.listeners + self.publishers:
+            listener(event, doc)
+
+    def apply(self, event: str, doc: dict):
+        """
+        Mirror a change another process made (and already wrote to Mongo).
+        """
+        if event == "game_removed":
+            if doc["_id"] not in self.games:
+                return
+            self._delete(doc["_id"])
+        elif doc["_id"] in self.games:
+            self.games[doc["_id"]] = doc
+        else:
+            self._insert(doc)
+        for listener in self.listeners:
+            listener(event, doc)
+
+    @staticmethod
+    def serialize(doc: dict) -> dict:
+        return GameModel(**doc).model_dump(by_alias=True)
+
+    def get(self, game_id: str) -> dict:
+        try:
+            return self.games.get(ObjectId(game_id))
+        except Exception:
+            return None
+
+    def __len__(self):
+        return len(self.order)
+
+    def list(self, limit: int = None) -> list[dict]:
+        return [self.games[game_id] for game_id in self.order[:limit]]
+
+    async def create(self, name: str, game_type: str, game_id: str = None) -> dict:
+        doc = {"_id": ObjectId(game_id), "name": name, "type": game_type, "players": []}
+        self._insert(doc)
+        try:
+            await self.collection.insert_one(doc)
+        except Exception:
+            self._delete(doc["_id"])
+            raise
+        self._emit("game_added", doc)
+        return doc
+
+    async def add_player(self, game_id: str, user_id: str, max_players: int) -> dict:
+        """
+        Seat a user. Raises ValueError if the game is full or they are already in it.
+        """
+        doc = self.games[ObjectId(game_id)]
+        user = ObjectId(user_id)
+        if user in doc["players"]:
+            raise ValueError("User already in game")
+        if len(doc["players"]) >= max_players:
+            raise ValueError("Game is already full")
+        doc["players"].append(user)
+        try:
+            await self.collection.update_one({"_id": doc["_id"]}, {"$addToSet": {"players": user}})
+        except Exception:
+            doc["players"].remove(user)
+            raise
+        self._emit("game_updated", doc)
+        return doc
+
+    async def remove_player(self, game_id: str, user_id: str) -> dict:
+        """
+        Unseat a user. Raises ValueError if they are not in the game.
+        """
+        doc = self.games[ObjectId(game_id)]
+        user = ObjectId(user_id)
+        if user not in doc["players"]:
+            raise ValueError("User not in game")
+        index = doc["players"].index(user)
+        del doc["players"][index]
+        try:
+            await self.collection.update_one({"_id": doc["_id"]}, {"$pull": {"players": user}})
+        except Exception:
+            doc["players"].insert(index, user)
+            raise
+        self._emit("game_updated", doc)
+        return doc
+
+    async def remove(self, game_id: str) -> bool:
+        """
+        Drop a game (started or deleted). Returns False if it is not open.
+        """
+        doc = self.get(game_id)
+        if doc is None:
+            return False
+        self._delete(doc["_id"])
+        await self.collection.delete_one({"_id": doc["_id"]})
+        self._emit("game_removed", doc)
+        return True
+
+    async def clear(self) -> int:
+        docs = self.list()
+        for doc in docs:
+            self._delete(doc["_id"])
+        await self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        for doc in docs:
+            self._emit("game_removed", doc)
+        return len(docs)
+
+    def _insert(self, doc: dict):
+        self.games[doc["_id"]] = doc
+        insort(self.order, doc["_id"])
+
+    def _delete(self, game_id: ObjectId):
+        del self.games[game_id]
+        del self.order[bisect_left(self.order, game_id)]
+
+    def page(self, limit: int, after: str = None, before: str = None, page: int = None) -> dict:
+        """
+        One lobby page: the `limit` games after the `after` cursor, before
+        the `before` cursor, or at page number `page` (default: the first).
+        """
+        if after is not None:
+            start = bisect_right(self.order, ObjectId(after))
+        elif before is not None:
+            start = max(bisect_left(self.order, ObjectId(before)) - limit, 0)
+        else:
+            start = max(page or 0, 0) * limit
+        ids = self.order[start:start + limit]
+        total_games = len(self.order)
+        return {
+            "games": [self.serialize(self.games[game_id]) for game_id in ids],
+            "pagination": {
+                "current_page": -(-start // limit),
+                "total_pages": -(-total_games // limit),
+                "total_games": total_games,
+                "games_per_page": limit,
+                "has_next": start + limit < total_games,
+                "has_previous": start > 0,
+                # Keyset cursors: request {"after": next_cursor} / {"before": prev_cursor};
+                # {"after": start_after} re-fetches this page
+                "next_cursor": str(ids[-1]) if ids and start + limit < total_games else None,
+                "prev_cursor": str(ids[0]) if ids and start > 0 else None,
+                "start_after": str(self.order[start - 1]) if 0 < start <= total_games else None,
+            }
+        }
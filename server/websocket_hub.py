@@ -0,0 +1,253 @@
+"""
+Topic-based pub/sub for every server websocket (game, waiting room, lobby).
+
+Each accepted socket gets one Connection with its own SocketSender; topics and
+the socket's own topic list are sets, so subscribe, unsubscribe and disconnect
+are O(1) per topic no matter how many sockets are connected.
+"""
+import asyncio
+import json
+import os
+import time
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+from websockets.exceptions import ConnectionClosedOK
+
+def encode_frame(data: dict) -> str:
+    """Encode a frame the way `send_json` would."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+async def safe_send_text(websocket: WebSocket, text: str) -> bool:
+    """Send pre-encoded text, reporting failure instead of raising."""
+    try:
+        if websocket.client_state != WebSocketState.CONNECTED:
+            return False
+        await websocket.send_text(text)
+        return True
+    except (WebSocketDisconnect, ConnectionClosedOK, Exception) as e:
+        print(f"Error sending websocket message: {e}")
+        return False
+
+class SocketSender:
+    """
+    Outbound queue and writer task for one socket, so a slow client only
+    delays itself. `send` never waits: when the queue is full the overflow
+    policy either drops the queued frames (state frames are full snapshots,
+    so only the newest matters) or disconnects the socket. Frames sent with
+    `droppable=False` (replies to the client) are kept through a drop. A
+    socket whose frames are changes rather than snapshots has a `resync`
+    function: after a drop it queues the fresh snapshot that function
+    returns in place of the dropped frames.
+    """
+    OVERFLOW_POLICIES = ("drop_stale", "disconnect")
+    GIVE_UP_CODE = 1013 # "try again later": the client should reconnect
+
+    def __init__(self, websocket: WebSocket, max_queue: int, overflow: str, on_close):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.websocket = websocket
+        self.overflow = overflow
+        self.on_close = on_close # called once when the sender gives up on the socket
+        self.resync = None # () -> snapshot frame, for sockets sent changes
+        self.max_queue = max_queue
+        self.queue: asyncio.Queue[tuple[str, bool]] = asyncio.Queue() # (frame, droppable)
+        self.closed = False
+        self.closing: asyncio.Task = None
+        self.end_code: int = None
+        self.overflowed = False
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.send_seconds = 0.0
+        self.max_send_seconds = 0.0
+        self.task = asyncio.create_task(self._write())
+
+    def send(self, frame: str, droppable: bool = True):
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            if self.overflow == "disconnect":
+                print("Websocket fell too far behind, disconnecting")
+                self.overflowed = True
+                self.close(self.GIVE_UP_CODE)
+                return
+            kept = []
+            while not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item[1]:
+                    self.dropped += 1
+                else:
+                    kept.append(item)
+            for item in kept:
+                self.queue.put_nowait(item)
+            if self.resync is not None:
+                # The snapshot already includes this frame's change
+                self.queue.put_nowait((self.resync(), True))
+                if droppable:
+                    self.dropped += 1
+                    return
+        self.queue.put_nowait((frame, droppable))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def end(self, code: int):
+        """
+        Close the socket with `code` once the frames already queued are written.
+        """
+        if self.closed or self.end_code is not None:
+            return
+        self.end_code = code
+        self.queue.put_nowait((None, False))
+
+    async def _write(self):
+        while True:
+            frame, _ = await self.queue.get()
+            if frame is None:
+                self.close(self.end_code)
+                return
+            start = time.perf_counter()
+            success = await safe_send_text(self.websocket, frame)
+            elapsed = time.perf_counter() - start
+            self.send_seconds += elapsed
+            self.max_send_seconds = max(self.max_send_seconds, elapsed)
+            if not success:
+                self.close(self.GIVE_UP_CODE)
+                return
+            self.sent += 1
+
+    def close(self, code: int = None):
+        """
+        Stop the writer and drop the socket from the hub. A `code` means the
+        sender is giving up on a socket its handler still holds, so the
+        websocket is closed with it too; the client sees the close and the
+        handler's receive loop ends.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+        if code is not None:
+            self.closing = asyncio.create_task(self._close_socket(code))
+        self.on_close()
+
+    async def _close_socket(self, code: int):
+        try:
+            if self.websocket.application_state == WebSocketState.CONNECTED:
+                await self.websocket.close(code=code)
+        except Exception as e:
+            print(f"Error closing websocket: {e}")
+
+class Connection:
+    """
+    One accepted socket: its sender, the topics it is subscribed to and
+    whatever per-socket data its manager keeps (e.g. the seat it views from).
+    """
+    __slots__ = ("websocket", "sender", "topics", "data")
+
+    def __init__(self, websocket: WebSocket, sender: SocketSender, data: dict):
+        self.websocket = websocket
+        self.sender = sender
+        self.topics: set[str] = set()
+        self.data = data
+
+class WebSocketHub:
+    def __init__(self, max_queue: int = None, overflow: str = None):
+        self.topics: dict[str, set[WebSocket]] = {}
+        self.connections: dict[WebSocket, Connection] = {} # reverse index: socket -> its topics and sender
+        self.max_queue = max_queue or int(os.environ.get("WEBSOCKET_QUEUE_SIZE", 8))
+        self.overflow = overflow or os.environ.get("WEBSOCKET_OVERFLOW", "drop_stale")
+        # Totals over closed connections, so metrics survive disconnects
+        self.closed_totals = {"sent": 0, "dropped": 0, "send_seconds": 0.0, "closed": 0, "overflow_disconnects": 0}
+
+    async def connect(self, websocket: WebSocket, topic: str, resync=None, **data) -> Connection:
+        """
+        Accept a socket and subscribe it to `topic`. `resync(connection)`
+        returns a snapshot frame to send in place of frames dropped on overflow.
+        """
+        await websocket.accept()
+        sender = SocketSender(websocket, self.max_queue, self.overflow, lambda: self.disconnect(websocket))
+        connection = self.connections[websocket] = Connection(websocket, sender, data)
+        if resync is not None:
+            sender.resync = lambda: resync(connection)
+        self.subscribe(topic, websocket)
+        return connection
+
+    def subscribe(self, topic: str, websocket: WebSocket):
+        self.topics.setdefault(topic, set()).add(websocket)
+        self.connections[websocket].topics.add(topic)
+
+    def unsubscribe(self, topic: str, websocket: WebSocket):
+        sockets = self.topics.get(topic)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self.topics[topic]
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            connection.topics.discard(topic)
+
+    def disconnect(self, websocket: WebSocket):
+        """
+        Drop a socket from every topic it is in and stop its writer.
+        """
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        for topic in connection.topics:
+            sockets = self.topics.get(topic)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self.topics[topic]
+        sender = connection.sender
+        sender.close()
+        self.closed_totals["sent"] += sender.sent
+        self.closed_totals["dropped"] += sender.dropped
+        self.closed_totals["send_seconds"] += sender.send_seconds
+        self.closed_totals["closed"] += 1
+        self.closed_totals["overflow_disconnects"] += sender.overflowed
+
+    def close(self, websocket: WebSocket, code: int = 1000):
+        """
+        Close a socket after the frames already queued for it; the handler
+        reading from it sees the close and disconnects.
+        """
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            connection.sender.end(code)
+
+    def subscribers(self, topic: str) -> list[Connection]:
+        return [self.connections[websocket] for websocket in self.topics.get(topic, ())]
+
+    def send(self, websocket: WebSocket, frame: str, droppable: bool = True):
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            connection.sender.send(frame, droppable)
+
+    def publish(self, topic: str, frame):
+        """
+        Queue `frame` for every subscriber of `topic`. `frame` is encoded text
+        shared by all of them, or a function of the Connection for frames
+        that differ per socket.
+        """
+        for connection in self.subscribers(topic):
+            connection.sender.send(frame if isinstance(frame, str) else frame(connection))
+
+    def metrics(self) -> dict:
+        senders = [connection.sender for connection in self.connections.values()]
+        sent = self.closed_totals["sent"] + sum(sender.sent for sender in senders)
+        send_seconds = self.closed_totals["send_seconds"] + sum(sender.send_seconds for sender in senders)
+        return {
+            "sockets": len(senders),
+            "topics": len(self.topics),
+            "overflow": self.overflow,
+            "max_queue": self.max_queue,
+            "queued": sum(sender.queue.qsize() for sender in senders),
+            "max_depth": max((sender.max_depth for sender in senders), default=0),
+            "sent": sent,
+            "dropped": self.closed_totals["dropped"] + sum(sender.dropped for sender in senders),
+            "closed": self.closed_totals["closed"],
+            "overflow_disconnects": self.closed_totals["overflow_disconnects"],
+            "avg_send_ms": send_seconds / sent * 1000 if sent else 0.0,
+            "max_send_ms": max((sender.max_send_seconds for sender in senders), default=0.0) * 1000,
+        }